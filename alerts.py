@@ -0,0 +1,214 @@
+"""
+Envio assíncrono dos alertas de sinais por email.
+
+A análise apenas enfileira os alertas; uma thread em segundo plano mantém
+uma sessão SMTP autenticada reaproveitada entre envios e agrupa os alertas
+de uma mesma varredura em um único email (digest). Falhas são repetidas com
+backoff exponencial sem bloquear a coleta e a análise.
+"""
+import logging
+import queue
+import smtplib
+import threading
+import time
+from datetime import datetime
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Callable, List, NamedTuple, Optional
+
+from metrics import EMAILS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Marca o fim de uma varredura na fila
+_FLUSH = object()
+
+
+class Alert(NamedTuple):
+    symbol: str
+    timeframe: str
+    signal_type: str
+    price: float
+    detected_at: datetime
+    last_signal: Optional[dict] = None
+    candle_timestamp: Optional[int] = None  # Vela do sinal, epoch em ms
+
+
+def format_alert(alert: Alert) -> str:
+    body = f"""
+            Novo sinal detectado:
+
+            Símbolo: {alert.symbol}
+            Timeframe: {alert.timeframe}
+            Tipo: {alert.signal_type}
+            Preço: {alert.price:.8f}
+            Data/Hora: {alert.detected_at.strftime('%Y-%m-%d %H:%M:%S')}
+            """
+    if alert.last_signal:
+        body += f"""
+
+                Último sinal anterior:
+                Tipo: {alert.last_signal['type']}
+                Preço: {alert.last_signal['price']:.8f}
+                Data/Hora: {alert.last_signal['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}
+                """
+    return body
+
+
+def build_digest(alerts: List[Alert], sender: str, recipient: str) -> MIMEMultipart:
+    """
+    Um único email com todos os alertas; com apenas um, mantém o assunto original
+    """
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = recipient
+    if len(alerts) == 1:
+        alert = alerts[0]
+        msg['Subject'] = f"Novo Sinal: {alert.symbol} {alert.timeframe} - {alert.signal_type}"
+    else:
+        summary = ', '.join(f"{a.symbol} {a.timeframe} {a.signal_type}" for a in alerts[:5])
+        if len(alerts) > 5:
+            summary += ', ...'
+        msg['Subject'] = f"{len(alerts)} Novos Sinais: {summary}"
+    msg.attach(MIMEText('\n'.join(format_alert(alert) for alert in alerts), 'plain'))
+    return msg
+
+
+class EmailDispatcher:
+    def __init__(self, sender: str, password: str, recipient: str,
+                 host: str = 'smtp.gmail.com', port: int = 465, use_ssl: bool = True,
+                 batch_window: float = 2.0, idle_timeout: float = 120.0,
+                 max_retries: int = 5, backoff: float = 2.0,
+                 on_failed: Optional[Callable[[List[Alert]], None]] = None):
+        """
+        batch_window: segundos que um alerta aguarda o fim da varredura (flush)
+        antes de ser enviado mesmo assim
+        idle_timeout: fecha a sessão SMTP após esse tempo sem envios
+        on_failed: chamado com os alertas descartados após esgotar as tentativas
+        """
+        self.sender = sender
+        self.password = password
+        self.recipient = recipient
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.batch_window = batch_window
+        self.idle_timeout = idle_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.on_failed = on_failed
+        self._queue = queue.Queue()
+        self._server = None
+        self._last_used = 0.0
+        self._first_pending = 0.0
+        self._thread = threading.Thread(target=self._run, name='email-dispatcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, alert: Alert):
+        self._queue.put(alert)
+
+    def flush(self):
+        """
+        Sinaliza o fim da varredura: os alertas pendentes saem em um único email
+        """
+        self._queue.put(_FLUSH)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda o envio de tudo o que já foi enfileirado
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _run(self):
+        pending = []
+        taken = 0  # Itens retirados da fila ainda não concluídos
+        while True:
+            if pending:
+                wait = max(0.0, self._first_pending + self.batch_window - time.monotonic())
+            elif self._server is not None:
+                wait = max(0.0, self._last_used + self.idle_timeout - time.monotonic())
+            else:
+                wait = None
+
+            try:
+                item = self._queue.get(timeout=wait)
+                taken += 1
+            except queue.Empty:
+                if not pending:
+                    self._close()
+                    continue
+                item = _FLUSH
+
+            if item is not _FLUSH:
+                if not pending:
+                    self._first_pending = time.monotonic()
+                pending.append(item)
+                continue
+
+            if pending:
+                try:
+                    self._deliver(pending)
+                except Exception as e:
+                    logger.error(f"Erro inesperado no envio de alertas: {str(e)}")
+                pending = []
+            for _ in range(taken):
+                self._queue.task_done()
+            taken = 0
+
+    def _connect(self):
+        if self._server is not None:
+            try:
+                if self._server.noop()[0] == 250:
+                    return self._server
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close()
+
+        server_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        server = server_class(self.host, self.port, timeout=30)
+        server.ehlo()
+        # Servidores locais de teste não anunciam AUTH
+        if self.password and server.has_extn('auth'):
+            server.login(self.sender, self.password)
+        self._server = server
+        return server
+
+    def _close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._server = None
+
+    def _deliver(self, alerts: List[Alert]):
+        msg = build_digest(alerts, self.sender, self.recipient)
+        for attempt in range(self.max_retries):
+            try:
+                with STAGE_SECONDS.time(stage='email'):
+                    self._connect().send_message(msg)
+                self._last_used = time.monotonic()
+                EMAILS.inc(result='sent')
+                logger.info(f"Email enviado com sucesso para "
+                            f"{', '.join(f'{a.symbol} ({a.timeframe})' for a in alerts)}")
+                return True
+            except (smtplib.SMTPException, OSError) as e:
+                self._close()
+                EMAILS.inc(result='error')
+                delay = self.backoff ** attempt
+                logger.warning(f"Erro ao enviar e-mail (tentativa {attempt + 1}/{self.max_retries}): {str(e)}")
+                if attempt < self.max_retries - 1:
+                    time.sleep(delay)
+
+        logger.error(f"Alertas descartados após {self.max_retries} tentativas: "
+                     f"{', '.join(f'{a.symbol} ({a.timeframe})' for a in alerts)}")
+        EMAILS.inc(result='dropped')
+        if self.on_failed is not None:
+            self.on_failed(alerts)
+        return False
@@ -0,0 +1,90 @@
+"""
+Executor da análise de sinais para muitos pares (symbol, timeframe).
+
+Cada tarefa leva apenas o estado incremental do par (IndicatorState) e os
+candles ainda não processados em arrays NumPy compactos; o trabalho é
+distribuído entre processos para fugir do GIL quando há centenas de pares.
+"""
+import logging
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import indicators
+
+logger = logging.getLogger(__name__)
+
+
+class PairTask(NamedTuple):
+    key: Tuple[str, str]
+    state: indicators.IndicatorState
+    timestamps: np.ndarray  # int64, epoch em ms
+    ohlc: np.ndarray  # float64, shape (4, n): open, high, low, close
+
+
+class PairResult(NamedTuple):
+    key: Tuple[str, str]
+    state: indicators.IndicatorState
+    current_signal: Optional[dict]
+    last_signal: Optional[dict]
+    confirmed: List[dict]  # Sinais confirmados nas velas fechadas desta tarefa
+    stage_seconds: Tuple[float, float]  # Heikin Ashi e Chandelier Exit (somados no processo pai)
+
+
+def run_task(task: PairTask) -> PairResult:
+    """
+    Confirma todas as velas da tarefa exceto a última, que é apenas avaliada.
+    Num estado novo (primeira carga do par), apenas o sinal da última vela
+    fechada conta como confirmado; os anteriores são histórico
+    """
+    state = task.state
+    timestamps = task.timestamps.tolist()
+    rows = task.ohlc.T.tolist()
+    last_index = len(timestamps) - 1
+    fresh = state.count == 0
+
+    current_signal = None
+    confirmed = []
+    timings = [0.0, 0.0]
+    for index, (timestamp, row) in enumerate(zip(timestamps, rows)):
+        if index < last_index:
+            signal = state.update(timestamp, *row, timings=timings)
+            if signal and (not fresh or index == last_index - 1):
+                confirmed.append(signal)
+        else:
+            current_signal = state.preview(timestamp, *row, timings=timings)
+
+    last_signal = state.last_signal
+    # Se o sinal atual for do mesmo tipo que o último, mantém apenas o atual
+    if current_signal and last_signal and current_signal['type'] == last_signal['type']:
+        last_signal = None
+
+    return PairResult(task.key, state, current_signal, last_signal, confirmed, tuple(timings))
+
+
+class AnalysisExecutor:
+    def __init__(self, workers: int = 0):
+        """
+        workers <= 1 executa no próprio processo; acima disso usa um pool de processos
+        """
+        self.workers = workers
+        self._pool = None
+        if workers > 1:
+            # spawn evita herdar locks das threads do servidor web via fork
+            self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            logger.info(f"Análise distribuída em {workers} processos")
+
+    def run(self, tasks: List[PairTask]) -> List[PairResult]:
+        if not tasks:
+            return []
+        if self._pool is None:
+            return [run_task(task) for task in tasks]
+        chunksize = max(1, math.ceil(len(tasks) / (self.workers * 4)))
+        return list(self._pool.map(run_task, tasks, chunksize=chunksize))
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
@@ -0,0 +1,349 @@
+"""
+Backtest da estratégia Heikin Ashi + Chandelier Exit sobre OHLCV local.
+
+Os sinais seguem exatamente as regras de CryptoBot.analyze_signals
+(indicators.confirmed_signals) e são calculados de uma vez sobre arrays
+NumPy, sem iterar o DataFrame. A estratégia fica sempre posicionada: LONG
+compra (fechando um short), SHORT vende (e abre um short, exceto com
+long_only). As ordens são executadas no fechamento real da vela do sinal.
+
+Os resultados ficam em cache por arquivo e conjunto de parâmetros.
+
+Uso:
+    python backtest.py dados/BTCUSDT_1h.csv dados/ETHUSDT_1h.parquet --atr-period 2 --atr-multiplier 1.0
+"""
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+import config
+import indicators
+from ohlcv_archive import ArchiveSeries, OhlcvArrays
+
+logger = logging.getLogger(__name__)
+
+
+class BacktestParams(NamedTuple):
+    atr_period: int = 2
+    atr_multiplier: float = 1.0
+    use_close: bool = False
+    fee: float = 0.001  # Custo por lado (0.1%)
+    long_only: bool = False
+
+
+class BacktestResult(NamedTuple):
+    label: str
+    params: BacktestParams
+    trades: pd.DataFrame
+    total_return: float
+    max_drawdown: float
+    hit_rate: float
+    candles: int
+
+    def summary(self) -> dict:
+        closed = self.trades[~self.trades['open']] if len(self.trades) else self.trades
+        return {
+            'label': self.label,
+            'candles': self.candles,
+            'trades': len(closed),
+            'pnl_pct': self.total_return * 100,
+            'max_drawdown_pct': self.max_drawdown * 100,
+            'hit_rate_pct': self.hit_rate * 100,
+        }
+
+
+def load_ohlcv(path: str) -> OhlcvArrays:
+    """
+    Lê um arquivo CSV ou Parquet com as colunas timestamp, open, high, low,
+    close e volume. O timestamp pode estar em ms ou em formato de data.
+    Um diretório de série do ohlcv_archive é lido direto do mapa em memória
+    """
+    if os.path.isdir(path):
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return ArchiveSeries(path, meta['symbol'], meta['timeframe']).read()
+
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path)  # Requer pyarrow ou fastparquet
+    else:
+        df = pd.read_csv(path)
+
+    timestamps = df['timestamp']
+    if pd.api.types.is_numeric_dtype(timestamps):
+        timestamps = timestamps.to_numpy(dtype=np.int64)
+    else:
+        timestamps = pd.to_datetime(timestamps).to_numpy(dtype='datetime64[ms]').astype(np.int64)
+
+    order = np.argsort(timestamps, kind='stable')
+    timestamps = timestamps[order]
+    # Descarta velas repetidas, mantendo a última versão
+    keep = np.r_[timestamps[1:] != timestamps[:-1], True]
+    columns = [df[name].to_numpy(dtype=np.float64)[order][keep] for name in ('open', 'high', 'low', 'close', 'volume')]
+    return OhlcvArrays(timestamps[keep], *columns)
+
+
+def signal_masks(data: OhlcvArrays, atr_period: int, atr_multiplier: float, use_close: bool) -> tuple:
+    """
+    Máscaras (long, short) dos sinais confirmados em todas as velas
+    """
+    ha_open, ha_high, ha_low, ha_close = indicators.heikin_ashi(data.open, data.high, data.low, data.close)
+    ce = indicators.chandelier_exit(ha_high, ha_low, ha_close, atr_period, atr_multiplier, use_close)
+    return indicators.confirmed_signals(ha_open, ha_high, ha_low, ha_close, ce.buy_signal, ce.sell_signal)
+
+
+def positions_from_signals(long_mask: np.ndarray, short_mask: np.ndarray, long_only: bool = False) -> np.ndarray:
+    """
+    Posição (+1, -1 ou 0) mantida ao fim de cada vela. Aceita máscaras com
+    uma linha por conjunto de parâmetros (o tempo é sempre o último eixo)
+    """
+    n = long_mask.shape[-1]
+    target = np.zeros(long_mask.shape)
+    target[short_mask] = 0.0 if long_only else -1.0
+    target[long_mask] = 1.0
+    has_signal = long_mask | short_mask
+    # Propaga o último sinal para frente (forward fill vetorizado)
+    last_index = np.maximum.accumulate(np.where(has_signal, np.arange(n), -1), axis=-1)
+    positions = np.take_along_axis(target, np.maximum(last_index, 0), axis=-1)
+    positions[last_index < 0] = 0.0
+    return positions
+
+
+def _previous(positions: np.ndarray) -> np.ndarray:
+    prev_positions = np.zeros_like(positions)
+    prev_positions[..., 1:] = positions[..., :-1]
+    return prev_positions
+
+
+def evaluate_positions(close: np.ndarray, positions: np.ndarray, fee: float) -> tuple:
+    """
+    Retorna (curva de capital, máximo drawdown) de uma série de posições
+    (ou de várias, uma por linha)
+    """
+    prev_positions = _previous(positions)
+    returns = np.r_[0.0, close[1:] / close[:-1] - 1]
+    net = prev_positions * returns - np.abs(positions - prev_positions) * fee
+    equity = np.cumprod(1 + net, axis=-1)
+    drawdown = 1 - equity / np.maximum.accumulate(np.maximum(equity, 1.0), axis=-1)
+    max_drawdown = drawdown.max(axis=-1) if drawdown.shape[-1] else np.zeros(drawdown.shape[:-1])
+    return equity, max_drawdown if np.ndim(max_drawdown) else float(max_drawdown)
+
+
+def trade_bounds(positions: np.ndarray) -> tuple:
+    """
+    Índices (entrada, saída, em_aberto) das operações de uma série de posições
+    """
+    changes = np.flatnonzero(positions != _previous(positions))
+    entries = changes[positions[changes] != 0]
+    # A saída é a próxima mudança de posição; sem ela, a operação segue aberta
+    next_change = np.searchsorted(changes, entries, side='right')
+    is_open = next_change >= len(changes)
+    exits = np.where(is_open, len(positions) - 1, changes[np.minimum(next_change, len(changes) - 1)])
+    return entries, exits, is_open
+
+
+def trade_returns(close: np.ndarray, positions: np.ndarray, fee: float) -> tuple:
+    entries, exits, is_open = trade_bounds(positions)
+    side = positions[entries]
+    returns = side * (close[exits] / close[entries] - 1) - fee * np.where(is_open, 1, 2)
+    return returns, is_open
+
+
+def extract_trades(data: OhlcvArrays, positions: np.ndarray, fee: float) -> pd.DataFrame:
+    """
+    Uma linha por operação: entrada e saída nas velas em que a posição muda
+    """
+    entries, exits, is_open = trade_bounds(positions)
+    returns, _ = trade_returns(data.close, positions, fee)
+    side = positions[entries]
+    return pd.DataFrame({
+        'entry_time': pd.to_datetime(data.timestamps[entries], unit='ms'),
+        'exit_time': pd.to_datetime(data.timestamps[exits], unit='ms'),
+        'side': np.where(side > 0, 'LONG', 'SHORT'),
+        'entry_price': data.close[entries],
+        'exit_price': data.close[exits],
+        'return': returns,
+        'open': is_open,
+    })
+
+
+def backtest_arrays(data: OhlcvArrays, params: BacktestParams = BacktestParams(), label: str = '') -> BacktestResult:
+    long_mask, short_mask = signal_masks(data, params.atr_period, params.atr_multiplier, params.use_close)
+    positions = positions_from_signals(long_mask, short_mask, params.long_only)
+    equity, max_drawdown = evaluate_positions(data.close, positions, params.fee)
+    trades = extract_trades(data, positions, params.fee)
+
+    closed = trades['return'].to_numpy()[~trades['open'].to_numpy()]
+    hit_rate = float((closed > 0).mean()) if len(closed) else 0.0
+    total_return = float(equity[-1] - 1) if len(equity) else 0.0
+    return BacktestResult(label, params, trades, total_return, max_drawdown, hit_rate, len(data.close))
+
+
+class BacktestCache:
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Cache dos resultados por (arquivo, parâmetros), em memória e, se
+        `directory` for informado, em disco
+        """
+        self.directory = directory
+        self._memory: Dict[str, BacktestResult] = {}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(path: str, params: BacktestParams) -> str:
+        # O arquivo entra pela identidade (caminho, tamanho, mtime): editar os dados invalida o cache
+        stat = os.stat(os.path.join(path, 'timestamp.bin') if os.path.isdir(path) else path)
+        raw = repr((os.path.abspath(path), stat.st_size, stat.st_mtime_ns, tuple(params)))
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[BacktestResult]:
+        result = self._memory.get(key)
+        if result is None and self.directory:
+            try:
+                with open(os.path.join(self.directory, f"{key}.pkl"), 'rb') as f:
+                    result = pickle.load(f)
+                self._memory[key] = result
+            except FileNotFoundError:
+                return None
+            except (OSError, pickle.UnpicklingError, EOFError) as e:
+                logger.warning(f"Erro ao ler cache do backtest: {str(e)}")
+                return None
+        return result
+
+    def put(self, key: str, result: BacktestResult):
+        self._memory[key] = result
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"{key}.pkl")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Erro ao gravar cache do backtest: {str(e)}")
+
+
+def series_label(path: str) -> str:
+    """
+    Nome da série nos relatórios: nome do arquivo ou <SYMBOL>_<timeframe>
+    """
+    path = path.rstrip(os.sep)
+    if os.path.isdir(path):
+        # Diretório de série do arquivo local: <root>/<SYMBOL>/<timeframe>
+        return f"{os.path.basename(os.path.dirname(path))}_{os.path.basename(path)}"
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _run_file(path: str, params: BacktestParams) -> BacktestResult:
+    return backtest_arrays(load_ohlcv(path), params, series_label(path))
+
+
+def run_backtest(path: str, params: BacktestParams = BacktestParams(),
+                 cache: Optional[BacktestCache] = None) -> BacktestResult:
+    key = BacktestCache.key(path, params) if cache is not None else None
+    if cache is not None:
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+    result = _run_file(path, params)
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+
+def run_many(paths: List[str], params: BacktestParams = BacktestParams(),
+             cache: Optional[BacktestCache] = None, workers: int = 0) -> pd.DataFrame:
+    """
+    Executa o backtest para vários arquivos e retorna o resumo por arquivo.
+    Com workers > 1, os arquivos fora do cache são processados em paralelo
+    """
+    results = {}
+    pending = []
+    for path in paths:
+        if not os.path.exists(path):
+            logger.error(f"Arquivo não encontrado: {path}")
+            continue
+        result = cache.get(BacktestCache.key(path, params)) if cache is not None else None
+        if result is not None:
+            results[path] = result
+        else:
+            pending.append(path)
+
+    if workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {path: pool.submit(_run_file, path, params) for path in pending}
+            computed = {}
+            for path, future in futures.items():
+                try:
+                    computed[path] = future.result()
+                except Exception as e:
+                    logger.error(f"Erro no backtest de {path}: {str(e)}")
+    else:
+        computed = {}
+        for path in pending:
+            try:
+                computed[path] = _run_file(path, params)
+            except Exception as e:
+                logger.error(f"Erro no backtest de {path}: {str(e)}")
+
+    for path, result in computed.items():
+        if cache is not None:
+            cache.put(BacktestCache.key(path, params), result)
+        results[path] = result
+
+    return pd.DataFrame([results[path].summary() for path in paths if path in results])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest Heikin Ashi + Chandelier Exit')
+    parser.add_argument('paths', nargs='+', help='arquivos OHLCV (CSV ou Parquet) ou séries do ohlcv_archive')
+    parser.add_argument('--atr-period', type=int, default=2)
+    parser.add_argument('--atr-multiplier', type=float, default=1.0)
+    parser.add_argument('--use-close', action='store_true')
+    parser.add_argument('--fee', type=float, default=0.001, help='custo por lado (0.001 = 0.1%%)')
+    parser.add_argument('--long-only', action='store_true')
+    parser.add_argument('--trades', help='grava as operações de todos os arquivos neste CSV')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='processos em paralelo')
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    params = BacktestParams(args.atr_period, args.atr_multiplier, args.use_close, args.fee, args.long_only)
+    cache = None if args.no_cache else BacktestCache(config.BACKTEST_CACHE_DIR)
+
+    start = time.perf_counter()
+    summary = run_many(args.paths, params, cache, workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    pd.set_option('display.width', 200)
+    print(summary.to_string(index=False, float_format=lambda value: f"{value:.2f}"))
+    if len(summary):
+        print(f"\n{len(summary)} arquivos em {elapsed:.2f}s | PnL médio: {summary['pnl_pct'].mean():.2f}% | "
+              f"Drawdown médio: {summary['max_drawdown_pct'].mean():.2f}% | "
+              f"Acerto médio: {summary['hit_rate_pct'].mean():.2f}%")
+
+    if args.trades:
+        frames = []
+        for path in args.paths:
+            if not os.path.exists(path):
+                continue
+            result = run_backtest(path, params, cache)
+            frames.append(result.trades.assign(label=result.label))
+        pd.concat(frames, ignore_index=True).to_csv(args.trades, index=False)
+        print(f"Operações gravadas em {args.trades}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+"""
+Benchmarks da análise de sinais, offline, sobre fixtures OHLCV.
+
+Mede cada estágio isoladamente (Heikin Ashi, Chandelier Exit,
+analyze_signals e a análise incremental) para janelas de 100 a 100k velas e
+o caminho completo de generate_signals_many (candle store + análise +
+alertas, com o envio de email substituído por um stub) para 10 a 500
+símbolos. Por padrão a fixture é a série gravada BTC/USDT 1h do arquivo
+local (ohlcv_archive.py backfill); sem ela, ou com --synthetic, os dados são
+sintéticos e determinísticos (mesma semente, mesmos dados). --fixture aponta
+para outra gravação (CSV, Parquet ou série do ohlcv_archive). Os melhores
+tempos (menos sensíveis a ruído que a mediana) podem ser gravados como
+baseline; nas execuções seguintes, estágios mais lentos que a baseline além
+do limite são apontados como regressão (código de saída 1).
+
+Uso:
+    python benchmark.py --save-baseline
+    python benchmark.py --threshold 0.15
+    python benchmark.py --sizes 100,1000 --symbols 10,100 --fixture data/ohlcv/ETH_USDT/1h
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+import ccxt
+import numpy as np
+import pandas as pd
+
+import config
+import indicators
+from backtest import load_ohlcv
+from candle_store import OHLCV_COLUMNS, CandleStore
+from crypto_bot import CryptoBot
+from ohlcv_archive import OhlcvArrays
+from signal_store import SignalDedupStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = (100, 1000, 10_000, 100_000)
+DEFAULT_SYMBOL_COUNTS = (10, 100, 500)
+# Janela usada pelo bot em produção (get_historical_data_many)
+END_TO_END_WINDOW = 100
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'benchmark_baseline.json')
+HOUR_MS = 3_600_000
+# Gravação usada por padrão, quando existe
+DEFAULT_FIXTURE = os.path.join(config.OHLCV_ARCHIVE_DIR, 'BTC_USDT', '1h') if config.OHLCV_ARCHIVE_DIR else None
+
+
+class BenchResult(NamedTuple):
+    stage: str
+    size: int
+    median: float
+    best: float
+    repeats: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.stage}/{self.size}"
+
+
+def synthetic_ohlcv(size: int, seed: int = 0) -> OhlcvArrays:
+    """
+    Passeio aleatório determinístico de velas de 1h
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, size)))
+    open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.002, size))
+    high = np.maximum(open_, close) * (1 + rng.random(size) * 0.005)
+    low = np.minimum(open_, close) * (1 - rng.random(size) * 0.005)
+    volume = rng.random(size) * 1000
+    timestamps = 1_600_000_000_000 // HOUR_MS * HOUR_MS + np.arange(size, dtype=np.int64) * HOUR_MS
+    return OhlcvArrays(timestamps, open_, high, low, close, volume)
+
+
+def window(data: OhlcvArrays, size: int) -> OhlcvArrays:
+    if len(data.timestamps) < size:
+        raise ValueError(f"Fixture com {len(data.timestamps)} velas, menor que a janela de {size}")
+    return OhlcvArrays(*(column[-size:] for column in data))
+
+
+def to_frame(data: OhlcvArrays) -> pd.DataFrame:
+    """
+    DataFrame no mesmo formato entregue pelo get_historical_data_many
+    """
+    frame = {'timestamp': pd.to_datetime(data.timestamps, unit='ms')}
+    for name in OHLCV_COLUMNS:
+        frame[name] = getattr(data, name)
+    return pd.DataFrame(frame)
+
+
+def to_ohlcv(data: OhlcvArrays) -> list:
+    """
+    Linhas no formato do ccxt ([ts, o, h, l, c, v])
+    """
+    return np.column_stack(list(data)).tolist()
+
+
+def measure(fn: Callable, setup: Optional[Callable] = None, min_time: float = 0.5,
+            max_time: float = 10.0, max_repeats: int = 50) -> tuple:
+    """
+    Executa `fn` até somar `min_time` segundos (ao menos 3 vezes, sem passar
+    de `max_time`) e retorna (mediana, melhor, repetições). `setup` roda antes
+    de cada execução, fora da medição; uma execução inicial de aquecimento
+    (compilação do Numba, caches) é descartada
+    """
+    if setup is not None:
+        setup()
+    fn()
+    timings = []
+    while len(timings) < max_repeats:
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+        total = sum(timings)
+        if total >= max_time or (total >= min_time and len(timings) >= 3):
+            break
+    return statistics.median(timings), min(timings), len(timings)
+
+
+class _NullDispatcher:
+    """
+    Substitui o EmailDispatcher: conta os alertas sem abrir conexões SMTP
+    """
+    def __init__(self):
+        self.alerts = 0
+
+    def submit(self, alert):
+        self.alerts += 1
+
+    def flush(self):
+        pass
+
+
+def offline_bot(symbols: List[str], timeframes: List[str], capacity: int = END_TO_END_WINDOW) -> CryptoBot:
+    """
+    CryptoBot sem acesso à Binance, sem arquivo e com o email substituído
+    pelo _NullDispatcher
+    """
+    return CryptoBot(
+        exchanges=[ccxt.binance({'enableRateLimit': True})],
+        symbols=symbols,
+        timeframes=timeframes,
+        email_dispatcher=_NullDispatcher(),
+        signal_store_path=':memory:',
+        archive_dir='',
+        candle_capacity=capacity,
+        analysis_workers=0,
+        connect=False
+    )
+
+
+def bench_stages(fixture: Optional[OhlcvArrays], sizes: List[int], max_time: float) -> List[BenchResult]:
+    """
+    Cada estágio da análise de um par, isoladamente, por tamanho de janela
+    """
+    bot = offline_bot(['BENCH/USDT'], ['1h'])
+    results = []
+    for size in sizes:
+        try:
+            data = window(fixture, size) if fixture is not None else synthetic_ohlcv(size)
+        except ValueError as e:
+            logger.warning(str(e))
+            continue
+        df = to_frame(data)
+        ha_df = bot.heikin_ashi.calculate(df)
+
+        def reset_state():
+            bot.indicator_states.clear()
+
+        stages = [
+            ('heikin_ashi', lambda: bot.heikin_ashi.calculate(df), None),
+            ('chandelier_exit', lambda: bot.chandelier.calculate(ha_df), None),
+            ('chandelier_arrays', lambda: indicators.chandelier_exit(
+                ha_df['high'].to_numpy(), ha_df['low'].to_numpy(), ha_df['close'].to_numpy(), 2, 1.0, False), None),
+            ('analyze_signals', lambda: bot.analyze_signals(df), None),
+            ('analyze_incremental', lambda: bot.analyze_signals_incremental(df, 'BENCH/USDT', '1h'), reset_state),
+        ]
+        for stage, fn, setup in stages:
+            median, best, repeats = measure(fn, setup, max_time=max_time)
+            results.append(BenchResult(stage, size, median, best, repeats))
+            logger.info(f"{stage:<22} {size:>7} velas: {median * 1000:10.3f} ms ({repeats}x)")
+    return results
+
+
+def bench_end_to_end(fixture: Optional[OhlcvArrays], counts: List[int], max_time: float,
+                     window_size: int = END_TO_END_WINDOW) -> List[BenchResult]:
+    """
+    generate_signals_many para `count` símbolos: candles brutos no candle
+    store, DataFrames, análise e alertas (email em stub)
+    """
+    results = []
+    for count in counts:
+        symbols = [f"S{index}/USDT" for index in range(count)]
+        if fixture is not None:
+            # Janelas diferentes da mesma gravação para cada símbolo
+            step = max(1, (len(fixture.timestamps) - window_size) // max(count, 1))
+            rows = {
+                symbol: to_ohlcv(OhlcvArrays(*(column[index * step:index * step + window_size] for column in fixture)))
+                for index, symbol in enumerate(symbols)
+            }
+        else:
+            rows = {symbol: to_ohlcv(synthetic_ohlcv(window_size, seed=index)) for index, symbol in enumerate(symbols)}
+        bot = offline_bot(symbols, ['1h'], window_size)
+
+        def reset():
+            bot.candle_store = CandleStore(capacity=window_size)
+            bot.indicator_states.clear()
+            bot.sent_signals.close()
+            bot.sent_signals = SignalDedupStore(':memory:')
+            for symbol in symbols:
+                bot.signal_history['1h'][symbol] = None
+
+        def run():
+            frames = {}
+            for symbol in symbols:
+                bot.candle_store.merge(symbol, '1h', rows[symbol], full=True, limit=window_size)
+                frames[(symbol, '1h')] = bot.candle_store.frame(symbol, '1h', window_size)
+            bot.generate_signals_many(frames)
+
+        median, best, repeats = measure(run, reset, max_time=max_time)
+        results.append(BenchResult('generate_signals', count, median, best, repeats))
+        logger.info(f"{'generate_signals':<22} {count:>7} símbolos: {median * 1000:10.3f} ms ({repeats}x)")
+    return results
+
+
+def load_baseline(path: str) -> Optional[dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Erro ao ler a baseline {path}: {str(e)}")
+        return None
+
+
+def save_baseline(path: str, results: List[BenchResult], fixture: str):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'numba': indicators.USE_NUMBA,
+            'fixture': fixture,
+            'results': {result.key: result.best for result in results},
+        }, f, indent=2)
+    logger.info(f"Baseline gravada em {path}")
+
+
+def compare(results: List[BenchResult], baseline: dict, threshold: float) -> List[tuple]:
+    """
+    Retorna (resultado, tempo da baseline, variação) dos estágios mais
+    lentos que a baseline além de `threshold` (0.1 = 10%)
+    """
+    reference = baseline.get('results', {})
+    regressions = []
+    for result in results:
+        previous = reference.get(result.key)
+        if not previous:
+            continue
+        change = result.best / previous - 1
+        if change > threshold:
+            regressions.append((result, previous, change))
+    return regressions
+
+
+def _parse_ints(spec: str) -> List[int]:
+    return [int(value) for value in spec.split(',') if value]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks da análise de sinais')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='tamanhos de janela (velas)')
+    parser.add_argument('--symbols', default=','.join(map(str, DEFAULT_SYMBOL_COUNTS)),
+                        help='quantidades de símbolos no generate_signals')
+    parser.add_argument('--fixture', help='OHLCV gravado (CSV, Parquet ou série do ohlcv_archive); '
+                                          'padrão: série BTC/USDT 1h do arquivo local, se existir')
+    parser.add_argument('--synthetic', action='store_true', help='usa dados sintéticos mesmo com uma gravação disponível')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='grava os tempos atuais como baseline')
+    parser.add_argument('--threshold', type=float, default=0.10, help='variação tolerada sobre a baseline (0.10 = 10%%)')
+    parser.add_argument('--max-time', type=float, default=10.0, help='tempo máximo por medição (segundos)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # As mensagens por par da análise não interessam aqui
+    logging.getLogger('crypto_bot').setLevel(logging.WARNING)
+
+    fixture_path = args.fixture
+    if fixture_path is None and not args.synthetic and DEFAULT_FIXTURE and os.path.isdir(DEFAULT_FIXTURE):
+        fixture_path = DEFAULT_FIXTURE
+    fixture = load_ohlcv(fixture_path) if fixture_path else None
+    fixture_name = fixture_path or 'sintética'
+    logger.info(f"Numba {'ativo' if indicators.USE_NUMBA else 'indisponível'}; fixture: {fixture_name}")
+
+    results = bench_stages(fixture, _parse_ints(args.sizes), args.max_time)
+    results += bench_end_to_end(fixture, _parse_ints(args.symbols), args.max_time)
+
+    print(f"\n{'estágio':<22} {'tamanho':>8} {'mediana (ms)':>14} {'melhor (ms)':>12} {'rep.':>5}")
+    for result in results:
+        print(f"{result.stage:<22} {result.size:>8} {result.median * 1000:>14.3f} {result.best * 1000:>12.3f} {result.repeats:>5}")
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results, fixture_name)
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"\nSem baseline em {args.baseline}; use --save-baseline para gravar uma")
+        return
+    if baseline.get('fixture', fixture_name) != fixture_name:
+        logger.warning(f"Baseline gravada com a fixture {baseline['fixture']}; a comparação pode não ser válida")
+    regressions = compare(results, baseline, args.threshold)
+    if not regressions:
+        print(f"\nNenhuma regressão acima de {args.threshold:.0%} em relação à baseline de {baseline.get('created_at')}")
+        return
+    print(f"\nRegressões acima de {args.threshold:.0%} (baseline de {baseline.get('created_at')}):")
+    for result, previous, change in regressions:
+        print(f"  {result.key:<30} {previous * 1000:10.3f} ms -> {result.best * 1000:10.3f} ms (+{change:.0%})")
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
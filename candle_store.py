@@ -0,0 +1,265 @@
+"""
+Armazenamento incremental de candles por (symbol, timeframe).
+
+Cada par mantém um ring buffer pré-alocado de timestamps (ms) e OHLCV. A
+cada ciclo só são buscados os candles a partir do último armazenado
+(fetch_ohlcv com since=), substituindo a vela ainda aberta e anexando as
+novas. A janela mais recente é sempre contígua na memória, então a análise
+recebe views sobre o buffer em vez de cópias. Quando outra thread também
+escreve no store (streams de kline), use frame(copy=True). Timeframes
+maiores podem ser derivados das velas base com resampled_frame().
+"""
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+OHLCV_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+_TIMEFRAME_UNITS_MS = {
+    'm': 60_000,
+    'h': 3_600_000,
+    'd': 86_400_000,
+    'w': 604_800_000,
+    'M': 2_592_000_000,
+}
+
+
+def timeframe_to_ms(timeframe: str) -> int:
+    """
+    Converte um timeframe no formato da Binance ('1h', '2h', '1d'...) em milissegundos
+    """
+    return int(timeframe[:-1]) * _TIMEFRAME_UNITS_MS[timeframe[-1]]
+
+
+def resample_factor(base_timeframe: str, timeframe: str) -> Optional[int]:
+    """
+    Quantas velas de `base_timeframe` formam uma de `timeframe`, ou None se
+    ele não puder ser derivado (não múltiplo ou não alinhado ao dia UTC)
+    """
+    base_ms = timeframe_to_ms(base_timeframe)
+    target_ms = timeframe_to_ms(timeframe)
+    if target_ms <= base_ms or target_ms % base_ms or _TIMEFRAME_UNITS_MS['d'] % target_ms:
+        return None
+    return target_ms // base_ms
+
+
+def resample(timestamps: np.ndarray, values: np.ndarray, timeframe: str) -> tuple:
+    """
+    Agrega velas (timestamps em ms, values com shape (5, n) em OHLCV_COLUMNS)
+    em `timeframe`, com as fronteiras UTC usadas pela Binance: abertura da
+    primeira, máxima, mínima, fechamento da última e soma do volume. O
+    primeiro período é descartado se começar no meio; o último pode estar
+    em formação, como a vela atual da exchange
+    """
+    target_ms = timeframe_to_ms(timeframe)
+    if len(timestamps) == 0:
+        return timestamps[:0], values[:, :0]
+    buckets = timestamps // target_ms * target_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    if timestamps[0] != buckets[0]:
+        starts = starts[1:]
+    if len(starts) == 0:
+        return timestamps[:0], values[:, :0]
+    ends = np.r_[starts[1:], len(timestamps)] - 1
+
+    result = np.empty((len(OHLCV_COLUMNS), len(starts)))
+    result[0] = values[0, starts]
+    result[1] = np.maximum.reduceat(values[1, starts[0]:], starts - starts[0])
+    result[2] = np.minimum.reduceat(values[2, starts[0]:], starts - starts[0])
+    result[3] = values[3, ends]
+    result[4] = np.add.reduceat(values[4, starts[0]:], starts - starts[0])
+    return buckets[starts], result
+
+
+class CandleBuffer:
+    def __init__(self, capacity: int):
+        """
+        Ring buffer com o dobro da capacidade: quando o fim é atingido, as
+        últimas velas são movidas para o início, mantendo a janela contígua
+        """
+        self.capacity = capacity
+        self._timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self._values = np.zeros((len(OHLCV_COLUMNS), 2 * capacity), dtype=np.float64)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._timestamps[self._start:self._end]
+
+    def column(self, name: str) -> np.ndarray:
+        return self._values[OHLCV_COLUMNS.index(name), self._start:self._end]
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        return int(self._timestamps[self._end - 1]) if len(self) else None
+
+    def clear(self):
+        self._start = 0
+        self._end = 0
+
+    def _append(self, timestamps: np.ndarray, values: np.ndarray):
+        count = len(timestamps)
+        if count == 0:
+            return
+        if count >= self.capacity:
+            timestamps = timestamps[-self.capacity:]
+            values = values[:, -self.capacity:]
+            count = self.capacity
+            self._start = self._end = 0
+        elif self._end + count > len(self._timestamps):
+            # Compacta: mantém apenas as velas que continuarão na janela
+            keep = min(len(self), self.capacity - count)
+            src = slice(self._end - keep, self._end)
+            self._timestamps[:keep] = self._timestamps[src]
+            self._values[:, :keep] = self._values[:, src]
+            self._start, self._end = 0, keep
+
+        self._timestamps[self._end:self._end + count] = timestamps
+        self._values[:, self._end:self._end + count] = values
+        self._end += count
+        if len(self) > self.capacity:
+            self._start = self._end - self.capacity
+
+    def merge(self, ohlcv: list):
+        """
+        Incorpora candles no formato do ccxt ([ts, o, h, l, c, v]), substituindo
+        a última vela (ainda aberta) e anexando apenas as mais novas
+        """
+        if not ohlcv:
+            return
+        rows = np.asarray(ohlcv, dtype=np.float64)
+        order = np.argsort(rows[:, 0], kind='stable')
+        rows = rows[order]
+        timestamps = rows[:, 0].astype(np.int64)
+        values = rows[:, 1:1 + len(OHLCV_COLUMNS)].T
+
+        last = self.last_timestamp
+        if last is not None:
+            newer = timestamps >= last
+            timestamps = timestamps[newer]
+            values = values[:, newer]
+            if len(timestamps) and timestamps[0] == last:
+                self._values[:, self._end - 1] = values[:, 0]
+                timestamps = timestamps[1:]
+                values = values[:, 1:]
+
+        self._append(timestamps, values)
+
+    def to_frame(self, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        DataFrame sobre as últimas `limit` velas. As colunas OHLCV são views do
+        buffer, válidas apenas até a próxima atualização
+        """
+        start = self._start if limit is None else max(self._start, self._end - limit)
+        window = slice(start, self._end)
+        data = {'timestamp': pd.to_datetime(self._timestamps[window], unit='ms')}
+        for index, name in enumerate(OHLCV_COLUMNS):
+            data[name] = self._values[index, window]
+        return pd.DataFrame(data, copy=False)
+
+
+class CandleStore:
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self._buffers: Dict[Tuple[str, str], CandleBuffer] = {}
+        self._lock = threading.RLock()
+
+    def get(self, symbol: str, timeframe: str) -> Optional[CandleBuffer]:
+        return self._buffers.get((symbol, timeframe))
+
+    def _buffer(self, symbol: str, timeframe: str, capacity: int) -> CandleBuffer:
+        with self._lock:
+            key = (symbol, timeframe)
+            buffer = self._buffers.get(key)
+            if buffer is None or buffer.capacity < capacity:
+                buffer = CandleBuffer(max(capacity, self.capacity))
+                self._buffers[key] = buffer
+            return buffer
+
+    def discard(self, symbol: str):
+        """
+        Remove os buffers de todos os timeframes do símbolo
+        """
+        with self._lock:
+            for key in [key for key in self._buffers if key[0] == symbol]:
+                del self._buffers[key]
+
+    def since(self, symbol: str, timeframe: str, now_ms: int, limit: Optional[int] = None) -> Optional[int]:
+        """
+        Timestamp a partir do qual buscar novos candles, ou None se for
+        necessária uma carga completa (buffer vazio, pequeno ou muito defasado)
+        """
+        limit = limit or self.capacity
+        buffer = self.get(symbol, timeframe)
+        if buffer is None or len(buffer) < limit or buffer.capacity < limit:
+            return None
+        last = buffer.last_timestamp
+        if (now_ms - last) // timeframe_to_ms(timeframe) >= buffer.capacity - 1:
+            return None
+        return last
+
+    def merge(self, symbol: str, timeframe: str, ohlcv: list, full: bool = False, limit: Optional[int] = None):
+        with self._lock:
+            buffer = self._buffer(symbol, timeframe, limit or self.capacity)
+            if full:
+                buffer.clear()
+            buffer.merge(ohlcv)
+            return buffer
+
+    def merge_contiguous(self, symbol: str, timeframe: str, row: list) -> bool:
+        """
+        Incorpora uma única vela se ela não deixar lacuna após a última
+        armazenada; retorna False se o par precisar de uma nova carga
+        """
+        with self._lock:
+            buffer = self.get(symbol, timeframe)
+            last = buffer.last_timestamp if buffer is not None else None
+            if last is None or row[0] > last + timeframe_to_ms(timeframe):
+                return False
+            buffer.merge([row])
+            return True
+
+    def frame(self, symbol: str, timeframe: str, limit: Optional[int] = None, copy: bool = False) -> Optional[pd.DataFrame]:
+        """
+        DataFrame das últimas `limit` velas do par; com copy=True o resultado
+        não é afetado por atualizações posteriores
+        """
+        with self._lock:
+            buffer = self.get(symbol, timeframe)
+            if buffer is None or len(buffer) == 0:
+                return None
+            df = buffer.to_frame(limit)
+            return df.copy() if copy else df
+
+    def resampled_frame(self, symbol: str, base_timeframe: str, timeframe: str,
+                        limit: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """
+        DataFrame de `timeframe` derivado das velas de `base_timeframe` do par
+        (sempre uma cópia nova)
+        """
+        with self._lock:
+            buffer = self.get(symbol, base_timeframe)
+            if buffer is None or len(buffer) == 0:
+                return None
+            values = np.vstack([buffer.column(name) for name in OHLCV_COLUMNS])
+            timestamps, values = resample(buffer.timestamps, values, timeframe)
+        if limit is not None:
+            timestamps = timestamps[-limit:]
+            values = values[:, -limit:]
+        data = {'timestamp': pd.to_datetime(timestamps, unit='ms')}
+        for index, name in enumerate(OHLCV_COLUMNS):
+            data[name] = values[index]
+        return pd.DataFrame(data)
+
+    def last_close(self, symbol: str, timeframe: str) -> Optional[float]:
+        with self._lock:
+            buffer = self.get(symbol, timeframe)
+            if buffer is None or len(buffer) == 0:
+                return None
+            return float(buffer.column('close')[-1])
@@ -0,0 +1,91 @@
+"""
+Agenda a análise de cada timeframe para logo após o fechamento das velas.
+
+Os sinais só são confirmados em velas fechadas, então um timeframe só
+precisa ser reavaliado quando uma vela dele fecha (o 1d uma vez por dia).
+Os fechamentos ficam em uma fila de prioridade por horário; fechamentos
+simultâneos saem do menor timeframe para o maior, e entre eles o bot faz
+apenas atualizações de preço.
+"""
+import heapq
+import threading
+import time
+from typing import Iterable, List, Optional
+
+from candle_store import timeframe_to_ms
+
+
+def next_close(timeframe: str, now_ms: int) -> int:
+    """
+    Horário (ms) do próximo fechamento de vela do timeframe, nas fronteiras UTC da Binance
+    """
+    duration = timeframe_to_ms(timeframe)
+    return (now_ms // duration + 1) * duration
+
+
+class CloseScheduler:
+    def __init__(self, timeframes: Iterable[str], grace: float = 3.0):
+        """
+        grace: segundos de espera após o fechamento para a vela nova já
+        aparecer na API; dispensada quando o fechamento é confirmado (stream)
+        """
+        self.grace_ms = int(grace * 1000)
+        self._lock = threading.Lock()
+        self._confirmed = set()
+        # (fechamento em ms, duração do timeframe, timeframe); todos começam vencidos
+        self._queue = [(0, timeframe_to_ms(timeframe), timeframe) for timeframe in timeframes]
+        heapq.heapify(self._queue)
+
+    def confirm(self, timeframes: Iterable[str]):
+        """
+        Informa que as velas desses timeframes já fecharam (ex.: kline final do stream)
+        """
+        with self._lock:
+            self._confirmed.update(timeframes)
+
+    def retry(self, timeframes: Iterable[str], delay: float = 60.0, now_ms: Optional[int] = None):
+        """
+        Reagenda a análise desses timeframes para daqui a `delay` segundos
+        (ex.: coleta falhou), antes do próximo fechamento
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        timeframes = set(timeframes)
+        with self._lock:
+            self._queue = [entry for entry in self._queue if entry[2] not in timeframes]
+            for timeframe in timeframes:
+                self._queue.append((now_ms + int(delay * 1000) - self.grace_ms, timeframe_to_ms(timeframe), timeframe))
+            heapq.heapify(self._queue)
+
+    def pop_due(self, now_ms: Optional[int] = None) -> List[str]:
+        """
+        Timeframes com fechamento pendente de análise, do menor para o maior,
+        já reagendados para o fechamento seguinte
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        due = []
+        with self._lock:
+            waiting = []
+            while self._queue and self._queue[0][0] <= now_ms:
+                entry = heapq.heappop(self._queue)
+                close_ms, _, timeframe = entry
+                if close_ms + self.grace_ms <= now_ms or timeframe in self._confirmed:
+                    due.append(entry)
+                else:
+                    waiting.append(entry)
+            for entry in waiting:
+                heapq.heappush(self._queue, entry)
+            for _, duration, timeframe in due:
+                heapq.heappush(self._queue, (next_close(timeframe, now_ms), duration, timeframe))
+            self._confirmed.clear()
+        due.sort(key=lambda entry: entry[1])
+        return [timeframe for _, _, timeframe in due]
+
+    def seconds_until_due(self, now_ms: Optional[int] = None) -> float:
+        """
+        Segundos até o próximo timeframe vencer (0 se já houver algum)
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        with self._lock:
+            if not self._queue:
+                return float('inf')
+            return max(0.0, (self._queue[0][0] + self.grace_ms - now_ms) / 1000)
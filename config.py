@@ -1,4 +1,66 @@
+import os
+import tempfile
+
 # Configurações de Email
 EMAIL_FROM = "caiquerossini99@gmail.com"  # Seu email do Gmail
 EMAIL_PASS = "oraoreqcpawnuogq"     # Cole aqui a senha de 16 caracteres gerada pelo Google
-EMAIL_TO = "caiquerossini99@gmail.com" # Email que receberá os alertas 
\ No newline at end of file
+EMAIL_TO = "caiquerossini99@gmail.com" # Email que receberá os alertas
+EMAIL_SMTP_HOST = os.environ.get('EMAIL_SMTP_HOST', 'smtp.gmail.com')
+EMAIL_SMTP_PORT = int(os.environ.get('EMAIL_SMTP_PORT', 465))
+EMAIL_SMTP_SSL = os.environ.get('EMAIL_SMTP_SSL', '1').lower() in ('1', 'true', 'yes')  # 0 para um servidor SMTP local de teste
+EMAIL_ENABLED = os.environ.get('EMAIL_ENABLED', '1').lower() in ('1', 'true', 'yes')  # 0 desliga os alertas (ex.: load_test.py)
+
+# Coleta de dados
+# Espelhos da API (separados por vírgula) no lugar dos da Binance, ex.: o fake_binance.py local
+BINANCE_API_URLS = [url for url in os.environ.get('BINANCE_API_URLS', '').split(',') if url]
+FETCH_MAX_WORKERS = int(os.environ.get('FETCH_MAX_WORKERS', 12))  # Requisições simultâneas
+BINANCE_WEIGHT_PER_MINUTE = int(os.environ.get('BINANCE_WEIGHT_PER_MINUTE', 3000))  # Metade do limite de 6000/min por IP
+MIRROR_FAILURE_THRESHOLD = int(os.environ.get('MIRROR_FAILURE_THRESHOLD', 5))  # Falhas consecutivas que tiram um espelho da rota
+MIRROR_COOLDOWN = float(os.environ.get('MIRROR_COOLDOWN', 30))  # segundos até testar de novo um espelho aberto
+FETCH_HEDGE = os.environ.get('FETCH_HEDGE', '1').lower() in ('1', 'true', 'yes')  # Repete no próximo espelho após o p95
+
+# Análise de sinais
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 0))  # Processos de análise (0/1 = no próprio processo)
+
+# Estado compartilhado entre os workers do gunicorn (lock do produtor e snapshot)
+SHARED_STATE_DIR = os.environ.get('SHARED_STATE_DIR') or ('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+
+# Cache dos metadados de mercado (evita load_markets a cada inicialização)
+MARKETS_CACHE_PATH = os.environ.get('MARKETS_CACHE_PATH', os.path.join(SHARED_STATE_DIR, 'binance_markets.json'))
+MARKETS_CACHE_TTL = int(os.environ.get('MARKETS_CACHE_TTL', 6 * 3600))  # segundos
+QUOTE_CURRENCY = 'USDT'  # Apenas pares contra esta moeda são monitorados
+
+# Universo de símbolos: os WATCHLIST_SIZE pares mais negociados em 24h (0 = lista fixa do crypto_bot.py)
+WATCHLIST_SIZE = int(os.environ.get('WATCHLIST_SIZE', 30))
+WATCHLIST_REFRESH = int(os.environ.get('WATCHLIST_REFRESH', 3600))  # segundos
+WATCHLIST_EXCLUDE = os.environ.get('WATCHLIST_EXCLUDE', 'USDC,FDUSD,TUSD,USDP,DAI,BUSD,EUR,AEUR,EURI,USDE,XUSD').split(',')  # Stablecoins
+
+# Timeframes derivados localmente das velas base (apenas a base é buscada na exchange)
+BASE_TIMEFRAME = os.environ.get('BASE_TIMEFRAME', '1h')
+DERIVED_TIMEFRAMES = [tf for tf in os.environ.get('DERIVED_TIMEFRAMES', '2h,4h,6h,12h').split(',') if tf]  # vazio desativa
+MAX_BASE_CANDLES = 1000  # Limite de velas por requisição de klines da Binance
+
+# Agendamento: cada timeframe é analisado logo após o fechamento das suas velas
+CLOSE_GRACE = float(os.environ.get('CLOSE_GRACE', 3))  # segundos de espera após o fechamento
+PRICE_REFRESH_INTERVAL = float(os.environ.get('PRICE_REFRESH_INTERVAL', 5))  # segundos entre consultas de preço (ticker)
+
+# Cada conexão do /stream ocupa uma thread do worker: após este tempo ela é encerrada e o navegador reconecta
+STREAM_MAX_SECONDS = float(os.environ.get('STREAM_MAX_SECONDS', 300))
+
+# Streams de kline via WebSocket (opcional, requer o pacote websockets)
+KLINE_STREAM_ENABLED = os.environ.get('KLINE_STREAM_ENABLED', '').lower() in ('1', 'true', 'yes')
+KLINE_STREAM_URL = os.environ.get('KLINE_STREAM_URL', 'wss://stream.binance.com:9443/stream')
+KLINE_STREAM_REFRESH = float(os.environ.get('KLINE_STREAM_REFRESH', 5))  # segundos entre publicações de preço
+KLINE_STREAM_RECORD_PATH = os.environ.get('KLINE_STREAM_RECORD_PATH') or None  # Grava as mensagens para o kline_replay.py
+
+# Registro dos alertas enviados (deduplicação persistente, compartilhada entre os workers).
+# Fica em disco, junto do arquivo de candles: em /dev/shm se perderia a cada reinício
+SIGNAL_STORE_PATH = os.environ.get('SIGNAL_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'signals.sqlite3'))
+SIGNAL_STORE_TTL = int(os.environ.get('SIGNAL_STORE_TTL', 7 * 86400))  # segundos
+SIGNAL_STORE_MAX_ENTRIES = int(os.environ.get('SIGNAL_STORE_MAX_ENTRIES', 10000))
+
+# Arquivo local de candles fechados (vazio desativa); usado no warm start e nos backtests
+OHLCV_ARCHIVE_DIR = os.environ.get('OHLCV_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'ohlcv'))
+
+# Backtest
+BACKTEST_CACHE_DIR = os.environ.get('BACKTEST_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'crypto_backtest_cache'))
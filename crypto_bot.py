@@ -1,17 +1,27 @@
 import ccxt
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 import time
 import os
 from dotenv import load_dotenv
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from typing import Union, List, Tuple
+from typing import Optional
 import config  # Importa as configurações de email
+import indicators
+from fetch_scheduler import TICKER_PRICE_WEIGHT, TICKERS_WEIGHT, FetchScheduler
+from metrics import DATA_AGE, STAGE_SECONDS, SWEEP_SECONDS
+from close_scheduler import CloseScheduler
+from candle_store import OHLCV_COLUMNS, CandleStore, resample_factor, timeframe_to_ms
+from ohlcv_archive import OhlcvArchive
+from kline_stream import KlineStream
+from alerts import Alert, EmailDispatcher
+from signal_store import SignalDedupStore
+from analysis_pool import AnalysisExecutor, PairTask, run_task
+from markets_cache import compact_markets, load_markets_cache, save_markets_cache
+from watchlist import rank_symbols, tradable_symbols
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 import logging
-import random
 
 # Configuração de logging
 logging.basicConfig(
@@ -33,33 +43,31 @@ BINANCE_URLS = [
     'https://api4.binance.com/api/v3'
 ]
 
+# Símbolos usados quando o universo dinâmico está desativado (WATCHLIST_SIZE=0)
+DEFAULT_SYMBOLS = [
+    'BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'XRP/USDT',
+    'ADA/USDT', 'DOGE/USDT', 'SOL/USDT', 'DOT/USDT',
+    'POL/USDT', 'AVAX/USDT'
+]
+
 class HeikinAshi:
     @staticmethod
     def calculate(df: pd.DataFrame) -> pd.DataFrame:
         """
         Calcula os candles Heikin Ashi
         """
-        ha_df = df.copy()
-        
-        # Cálculo do Heikin Ashi
-        ha_df['ha_close'] = (df['open'] + df['high'] + df['low'] + df['close']) / 4
-        
-        # Primeiro candle
-        ha_df.loc[ha_df.index[0], 'ha_open'] = (df['open'].iloc[0] + df['close'].iloc[0]) / 2
-        
-        # Demais candles
-        for i in range(1, len(df)):
-            ha_df.loc[ha_df.index[i], 'ha_open'] = (ha_df['ha_open'].iloc[i-1] + ha_df['ha_close'].iloc[i-1]) / 2
-        
-        ha_df['ha_high'] = df[['high', 'open', 'close']].max(axis=1)
-        ha_df['ha_low'] = df[['low', 'open', 'close']].min(axis=1)
+        with STAGE_SECONDS.time(stage='heikin_ashi'):
+            ha_open, ha_high, ha_low, ha_close = indicators.heikin_ashi(
+                df['open'].to_numpy(), df['high'].to_numpy(),
+                df['low'].to_numpy(), df['close'].to_numpy()
+            )
         
         # Substitui as colunas originais pelos valores Heikin Ashi
         result = df.copy()
-        result['open'] = ha_df['ha_open']
-        result['high'] = ha_df['ha_high']
-        result['low'] = ha_df['ha_low']
-        result['close'] = ha_df['ha_close']
+        result['open'] = ha_open
+        result['high'] = ha_high
+        result['low'] = ha_low
+        result['close'] = ha_close
         
         return result
 
@@ -74,132 +82,56 @@ class ChandelierExit:
         if not all(col in df.columns for col in required_columns):
             raise ValueError(f"DataFrame deve conter as colunas {required_columns}")
             
+        ce = self.calculate_arrays(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy())
+        
         result = df.copy()
-        result['atr'] = self._calculate_atr(result, self.atr_period) * self.atr_multiplier
-        
-        result['long_stop'] = np.nan
-        result['short_stop'] = np.nan
-        result['direction'] = 1
-        result['buy_signal'] = False
-        result['sell_signal'] = False
-        
-        for i in range(self.atr_period, len(result)):
-            if self.use_close:
-                highest = result['close'].iloc[i-self.atr_period:i].max()
-                lowest = result['close'].iloc[i-self.atr_period:i].min()
-            else:
-                highest = result['high'].iloc[i-self.atr_period:i].max()
-                lowest = result['low'].iloc[i-self.atr_period:i].min()
-                
-            long_stop = highest - result['atr'].iloc[i]
-            short_stop = lowest + result['atr'].iloc[i]
-            
-            if i > self.atr_period:
-                long_stop_prev = result['long_stop'].iloc[i-1]
-                if pd.notna(long_stop_prev):
-                    if result['close'].iloc[i-1] > long_stop_prev:
-                        long_stop = max(long_stop, long_stop_prev)
-                        
-                short_stop_prev = result['short_stop'].iloc[i-1]
-                if pd.notna(short_stop_prev):
-                    if result['close'].iloc[i-1] < short_stop_prev:
-                        short_stop = min(short_stop, short_stop_prev)
-            
-            result.loc[result.index[i], 'long_stop'] = long_stop
-            result.loc[result.index[i], 'short_stop'] = short_stop
-            
-            if i > self.atr_period:
-                prev_dir = result['direction'].iloc[i-1]
-                prev_close = result['close'].iloc[i-1]
-                prev_long_stop = result['long_stop'].iloc[i-1]
-                prev_short_stop = result['short_stop'].iloc[i-1]
-                
-                if result['close'].iloc[i] > prev_short_stop:
-                    result.loc[result.index[i], 'direction'] = 1
-                elif result['close'].iloc[i] < prev_long_stop:
-                    result.loc[result.index[i], 'direction'] = -1
-                else:
-                    result.loc[result.index[i], 'direction'] = prev_dir
-                    
-                curr_dir = result['direction'].iloc[i]
-                
-                if curr_dir == 1 and prev_dir == -1:
-                    result.loc[result.index[i], 'buy_signal'] = True
-                    
-                if curr_dir == -1 and prev_dir == 1:
-                    result.loc[result.index[i], 'sell_signal'] = True
+        result['atr'] = ce.atr
+        result['long_stop'] = ce.long_stop
+        result['short_stop'] = ce.short_stop
+        result['direction'] = ce.direction
+        result['buy_signal'] = ce.buy_signal
+        result['sell_signal'] = ce.sell_signal
         
         return result
     
+    def calculate_arrays(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> indicators.ChandelierArrays:
+        """
+        Versão sobre arrays NumPy, sem passar por DataFrames
+        """
+        with STAGE_SECONDS.time(stage='chandelier_exit'):
+            return indicators.chandelier_exit(high, low, close, self.atr_period, self.atr_multiplier, self.use_close)
+    
     def _calculate_atr(self, df: pd.DataFrame, period: int) -> pd.Series:
-        high = df['high']
-        low = df['low']
-        close = df['close']
-        
-        tr1 = high - low
-        tr2 = abs(high - close.shift())
-        tr3 = abs(low - close.shift())
-        
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        atr = tr.rolling(window=period).mean()
-        
-        return atr
+        tr = indicators.true_range(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy())
+        return pd.Series(indicators.rolling_mean(tr, period), index=df.index)
 
 class CryptoBot:
-    def __init__(self):
+    def __init__(self, exchanges: Optional[list] = None, symbols: Optional[list] = None,
+                 timeframes: Optional[list] = None, email_dispatcher=None,
+                 signal_store_path: Optional[str] = None, archive_dir: Optional[str] = None,
+                 candle_capacity: int = 100, analysis_workers: Optional[int] = None, connect: bool = True):
         """
-        Inicializa o bot com a Binance (apenas API pública)
+        Inicializa o bot com a Binance (apenas API pública). Os argumentos
+        substituem os valores do config (ex.: testes e benchmark.py):
+        exchanges: clientes ccxt, um por espelho (padrão: BINANCE_API_URLS)
+        symbols/timeframes: universo inicial de pares
+        email_dispatcher: destino dos alertas (padrão: EmailDispatcher do config)
+        signal_store_path: banco de deduplicação (':memory:' não persiste)
+        archive_dir: arquivo de velas fechadas ('' desliga)
+        connect: False não acessa a Binance (sem mercados, watchlist, warm
+            start nem stream de klines)
         """
         logger.info("Iniciando inicialização do bot...")
         try:
-            # Configuração da Binance com múltiplas URLs
-            self.exchanges = []
-            
-            # Configuração base da exchange
-            exchange_config = {
-                'enableRateLimit': True,
-                'timeout': 30000,  # 30 segundos de timeout
-                'options': {
-                    'defaultType': 'spot',
-                    'adjustForTimeDifference': True,
-                    'recvWindow': 60000,
-                    'createMarketBuyOrderRequiresPrice': False,
-                    'defaultTimeInForce': 'GTC',
-                    'warnOnFetchOHLCVLimitArgument': False,
-                    'fetchImplementation': 'default',
-                    'fetchTradesMethod': 'publicGetAggTrades',
-                }
-            }
-            
-            # Tenta configurar cada URL
-            for url in BINANCE_URLS:
-                try:
-                    config = exchange_config.copy()
-                    config['urls'] = {
-                        'api': {
-                            'public': url,
-                            'private': url,
-                        }
-                    }
-                    
-                    exchange = ccxt.binance(config)
-                    self.exchanges.append(exchange)
-                    logger.info(f"Exchange configurada com sucesso para URL: {url}")
-                except Exception as e:
-                    logger.warning(f"Erro ao configurar exchange com URL {url}: {str(e)}")
-
+            self.exchanges = list(exchanges) if exchanges is not None else self._create_exchanges()
             if not self.exchanges:
                 raise Exception("Nenhuma exchange pôde ser configurada")
 
             self.exchange = self.exchanges[0]  # Use a primeira exchange como padrão
             
-            # Define os símbolos e timeframes
-            self.symbols = [
-                'BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'XRP/USDT', 
-                'ADA/USDT', 'DOGE/USDT', 'SOL/USDT', 'DOT/USDT',
-                'MATIC/USDT', 'AVAX/USDT'
-            ]
-            self._timeframes = ['1h', '2h', '1d']
+            # Define os símbolos (atualizados pelo refresh_watchlist) e timeframes
+            self.symbols = list(symbols if symbols is not None else DEFAULT_SYMBOLS)
+            self._timeframes = list(timeframes or ['1h', '2h', '1d'])
             
             # Inicializa estruturas de dados
             self.signal_history = {timeframe: {} for timeframe in self._timeframes}
@@ -207,15 +139,84 @@ class CryptoBot:
                 for symbol in self.symbols:
                     self.signal_history[timeframe][symbol] = None
             
-            self.sent_emails = {}
+            # Alertas já enviados, por (symbol, timeframe, tipo, vela)
+            self.sent_signals = SignalDedupStore(
+                signal_store_path or config.SIGNAL_STORE_PATH,
+                ttl=config.SIGNAL_STORE_TTL,
+                max_entries=config.SIGNAL_STORE_MAX_ENTRIES
+            )
+            self.email_dispatcher = email_dispatcher
+            if email_dispatcher is None and config.EMAIL_ENABLED and all([config.EMAIL_FROM, config.EMAIL_PASS, config.EMAIL_TO]):
+                # Envio em segundo plano, com sessão SMTP reaproveitada e um email por varredura
+                self.email_dispatcher = EmailDispatcher(
+                    config.EMAIL_FROM, config.EMAIL_PASS, config.EMAIL_TO,
+                    host=config.EMAIL_SMTP_HOST,
+                    port=config.EMAIL_SMTP_PORT,
+                    use_ssl=config.EMAIL_SMTP_SSL,
+                    on_failed=self._email_failed
+                )
+            
+            # Candles armazenados incrementalmente por (symbol, timeframe)
+            self.candle_store = CandleStore(capacity=candle_capacity)
+            
+            # Arquivo local das velas fechadas: warm start e histórico para backtests
+            if archive_dir is None:
+                archive_dir = config.OHLCV_ARCHIVE_DIR
+            self.archive = OhlcvArchive(archive_dir) if archive_dir else None
+            
+            # Análise de cada timeframe logo após o fechamento das velas
+            self.close_scheduler = CloseScheduler(self._timeframes, grace=config.CLOSE_GRACE)
+            
+            # Horário da última atualização dos candles de cada par (métrica de atualidade)
+            self._updated_at = {}
+            DATA_AGE.set_function(self._data_age)
+            
+            # Estado incremental dos indicadores por (symbol, timeframe)
+            self.indicator_states = {}
+            self.analysis_executor = AnalysisExecutor(
+                workers=config.ANALYSIS_WORKERS if analysis_workers is None else analysis_workers
+            )
             
             # Inicializa indicadores
             self.chandelier = ChandelierExit(atr_period=2, atr_multiplier=1.0, use_close=False)
             self.heikin_ashi = HeikinAshi()
             
             # Testa a conexão
-            logger.info("Testando conexão com a Binance...")
-            self._test_connection()
+            self.markets = {}
+            if connect:
+                logger.info("Testando conexão com a Binance...")
+                self._test_connection()
+            
+            # Agendador de coletas paralelas entre os espelhos (também usado pelos tickers de 24h)
+            self.fetch_scheduler = FetchScheduler(
+                self.exchanges,
+                self._fetch_ohlcv_with_exchange,
+                max_workers=config.FETCH_MAX_WORKERS,
+                weight_per_minute=config.BINANCE_WEIGHT_PER_MINUTE,
+                failure_threshold=config.MIRROR_FAILURE_THRESHOLD,
+                cooldown=config.MIRROR_COOLDOWN,
+                hedge=config.FETCH_HEDGE
+            )
+            
+            # Universo de símbolos a partir dos tickers de 24h, antes da primeira carga
+            self.kline_stream = None
+            self._watchlist_updated = 0.0
+            if connect:
+                self.refresh_watchlist(force=True)
+                self._warm_start()
+            
+            # Stream de klines (opcional): mantém o candle store atualizado entre as varreduras
+            if connect and config.KLINE_STREAM_ENABLED:
+                pairs = list(self._source_limits(
+                    [(symbol, timeframe) for timeframe in self._timeframes for symbol in self.symbols]
+                ))
+                self.kline_stream = KlineStream(
+                    self.candle_store, pairs,
+                    url=config.KLINE_STREAM_URL,
+                    record_path=config.KLINE_STREAM_RECORD_PATH
+                )
+                if not self.kline_stream.start():
+                    self.kline_stream = None
             
             logger.info("Bot inicializado com sucesso!")
             logger.info(f"Monitorando {len(self.symbols)} pares: {', '.join(self.symbols)}")
@@ -224,82 +225,321 @@ class CryptoBot:
             logger.error(f"Erro ao inicializar o bot: {str(e)}")
             raise
 
-    def _test_connection(self):
+    def _create_exchanges(self) -> list:
         """
-        Testa a conexão com todas as URLs disponíveis
+        Um cliente ccxt por URL da Binance
         """
-        success = False
-        errors = []
+        # Configuração da Binance com múltiplas URLs
+        exchanges = []
         
-        for exchange in self.exchanges:
+        # Configuração base da exchange
+        exchange_config = {
+            'enableRateLimit': True,
+            'timeout': 30000,  # 30 segundos de timeout
+            'options': {
+                'defaultType': 'spot',
+                'adjustForTimeDifference': True,
+                'recvWindow': 60000,
+                'createMarketBuyOrderRequiresPrice': False,
+                'defaultTimeInForce': 'GTC',
+                'warnOnFetchOHLCVLimitArgument': False,
+                'fetchImplementation': 'default',
+                'fetchTradesMethod': 'publicGetAggTrades',
+                'fetchMarkets': ['spot'],  # Apenas mercados spot são monitorados
+            }
+        }
+        
+        # Uma conexão por requisição simultânea ao mesmo espelho (com hedge, até duas
+        # por coleta); o pool padrão do urllib3 (10) descartaria as excedentes
+        pool_size = config.FETCH_MAX_WORKERS * (2 if config.FETCH_HEDGE else 1)
+        
+        # Tenta configurar cada URL (BINANCE_API_URLS substitui os espelhos, ex.: fake_binance.py)
+        for url in config.BINANCE_API_URLS or BINANCE_URLS:
             try:
-                # Tenta carregar os mercados
-                exchange.load_markets()
-                
-                # Tenta obter dados de teste
-                test_symbol = 'BTC/USDT'
-                test_data = self._get_historical_data_with_exchange(exchange, test_symbol, '1h', 10)
+                url_config = exchange_config.copy()
+                url_config['urls'] = {
+                    'api': {
+                        'public': url,
+                        'private': url,
+                    }
+                }
                 
-                if test_data is not None and len(test_data) > 0:
-                    self.exchange = exchange  # Define esta como a exchange principal
-                    success = True
-                    logger.info(f"Conexão bem sucedida com {exchange.urls['api']['public']}")
-                    break
+                exchange = ccxt.binance(url_config)
+                adapter = HTTPAdapter(pool_maxsize=max(pool_size, 10))
+                exchange.session.mount('https://', adapter)
+                exchange.session.mount('http://', adapter)
+                exchanges.append(exchange)
+                logger.info(f"Exchange configurada com sucesso para URL: {url}")
             except Exception as e:
-                error_msg = f"Erro com {exchange.urls['api']['public']}: {str(e)}"
-                logger.warning(error_msg)
-                errors.append(error_msg)
-                continue
+                logger.warning(f"Erro ao configurar exchange com URL {url}: {str(e)}")
+
+        return exchanges
+
+    def _probe_mirrors(self):
+        """
+        Envia um ping (peso 1) a todos os espelhos em paralelo e retorna o
+        primeiro que responder, sem esperar pelos demais
+        """
+        errors = []
+        executor = ThreadPoolExecutor(max_workers=len(self.exchanges), thread_name_prefix='probe')
+        try:
+            futures = {executor.submit(exchange.public_get_ping): exchange for exchange in self.exchanges}
+            for future in as_completed(futures):
+                exchange = futures[future]
+                try:
+                    future.result()
+                    logger.info(f"Conexão bem sucedida com {exchange.urls['api']['public']}")
+                    return exchange
+                except Exception as e:
+                    error_msg = f"Erro com {exchange.urls['api']['public']}: {str(e)}"
+                    logger.warning(error_msg)
+                    errors.append(error_msg)
+        finally:
+            executor.shutdown(wait=False)
         
-        if not success:
-            raise Exception(f"Falha ao conectar com todas as URLs da Binance. Erros: {'; '.join(errors)}")
+        raise Exception(f"Falha ao conectar com todas as URLs da Binance. Erros: {'; '.join(errors)}")
 
-    def _get_historical_data_with_exchange(self, exchange, symbol, timeframe='1h', limit=100):
+    def _test_connection(self):
         """
-        Obtém dados históricos usando uma exchange específica
+        Testa a conexão com as URLs disponíveis e carrega os metadados de mercado,
+        usando o cache local quando válido
+        """
+        self.exchange = self._probe_mirrors()  # Define a mais rápida como a exchange principal
+        self._load_markets()
+
+    def _load_markets(self, reload=False):
+        """
+        Metadados de mercado do cache local ou, se expirado, da Binance
         """
+        markets = load_markets_cache(config.MARKETS_CACHE_PATH, config.MARKETS_CACHE_TTL)
+        if markets is None:
+            # Apenas um espelho baixa os mercados; os demais recebem a mesma cópia
+            markets = compact_markets(self.exchange.load_markets(reload=reload), config.QUOTE_CURRENCY)
+            save_markets_cache(config.MARKETS_CACHE_PATH, markets)
+        
+        for exchange in self.exchanges:
+            exchange.set_markets(markets)
+        self.markets = markets
+        return markets
+
+    def refresh_watchlist(self, force=False):
+        """
+        Atualiza o universo de símbolos a cada WATCHLIST_REFRESH segundos com
+        um único fetch_tickers(), descartando mercados deslistados ou
+        suspensos. Retorna os símbolos adicionados (que ainda precisam de análise)
+        """
+        if not force and time.monotonic() - self._watchlist_updated < config.WATCHLIST_REFRESH:
+            return []
+        self._watchlist_updated = time.monotonic()
         try:
-            # Adiciona um pequeno delay para respeitar rate limits
-            time.sleep(0.1)
-            
-            # Tenta obter os dados OHLCV
-            ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-            
-            if not ohlcv or len(ohlcv) == 0:
-                logger.warning(f"Nenhum dado retornado para {symbol} em {exchange.urls['api']['public']}")
-                return None
-            
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df = df.sort_values('timestamp')
-            df = df.reset_index(drop=True)
-            
-            return df
+            # Após o TTL do cache, os metadados são recarregados e revelam mercados desativados
+            markets = self._load_markets(reload=not force)
+            if config.WATCHLIST_SIZE > 0:
+                # Mesmo orçamento de peso e failover das coletas de candles
+                tickers = self.fetch_scheduler.call(lambda exchange: exchange.fetch_tickers() or None,
+                                                    TICKERS_WEIGHT, 'consulta de tickers')
+                if tickers is None:
+                    return []
+                symbols = rank_symbols(tickers, markets, config.QUOTE_CURRENCY,
+                                       config.WATCHLIST_SIZE, config.WATCHLIST_EXCLUDE)
+            else:
+                symbols = tradable_symbols(DEFAULT_SYMBOLS, markets)
         except Exception as e:
-            logger.error(f"Erro ao obter dados com exchange {exchange.urls['api']['public']}: {str(e)}")
+            logger.warning(f"Erro ao atualizar a lista de símbolos: {str(e)}")
+            return []
+        
+        if not symbols or symbols == self.symbols:
+            return []
+        added = [symbol for symbol in symbols if symbol not in self.symbols]
+        removed = [symbol for symbol in self.symbols if symbol not in symbols]
+        self.set_symbols(symbols)
+        logger.info(f"Lista de símbolos atualizada: {len(symbols)} pares "
+                    f"(+{len(added)}: {', '.join(added) or '-'}; -{len(removed)}: {', '.join(removed) or '-'})")
+        return added
+
+    def set_symbols(self, symbols):
+        """
+        Troca os símbolos monitorados, preservando o estado dos que continuam
+        """
+        removed = set(self.symbols) - set(symbols)
+        self.symbols = list(symbols)
+        for timeframe in self._timeframes:
+            history = self.signal_history.setdefault(timeframe, {})
+            for symbol in removed:
+                history.pop(symbol, None)
+            for symbol in self.symbols:
+                history.setdefault(symbol, None)
+        for symbol in removed:
+            self.candle_store.discard(symbol)
+        for key in [key for key in self.indicator_states if key[0] in removed]:
+            del self.indicator_states[key]
+        for key in [key for key in self._updated_at if key[0] in removed]:
+            del self._updated_at[key]
+        if self.kline_stream is not None:
+            self.kline_stream.update_pairs(self._source_limits(
+                [(symbol, timeframe) for timeframe in self._timeframes for symbol in self.symbols]
+            ))
+
+    def _fetch_ohlcv_with_exchange(self, exchange, symbol, timeframe='1h', limit=100, since=None):
+        """
+        Obtém os candles brutos do ccxt usando uma exchange específica. Erros do
+        ccxt são propagados: o FetchScheduler separa falhas do espelho (rede,
+        timeout, 5xx, 429) de erros do próprio símbolo
+        """
+        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
+        
+        if not ohlcv or len(ohlcv) == 0:
+            logger.warning(f"Nenhum dado retornado para {symbol} em {exchange.urls['api']['public']}")
             return None
+        
+        return ohlcv
+
+    def _get_historical_data_with_exchange(self, exchange, symbol, timeframe='1h', limit=100):
+        """
+        Obtém dados históricos usando uma exchange específica
+        """
+        ohlcv = self._fetch_ohlcv_with_exchange(exchange, symbol, timeframe, limit)
+        if ohlcv is None:
+            return None
+        
+        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        df = df.sort_values('timestamp')
+        df = df.reset_index(drop=True)
+        
+        return df
 
     def get_historical_data(self, symbol, timeframe='1h', limit=100):
         """
         Obtém dados históricos tentando diferentes URLs
         """
-        errors = []
-        random.shuffle(self.exchanges)  # Randomiza a ordem das exchanges para distribuir a carga
+        return self.get_historical_data_many([(symbol, timeframe)], limit=limit)[(symbol, timeframe)]
+
+    def source_timeframe(self, timeframe):
+        """
+        Timeframe buscado na exchange para obter `timeframe` e quantas velas
+        dele formam uma derivada (1 quando não há reamostragem)
+        """
+        if timeframe in config.DERIVED_TIMEFRAMES:
+            factor = resample_factor(config.BASE_TIMEFRAME, timeframe)
+            if factor:
+                return config.BASE_TIMEFRAME, factor
+        return timeframe, 1
+
+    def _source_limits(self, pairs, limit=100):
+        """
+        Pares efetivamente buscados e quantas velas manter de cada um; os
+        derivados precisam de `factor` velas base por vela, mais um período
+        para descartar o primeiro incompleto
+        """
+        limits = {}
+        for symbol, timeframe in pairs:
+            source, factor = self.source_timeframe(timeframe)
+            needed = limit if factor == 1 else min(config.MAX_BASE_CANDLES, (limit + 1) * factor)
+            limits[(symbol, source)] = max(limits.get((symbol, source), 0), needed)
+        return limits
+
+    def get_historical_data_many(self, pairs, limit=100):
+        """
+        Obtém dados históricos de vários pares (symbol, timeframe) em paralelo,
+        buscando apenas os candles novos desde a última atualização. Pares
+        mantidos pelo stream de klines são lidos direto do candle store e os
+        timeframes derivados são montados a partir das velas base
+        """
+        pairs = list(pairs)
+        limits = self._source_limits(pairs, limit)
+        stream = self.kline_stream
+        # Com o stream ativo, outra thread escreve no store: a análise recebe cópias
+        copy = stream is not None
         
-        for exchange in self.exchanges:
-            try:
-                data = self._get_historical_data_with_exchange(exchange, symbol, timeframe, limit)
-                if data is not None:
-                    return data
-            except Exception as e:
-                errors.append(str(e))
+        synced = set()
+        if stream is not None and stream.healthy:
+            synced = {pair for pair, size in limits.items() if stream.is_live(pair, size)}
+        
+        rest_pairs = [pair for pair in limits if pair not in synced]
+        now_ms = int(time.time() * 1000)
+        params = {
+            pair: {'limit': limits[pair], 'since': self.candle_store.since(pair[0], pair[1], now_ms, limits[pair])}
+            for pair in rest_pairs
+        }
+        results = self.fetch_scheduler.fetch_many(rest_pairs, params=params) if rest_pairs else {}
+        
+        start = time.perf_counter()
+        for pair, ohlcv in results.items():
+            if ohlcv is None:
                 continue
-            
-            # Pequeno delay entre tentativas
-            time.sleep(0.5)
+            self.candle_store.merge(pair[0], pair[1], ohlcv, full=params[pair]['since'] is None, limit=limits[pair])
+            if stream is not None:
+                stream.mark_synced(pair)
+            synced.add(pair)
+        
+        frames = {}
+        updated_at = time.time()
+        for symbol, timeframe in pairs:
+            source, factor = self.source_timeframe(timeframe)
+            if (symbol, source) not in synced:
+                frames[(symbol, timeframe)] = None
+                continue
+            if factor == 1:
+                frames[(symbol, timeframe)] = self.candle_store.frame(symbol, timeframe, limit, copy=copy)
+            else:
+                frames[(symbol, timeframe)] = self.candle_store.resampled_frame(symbol, source, timeframe, limit)
+            self._updated_at[(symbol, timeframe)] = updated_at
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage='parse')
         
-        logger.error(f"Falha ao obter dados de todas as URLs para {symbol}. Erros: {'; '.join(errors)}")
-        return None
+        self._archive_closed(frames)
+        return frames
+
+    def _data_age(self):
+        now = time.time()
+        return {pair: now - updated_at for pair, updated_at in list(self._updated_at.items())}
+
+    def _warm_start(self):
+        """
+        Carrega do arquivo local as últimas velas de cada par, para que a
+        primeira coleta busque apenas o que falta (since=) em vez do histórico completo
+        """
+        if self.archive is None:
+            return
+        loaded = 0
+        pairs = [(symbol, timeframe) for timeframe in self._timeframes for symbol in self.symbols]
+        for (symbol, timeframe), size in self._source_limits(pairs, self.candle_store.capacity).items():
+            try:
+                series = self.archive.series(symbol, timeframe)
+                data = series.tail(size)
+                # Só aproveita uma janela contígua
+                if len(data.timestamps) == 0 or np.any(np.diff(data.timestamps) != timeframe_to_ms(timeframe)):
+                    continue
+                self.candle_store.merge(symbol, timeframe, series.to_ohlcv(data), full=True, limit=size)
+                loaded += 1
+            except (OSError, ValueError) as e:
+                logger.warning(f"Erro ao carregar {symbol} ({timeframe}) do arquivo local: {str(e)}")
+        if loaded:
+            logger.info(f"{loaded} pares carregados do arquivo local {self.archive.root}")
+
+    def _archive_closed(self, frames):
+        """
+        Anexa ao arquivo local as velas fechadas ainda não gravadas
+        """
+        if self.archive is None:
+            return
+        now_ms = int(time.time() * 1000)
+        for (symbol, timeframe), df in frames.items():
+            if df is None or len(df) == 0:
+                continue
+            try:
+                series = self.archive.series(symbol, timeframe)
+                timestamps = df['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+                last = series.last_timestamp
+                new = timestamps + timeframe_to_ms(timeframe) <= now_ms
+                if last is not None:
+                    new &= timestamps > last
+                if not new.any():
+                    continue
+                rows = np.column_stack([timestamps[new]] + [df[name].to_numpy()[new] for name in OHLCV_COLUMNS])
+                series.append(rows)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Erro ao gravar {symbol} ({timeframe}) no arquivo local: {str(e)}")
 
     @property
     def timeframes(self):
@@ -310,6 +550,80 @@ class CryptoBot:
         self._timeframes = value
         # Atualiza o histórico de sinais para os novos timeframes
         self.signal_history = {tf: {} for tf in value}
+        self.close_scheduler = CloseScheduler(value, grace=config.CLOSE_GRACE)
+
+    @property
+    def price_timeframe(self):
+        """
+        Menor timeframe efetivamente buscado: sua última vela dá o preço atual
+        """
+        return min((self.source_timeframe(tf)[0] for tf in self._timeframes), key=timeframe_to_ms)
+
+    def due_timeframes(self):
+        """
+        Timeframes com vela recém-fechada a analisar, do menor para o maior. O
+        fechamento informado pelo stream de klines dispensa a espera de segurança
+        """
+        stream = self.kline_stream
+        if stream is not None and stream.healthy:
+            closed = {timeframe for _, timeframe in stream.pop_closed()}
+            if closed:
+                self.close_scheduler.confirm(
+                    tf for tf in self._timeframes if self.source_timeframe(tf)[0] in closed
+                )
+        return self.close_scheduler.pop_due()
+
+    def evaluate_timeframes(self, timeframes, symbols=None):
+        """
+        Coleta e analisa os pares dos timeframes informados (de todos os
+        símbolos, ou apenas de `symbols`); os que falharem são reagendados
+        para a próxima atualização de preços
+        """
+        symbols = self.symbols if symbols is None else symbols
+        pairs = [(symbol, timeframe) for timeframe in timeframes for symbol in symbols]
+        with SWEEP_SECONDS.time():
+            frames = self.get_historical_data_many(pairs)
+            self.generate_signals_many(frames)
+        failed = {timeframe for (_, timeframe), df in frames.items() if df is None}
+        if failed:
+            self.close_scheduler.retry(failed, delay=config.PRICE_REFRESH_INTERVAL)
+        return frames
+
+    def latest_prices(self):
+        """
+        Último preço de cada símbolo no candle store, sem acessar a exchange
+        """
+        prices = {}
+        for symbol in self.symbols:
+            price = self.candle_store.last_close(symbol, self.price_timeframe)
+            if price is not None:
+                prices[symbol] = price
+        return prices
+
+    def fetch_prices(self):
+        """
+        Atualização leve de preços entre os fechamentos: uma única chamada de
+        ticker traz o último preço de todos os símbolos, compartilhado entre os
+        timeframes (nada é buscado se o stream de klines estiver ativo)
+        """
+        prices = self.latest_prices()
+        stream = self.kline_stream
+        if stream is None or not stream.healthy:
+            tickers = self.fetch_scheduler.call(self._fetch_last_prices, TICKER_PRICE_WEIGHT, 'consulta de preços')
+            prices.update(tickers or {})
+        return prices
+
+    def _fetch_last_prices(self, exchange):
+        """
+        Últimos preços (GET /ticker/price) dos símbolos monitorados
+        """
+        watched = set(self.symbols)
+        prices = {}
+        for item in exchange.public_get_ticker_price():
+            symbol = exchange.safe_symbol(item['symbol'])
+            if symbol in watched:
+                prices[symbol] = float(item['price'])
+        return prices or None
 
     def analyze_signals(self, df):
         """
@@ -325,6 +639,7 @@ class CryptoBot:
         ce_df = self.chandelier.calculate(ha_df)
 
         # 3. Procura sinais em todo o gráfico
+        scan_start = time.perf_counter()
         signals = []
         
         # Analisa todas as velas exceto a última
@@ -378,6 +693,8 @@ class CryptoBot:
                     'timestamp': df['timestamp'].iloc[-1]
                 }
 
+        STAGE_SECONDS.observe(time.perf_counter() - scan_start, stage='signal_scan')
+        
         # 5. Retorna o sinal atual (se houver) e o último sinal válido
         last_signal = signals[-1] if signals else None
         
@@ -387,6 +704,75 @@ class CryptoBot:
 
         return current_signal, last_signal
 
+    def _pair_task(self, df, symbol, timeframe) -> PairTask:
+        """
+        Monta a tarefa de análise com o estado do par e apenas as velas novas
+        """
+        key = (symbol, timeframe)
+        timestamps = df['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        state = self.indicator_states.get(key)
+        start = 0
+        
+        if state is not None:
+            # Retoma após a última vela confirmada; se ela saiu da janela, recomeça
+            pos = int(np.searchsorted(timestamps, state.timestamp))
+            if pos < len(timestamps) and timestamps[pos] == state.timestamp:
+                start = pos + 1
+            else:
+                state = None
+        
+        if state is None:
+            state = indicators.IndicatorState(
+                self.chandelier.atr_period, self.chandelier.atr_multiplier, self.chandelier.use_close
+            )
+        
+        ohlc = np.vstack([df[column].to_numpy()[start:] for column in ('open', 'high', 'low', 'close')])
+        return PairTask(key, state, timestamps[start:], ohlc)
+
+    def _merge_result(self, result):
+        """
+        Guarda o novo estado do par, registra a duração dos indicadores e
+        converte os timestamps (ms) dos sinais.
+        Retorna (sinal atual, último sinal, sinais confirmados nesta passada)
+        """
+        self.indicator_states[result.key] = result.state
+        # Medidos vela a vela na tarefa (possivelmente em outro processo)
+        ha_seconds, ce_seconds = result.stage_seconds
+        STAGE_SECONDS.observe(ha_seconds, stage='heikin_ashi')
+        STAGE_SECONDS.observe(ce_seconds, stage='chandelier_exit')
+        
+        def with_timestamp(signal):
+            if signal is None:
+                return None
+            return dict(signal, timestamp=pd.Timestamp(signal['timestamp'], unit='ms'))
+        
+        return (with_timestamp(result.current_signal), with_timestamp(result.last_signal),
+                [with_timestamp(signal) for signal in result.confirmed])
+
+    def analyze_signals_incremental(self, df, symbol, timeframe):
+        """
+        Equivalente incremental de analyze_signals: avança o estado do par só
+        pelas velas fechadas ainda não processadas e avalia a última vela
+        """
+        if len(df) < 3:  # Mínimo de velas necessário
+            return None, None
+        current_signal, last_signal, _ = self._merge_result(run_task(self._pair_task(df, symbol, timeframe)))
+        return current_signal, last_signal
+
+    def analyze_many(self, frames):
+        """
+        Analisa vários pares {(symbol, timeframe): df} de uma vez, distribuindo
+        entre processos quando ANALYSIS_WORKERS > 1
+        """
+        # Inclui Heikin Ashi e Chandelier Exit, também registrados por par em _merge_result
+        with STAGE_SECONDS.time(stage='signal_scan'):
+            tasks = [
+                self._pair_task(df, symbol, timeframe)
+                for (symbol, timeframe), df in frames.items()
+                if df is not None and len(df) >= 3
+            ]
+            return {result.key: self._merge_result(result) for result in self.analysis_executor.run(tasks)}
+
     def generate_signals(self, df, symbol, timeframe):
         """
         Gera sinais com confirmação e análise histórica
@@ -395,33 +781,63 @@ class CryptoBot:
             return
             
         # Analisa os sinais
-        current_signal, last_signal = self.analyze_signals(df)
+        current_signal, last_signal, confirmed = self._merge_result(run_task(self._pair_task(df, symbol, timeframe)))
+        self.apply_signals(symbol, timeframe, current_signal, last_signal, confirmed)
+
+    def generate_signals_many(self, frames):
+        """
+        Gera os sinais de vários pares {(symbol, timeframe): df}
+        """
+        for (symbol, timeframe), (current_signal, last_signal, confirmed) in self.analyze_many(frames).items():
+            try:
+                self.apply_signals(symbol, timeframe, current_signal, last_signal, confirmed)
+            except Exception as e:
+                logger.error(f"Erro ao aplicar sinais de {symbol} ({timeframe}): {str(e)}")
         
+        # Os alertas desta varredura saem juntos em um único email
+        if self.email_dispatcher is not None:
+            self.email_dispatcher.flush()
+
+    def apply_signals(self, symbol, timeframe, current_signal, last_signal, confirmed=()):
+        """
+        Atualiza o histórico de sinais e envia os alertas. `confirmed` são os
+        sinais confirmados nas velas que acabaram de fechar: como a análise
+        roda logo após o fechamento, é neles que os sinais novos aparecem
+        """
+        history = self.signal_history.setdefault(timeframe, {})
+        for signal in confirmed:
+            previous = history.get(symbol)
+            is_new = self.is_new_signal(symbol, timeframe, signal)
+            history[symbol] = signal
+            if is_new:
+                self.send_signal_email(symbol, timeframe, signal['type'], signal['price'], previous,
+                                       timestamp=signal['timestamp'])
+
         # Se tiver sinal atual, usa ele
         if current_signal:
+            # Verifica antes de atualizar o histórico, que passará a conter o próprio sinal
+            is_new = self.is_new_signal(symbol, timeframe, current_signal)
             self.signal_history[timeframe][symbol] = current_signal
             # Envia email apenas para sinais novos
-            if self.is_new_signal(symbol, timeframe, current_signal):
+            if is_new:
                 self.send_signal_email(
                     symbol, 
                     timeframe, 
                     current_signal['type'], 
                     current_signal['price'],
-                    last_signal
+                    last_signal,
+                    timestamp=current_signal['timestamp']
                 )
         # Se não tiver sinal atual mas tiver último sinal, usa o último
         elif last_signal:
             self.signal_history[timeframe][symbol] = last_signal
 
-        # Imprime informações sobre o sinal
         signal_to_show = current_signal or last_signal
-        print(f"\nSinal para {symbol} ({timeframe}):")
         if signal_to_show:
-            print(f"Tipo: {signal_to_show['type']}")
-            print(f"Preço: {signal_to_show['price']:.8f}")
-            print(f"Data/Hora: {signal_to_show['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}")
+            logger.debug(f"Sinal para {symbol} ({timeframe}): {signal_to_show['type']} a "
+                         f"{signal_to_show['price']:.8f} em {signal_to_show['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}")
         else:
-            print("Nenhum sinal encontrado")
+            logger.debug(f"Nenhum sinal encontrado para {symbol} ({timeframe})")
 
     def is_new_signal(self, symbol, timeframe, current_signal):
         if timeframe not in self.signal_history:
@@ -433,87 +849,56 @@ class CryptoBot:
             return True
         return last_signal['type'] != current_signal['type']
 
-    def send_signal_email(self, symbol, timeframe, signal_type, price, last_signal=None):
-        signal_key = f"{symbol}_{timeframe}_{signal_type}"
-        
-        if signal_key in self.sent_emails:
+    def send_signal_email(self, symbol, timeframe, signal_type, price, last_signal=None, timestamp=None):
+        """
+        Enfileira o alerta para envio em segundo plano, uma única vez por vela do sinal
+        """
+        if self.email_dispatcher is None:
+            if config.EMAIL_ENABLED:
+                logger.warning(f"Configurações de e-mail ausentes; alerta de {symbol} ({timeframe}) não enviado")
             return False
-            
-        try:
-            email = config.EMAIL_FROM
-            password = config.EMAIL_PASS
-            recipient = config.EMAIL_TO
-            
-            if not all([email, password, recipient]):
-                print("Configurações de e-mail ausentes")
-                return False
-            
-            msg = MIMEMultipart()
-            msg['From'] = email
-            msg['To'] = recipient
-            msg['Subject'] = f"Novo Sinal: {symbol} {timeframe} - {signal_type}"
-            
-            body = f"""
-            Novo sinal detectado:
-            
-            Símbolo: {symbol}
-            Timeframe: {timeframe}
-            Tipo: {signal_type}
-            Preço: {price:.8f}
-            Data/Hora: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-            """
-
-            if last_signal:
-                body += f"""
-                
-                Último sinal anterior:
-                Tipo: {last_signal['type']}
-                Preço: {last_signal['price']:.8f}
-                Data/Hora: {last_signal['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}
-                """
-            
-            msg.attach(MIMEText(body, 'plain'))
-            
-            with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-                server.login(email, password)
-                server.send_message(msg)
-            
-            self.sent_emails[signal_key] = datetime.now()
-            print(f"Email enviado com sucesso para {symbol} ({timeframe})")
-            return True
-            
-        except Exception as e:
-            print(f"Erro ao enviar e-mail: {e}")
+        
+        candle_ts = int(pd.Timestamp(timestamp).value // 1_000_000) if timestamp is not None else 0
+        if not self.sent_signals.claim(symbol, timeframe, signal_type, candle_ts):
             return False
+        
+        self.email_dispatcher.submit(Alert(symbol, timeframe, signal_type, price, datetime.now(), last_signal, candle_ts))
+        return True
+
+    def _email_failed(self, alerts):
+        """
+        Libera os alertas descartados para que sejam reenviados em uma próxima varredura
+        """
+        for alert in alerts:
+            self.sent_signals.release(alert.symbol, alert.timeframe, alert.signal_type, alert.candle_timestamp)
 
     def run(self):
         """
         Executa o bot em loop contínuo
         """
-        print("Iniciando monitoramento das criptomoedas...")
-        print(f"Símbolos monitorados ({len(self.symbols)}): {', '.join(self.symbols)}")
+        logger.info("Iniciando monitoramento das criptomoedas...")
+        logger.info(f"Símbolos monitorados ({len(self.symbols)}): {', '.join(self.symbols)}")
         
         while True:
             try:
-                for timeframe in self.timeframes:
-                    print(f"\nAnalisando timeframe {timeframe}:")
-                    for symbol in self.symbols:
-                        try:
-                            print(f"\nVerificando {symbol}...")
-                            df = self.get_historical_data(symbol, timeframe=timeframe)
-                            if df is not None:
-                                self.generate_signals(df, symbol, timeframe)
-                            else:
-                                print(f"Erro ao obter dados para {symbol}")
-                        except Exception as e:
-                            print(f"Erro ao processar {symbol}: {e}")
-                            continue
+                added = self.refresh_watchlist()
+                if added:
+                    self.evaluate_timeframes(self.timeframes, symbols=added)
                 
-                print("\nAguardando 60 segundos para próxima verificação...")
-                time.sleep(60)
+                due = self.due_timeframes()
+                if due:
+                    frames = self.evaluate_timeframes(due)
+                    
+                    for pair, df in frames.items():
+                        if df is None:
+                            logger.warning(f"Erro ao obter dados para {pair[0]} ({pair[1]})")
+                
+                wait = min(60, self.close_scheduler.seconds_until_due())
+                logger.debug(f"Aguardando {wait:.0f} segundos para próxima verificação...")
+                time.sleep(wait)
                 
             except Exception as e:
-                print(f"Erro durante a execução: {e}")
+                logger.error(f"Erro durante a execução: {str(e)}")
                 time.sleep(60)
 
 if __name__ == "__main__":
@@ -1,13 +1,13 @@
-from flask import Flask, render_template, jsonify, send_from_directory, request, redirect, url_for, session
+from flask import Flask, Response, render_template, request, redirect, url_for, session
 from crypto_bot import CryptoBot
+from snapshot import BROTLI_AVAILABLE, MSGPACK_AVAILABLE, SnapshotCache
+from signal_state import SignalTable
+from leader import LeaderLock
+from metrics import REGISTRY, read_metrics, write_metrics
+import config
 import threading
 import time
-import pandas as pd
-from datetime import datetime, timedelta
-import ccxt
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from datetime import datetime
 import os
 import logging
 import sys
@@ -29,38 +29,38 @@ app = Flask(__name__,
 app.secret_key = 'sua_chave_secreta_aqui'  # Troque por uma chave forte em produção
 
 # Variáveis globais para armazenar os dados
-signals_data = {
-    '1h': {},
-    '2h': {},
-    '1d': {}
-}
-last_signals = {}  # Para controlar novos sinais
+signal_table = SignalTable()  # Sinal e preço exibidos de cada (timeframe, símbolo)
 bot = None  # Será inicializado na função init_bot
-last_update_time = None  # Timestamp da última atualização do bot
+last_update_time = None  # Epoch (s) da última atualização do bot
+# Snapshot pré-serializado servido pelo /get_prices, compartilhado entre os workers
+snapshot_cache = SnapshotCache(os.path.join(config.SHARED_STATE_DIR, 'crypto_signals_snapshot.json'))
+# Apenas o worker que detém este lock coleta e analisa os dados
+leader_lock = LeaderLock(os.path.join(config.SHARED_STATE_DIR, 'crypto_signals.lock'))
+# Métricas do produtor, servidas pelo /metrics de qualquer worker
+METRICS_PATH = os.path.join(config.SHARED_STATE_DIR, 'crypto_metrics.prom')
+_bot_thread = None
+_bot_thread_lock = threading.Lock()
 
 def init_bot():
     """Inicializa o bot com tratamento de erros"""
-    global bot, signals_data
+    global bot
     try:
         logger.info("Iniciando o bot...")
         bot = CryptoBot()
         
         # Inicializa o dicionário de sinais
-        for timeframe in bot.timeframes:
-            signals_data[timeframe] = {}
-            for symbol in bot.symbols:
-                signals_data[timeframe][symbol] = {
-                    'signal': None,
-                    'current_price': None,
-                    'current_time': None
-                }
-                logger.info(f"Inicializado {symbol} para {timeframe}")
+        sync_signals_data()
+        logger.info(f"Inicializados {len(bot.symbols)} símbolos para {', '.join(bot.timeframes)}")
         
         return True
     except Exception as e:
         logger.error(f"Erro ao inicializar o bot: {str(e)}")
         return False
 
+def sync_signals_data():
+    """Acompanha a lista de símbolos do bot: cria entradas vazias e remove as descartadas"""
+    signal_table.sync(bot.timeframes, bot.symbols)
+
 def ensure_bot_initialized():
     """Garante que o bot está inicializado com várias tentativas"""
     global bot
@@ -84,7 +84,7 @@ def ensure_bot_initialized():
 
 def bot_thread():
     """Thread para executar o bot em segundo plano"""
-    global last_update_time, signals_data
+    global last_update_time
     retry_delay = 60  # Delay inicial entre tentativas
 
     while True:
@@ -96,38 +96,82 @@ def bot_thread():
                 continue
 
             retry_delay = 60  # Reseta o delay após sucesso
-            current_time = pd.Timestamp.now()
-            last_update_time = current_time
             
-            logger.info("Iniciando atualização dos dados...")
-            for timeframe in bot.timeframes:
-                for symbol in bot.symbols:
-                    try:
-                        df = bot.get_historical_data(symbol, timeframe=timeframe)
-                        if df is not None and len(df) > 0:
-                            current_price = float(df['close'].iloc[-1])
-                            bot.generate_signals(df, symbol, timeframe)
-                            
-                            signals_data[timeframe][symbol] = {
-                                'signal': bot.signal_history[timeframe].get(symbol),
-                                'current_price': current_price,
-                                'current_time': current_time
-                            }
-                            logger.info(f"Dados atualizados: {symbol} ({timeframe}) - Preço: {current_price:.8f}")
-                        else:
-                            logger.warning(f"Sem dados para {symbol} ({timeframe})")
-                    except Exception as e:
-                        logger.error(f"Erro ao processar {symbol} ({timeframe}): {str(e)}")
-                        continue
-                    
-                    # Pequena pausa entre chamadas para respeitar rate limits
-                    time.sleep(0.5)
+            # Cada timeframe é analisado logo após o fechamento das suas velas (1h
+            # antes dos maiores); entre os fechamentos apenas os preços são atualizados
+            streaming = bot.kline_stream is not None and bot.kline_stream.healthy
+            added = bot.refresh_watchlist()
+            if signal_table.symbols(bot.timeframes[0]) != set(bot.symbols):
+                sync_signals_data()
+                if added:
+                    # Símbolos novos são analisados em todos os timeframes sem esperar o fechamento
+                    update_signals_data(bot.evaluate_timeframes(bot.timeframes, symbols=added), time.time())
+                publish_snapshot()
+            due = bot.due_timeframes()
+            if not due:
+                refresh_prices(bot.fetch_prices())
+            else:
+                current_time = time.time()
+                last_update_time = current_time
+                
+                logger.info(f"Analisando velas fechadas de {', '.join(due)}...")
+                frames = bot.evaluate_timeframes(due)
+                logger.info(f"Análise de {len(frames)} pares concluída em {time.time() - current_time:.2f}s")
+                
+                update_signals_data(frames, current_time)
+                
+                # Os demais timeframes recebem o preço atual sem nova análise
+                refresh_prices(bot.latest_prices(), publish=False)
+                publish_snapshot()
             
-            time.sleep(60)
+            write_metrics(METRICS_PATH)
+            interval = config.KLINE_STREAM_REFRESH if streaming else config.PRICE_REFRESH_INTERVAL
+            time.sleep(min(interval, bot.close_scheduler.seconds_until_due()))
         except Exception as e:
             logger.error(f"Erro na thread do bot: {str(e)}")
             time.sleep(60)
 
+def update_signals_data(frames, current_time):
+    """Grava o sinal e o preço de cada par analisado (current_time em epoch s)"""
+    now_ms = int(current_time * 1000)
+    for (symbol, timeframe), df in frames.items():
+        if df is None or len(df) == 0:
+            logger.warning(f"Sem dados para {symbol} ({timeframe})")
+            continue
+        current_price = float(df['close'].iloc[-1])
+        signal_table.update(timeframe, symbol, bot.signal_history[timeframe].get(symbol), current_price, now_ms)
+        logger.debug(f"Dados atualizados: {symbol} ({timeframe}) - Preço: {current_price:.8f}")
+
+def refresh_prices(prices, publish=True):
+    """Atualiza os preços ({symbol: preço}) de todos os timeframes e publica se algo mudou"""
+    global last_update_time
+    current_time = time.time()
+    if signal_table.set_prices(prices, int(current_time * 1000)):
+        last_update_time = current_time
+        if publish:
+            publish_snapshot()
+
+def producer_thread():
+    """Aguarda a liderança entre os workers e então executa o bot"""
+    leader_lock.acquire()
+    bot_thread()
+
+def start_bot_thread():
+    """Inicia a thread do produtor uma única vez por processo"""
+    global _bot_thread
+    with _bot_thread_lock:
+        if _bot_thread is None or not _bot_thread.is_alive():
+            logger.info("Iniciando thread do bot...")
+            _bot_thread = threading.Thread(target=producer_thread, daemon=True)
+            _bot_thread.start()
+
+def publish_snapshot():
+    """Publica um novo snapshot a partir dos fragmentos JSON já prontos de cada par"""
+    data, body = signal_table.render({'bot_status': bot is not None, 'updated_at': last_update_time})
+    snapshot = snapshot_cache.publish(data, body)
+    logger.info(f"Snapshot v{snapshot.version} publicado ({len(snapshot.body)} bytes)")
+    return snapshot
+
 # Usuário e senha fixos para autenticação simples
 def check_login(username, password):
     return username == 'admin' and password == 'admin123'
@@ -149,125 +193,128 @@ def logout():
     session.pop('logged_in', None)
     return redirect(url_for('login'))
 
+_home_view = (None, {})  # (versão do snapshot, sinais prontos para o template)
+
+def home_signals(snapshot):
+    """Sinais de cada timeframe no formato do template, montados uma vez por versão do snapshot"""
+    global _home_view
+    version, signals = _home_view
+    if version == snapshot.version:
+        return signals
+    
+    signals = {}
+    for timeframe, symbols in snapshot.data.items():
+        if not isinstance(symbols, dict):
+            continue
+        signals[timeframe] = {}
+        for symbol, symbol_data in symbols.items():
+            signal = symbol_data.get('signal')
+            if signal and signal.get('timestamp'):
+                signal = dict(signal, timestamp=datetime.fromisoformat(signal['timestamp']))
+            signals[timeframe][symbol] = {
+                'signal': signal,
+                'current_price': symbol_data.get('current_price')
+            }
+    _home_view = (snapshot.version, signals)
+    return signals
+
 # Proteger a rota principal
 @app.route('/')
 def home():
     if not session.get('logged_in'):
         return redirect(url_for('login'))
     try:
-        if not ensure_bot_initialized():
-            return "Erro ao inicializar o bot. Tente novamente.", 500
-
+        snapshot = snapshot_cache.get()
+        data = snapshot.data
+        
         # Calcula os segundos restantes até a próxima atualização
         seconds_left = 60
-        if last_update_time:
-            elapsed = (datetime.now() - last_update_time).total_seconds()
+        last_update = datetime.fromtimestamp(data['updated_at']) if data.get('updated_at') else None
+        if last_update:
+            elapsed = time.time() - data['updated_at']
             seconds_left = max(0, 60 - int(elapsed))
 
-        # Processa os sinais para cada timeframe
-        processed_signals = {}
-        for timeframe in bot.timeframes:
-            processed_signals[timeframe] = {}
-            for symbol in bot.symbols:
-                data = signals_data.get(timeframe, {}).get(symbol, {})
-                elapsed_time = ''
-                if data.get('signal') and data['signal'].get('timestamp'):
-                    time_diff = datetime.now() - data['signal']['timestamp']
-                    if time_diff.total_seconds() < 60:
-                        elapsed_time = 'Agora'
-                    else:
-                        elapsed_time = f"{int(time_diff.total_seconds() / 60)}"
-
-                processed_signals[timeframe][symbol] = {
-                    'signal': data.get('signal'),
-                    'current_price': data.get('current_price'),
-                    'elapsed_time': elapsed_time
-                }
-        
-        return render_template('index.html', signals=processed_signals, seconds_left=seconds_left)
+        # Os minutos desde cada sinal são calculados no template a partir de timestamp_ms
+        return render_template('index.html', signals=home_signals(snapshot), seconds_left=seconds_left,
+                               bot_initialized=data.get('bot_status'), last_update=last_update,
+                               now_ms=int(time.time() * 1000))
     except Exception as e:
         logger.error(f"Erro na rota principal: {str(e)}")
         return f"Erro ao carregar a página: {str(e)}", 500
 
+def _list_arg(name):
+    """Parâmetro separado por vírgulas (?symbols=BTC/USDT,ETH/USDT) como frozenset"""
+    return frozenset(item.strip() for item in request.args.get(name, '').split(',') if item.strip())
+
+def _response_format():
+    """MessagePack quando o cliente o prefere no Accept e o pacote está instalado"""
+    if MSGPACK_AVAILABLE:
+        best = request.accept_mimetypes.best_match(['application/json', 'application/msgpack', 'application/x-msgpack'])
+        if best in ('application/msgpack', 'application/x-msgpack'):
+            return 'msgpack'
+    return 'json'
+
+def _response_encoding():
+    """Compressão aceita pelo cliente: brotli (se instalado), depois gzip"""
+    return request.accept_encodings.best_match(['br', 'gzip'] if BROTLI_AVAILABLE else ['gzip'])
+
 @app.route('/get_prices')
 def get_prices():
-    """Rota para obter os preços atualizados via AJAX"""
-    try:
-        if not ensure_bot_initialized():
-            logger.error("Bot não está inicializado")
-            return jsonify({'error': 'Bot não inicializado'}), 500
-            
-        logger.info("Processando requisição get_prices")
-        
-        # Força atualização dos dados antes de retornar
-        current_time = pd.Timestamp.now()
-        for timeframe in bot.timeframes:
-            for symbol in bot.symbols:
-                try:
-                    logger.info(f"Obtendo dados para {symbol} ({timeframe})")
-                    df = bot.get_historical_data(symbol, timeframe=timeframe)
-                    if df is not None and len(df) > 0:
-                        current_price = float(df['close'].iloc[-1])
-                        bot.generate_signals(df, symbol, timeframe)
-                        
-                        signals_data[timeframe][symbol] = {
-                            'signal': bot.signal_history[timeframe].get(symbol),
-                            'current_price': current_price,
-                            'current_time': current_time
-                        }
-                        logger.info(f"Dados atualizados: {symbol} ({timeframe}) - Preço: {current_price:.8f}")
-                    else:
-                        logger.warning(f"Sem dados para {symbol} ({timeframe})")
-                except Exception as e:
-                    logger.error(f"Erro ao processar {symbol} ({timeframe}): {str(e)}")
-                    continue
-                
-                # Pequena pausa entre chamadas para respeitar rate limits
-                time.sleep(0.1)
-        
-        # Prepara os dados para retorno
-        serialized_data = {
-            timeframe: {} for timeframe in bot.timeframes
-        }
-        
-        for timeframe in bot.timeframes:
-            logger.info(f"Processando timeframe {timeframe}")
-            for symbol, data in signals_data[timeframe].items():
-                if data:  # Verifica se há dados para este símbolo
-                    signal_data = data.get('signal', {}) or {}
-                    current_price = data.get('current_price')
-                    
-                    if current_price is not None:
-                        logger.info(f"Dados encontrados para {symbol}: Preço atual = {current_price}")
-                        
-                        serialized_data[timeframe][symbol] = {
-                            'current_price': float(current_price),
-                            'signal': {
-                                'type': signal_data.get('type'),
-                                'price': float(signal_data.get('price', 0)) if signal_data.get('price') else None,
-                                'timestamp': signal_data.get('timestamp').strftime('%Y-%m-%d %H:%M:%S') if signal_data.get('timestamp') else None
-                            } if signal_data else None,
-                            'current_time': data['current_time'].strftime('%Y-%m-%d %H:%M:%S') if data.get('current_time') else None,
-                            'elapsed_time': 'Agora' if signal_data and (datetime.now() - signal_data['timestamp']).total_seconds() < 60 else str(int((datetime.now() - signal_data['timestamp']).total_seconds() / 60)) if signal_data and signal_data.get('timestamp') else None
-                        }
-                    else:
-                        logger.warning(f"Sem preço atual para {symbol}")
-        
-        # Adiciona status do bot
-        serialized_data['bot_status'] = True
-        
-        # Log do tamanho dos dados
-        response_data = jsonify(serialized_data)
-        logger.info(f"Tamanho dos dados serializados: {len(str(serialized_data))} bytes")
-        logger.info("Dados processados com sucesso")
-        
-        return response_data
-        
-    except Exception as e:
-        logger.error(f"Erro ao obter preços: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
-        return jsonify({'error': str(e)}), 500
+    """
+    Rota para obter os preços atualizados via AJAX (apenas lê o último snapshot).
+    ?since=<versão> traz só as entradas alteradas depois dessa versão e
+    ?symbols=/?timeframes= (separados por vírgula) filtram os pares
+    """
+    view = snapshot_cache.view(
+        since=request.args.get('since', type=int),
+        symbols=_list_arg('symbols'),
+        timeframes=_list_arg('timeframes'),
+        fmt=_response_format(),
+        encoding=_response_encoding()
+    )
+    
+    if request.if_none_match.contains_weak(view.etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(view.body, mimetype=view.mimetype)
+        if view.encoding:
+            response.headers['Content-Encoding'] = view.encoding
+    
+    response.set_etag(view.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Métricas de desempenho no formato do Prometheus (coletadas pelo worker produtor)"""
+    body = REGISTRY.render() if leader_lock.is_leader else read_metrics(METRICS_PATH)
+    if body is None:
+        return Response("Métricas ainda não disponíveis\n", status=503, mimetype='text/plain')
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/stream')
+def stream():
+    """Canal Server-Sent Events: snapshot completo na conexão e depois apenas os deltas"""
+    client_version = request.headers.get('Last-Event-ID', type=int)
+    
+    def events(version):
+        yield b'retry: 5000\n\n'
+        # Libera a thread periodicamente; o navegador reconecta com Last-Event-ID e recebe só o delta
+        deadline = time.monotonic() + config.STREAM_MAX_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            event = snapshot_cache.wait_for_event(version, timeout=min(15, remaining))
+            if event is None:
+                yield b': ping\n\n'  # Mantém a conexão viva em proxies
+                continue
+            version, payload = event
+            yield payload
+    
+    return Response(events(client_version), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/profile')
 def profile():
@@ -278,16 +325,14 @@ def profile():
 @app.before_request
 def before_request():
     """Executa antes de cada requisição para garantir que o bot está inicializado"""
-    if request.endpoint == 'static':
-        return  # Permite acesso a arquivos estáticos sem verificação
+    if request.endpoint in ('static', 'metrics'):
+        return  # Permite acesso a arquivos estáticos e ao scrape do Prometheus sem verificação
         
     if request.endpoint != 'login' and not session.get('logged_in'):
         return redirect(url_for('login'))
         
-    if request.endpoint not in ['login', 'static']:
-        if not ensure_bot_initialized():
-            logger.error("Falha ao inicializar o bot antes da requisição")
-            return jsonify({'error': 'Falha ao inicializar o bot. Por favor, tente novamente mais tarde.'}), 500
+    # A inicialização e a coleta de dados acontecem apenas na thread do bot
+    start_bot_thread()
 
 if __name__ == '__main__':
     try:
@@ -301,10 +346,7 @@ if __name__ == '__main__':
             sys.exit(1)
 
         # Inicia o bot em uma thread separada
-        logger.info("Iniciando thread do bot...")
-        bot_thread = threading.Thread(target=bot_thread)
-        bot_thread.daemon = True
-        bot_thread.start()
+        start_bot_thread()
         
         # Inicia o servidor web
         port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,339 @@
+"""
+Servidor HTTP local que imita os endpoints públicos da API spot da Binance.
+
+Substitui os espelhos reais em testes de carga e desenvolvimento offline:
+responde ping, time, exchangeInfo, klines, ticker/price, ticker/24hr e
+ticker/bookTicker. Os candles vêm de um arquivo local (ohlcv_archive) ou são
+sintéticos e determinísticos por símbolo, alinhados ao horário atual. Latência,
+taxa de erros (HTTP 500) e respostas 429 (com Retry-After) são configuráveis.
+
+Uso:
+    python fake_binance.py --port 8900 --symbols 50 --latency 80 --jitter 40 --error-rate 0.01 --throttle-rate 0.005
+    BINANCE_API_URLS=http://localhost:8900/api/v3 python crypto_web.py
+"""
+import argparse
+import json
+import logging
+import math
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from candle_store import timeframe_to_ms
+from ohlcv_archive import OhlcvArchive
+
+logger = logging.getLogger(__name__)
+
+# Os pares de maior volume primeiro (a ordem define o volume sintético)
+DEFAULT_BASES = [
+    'BTC', 'ETH', 'SOL', 'XRP', 'BNB', 'DOGE', 'ADA', 'AVAX', 'LINK', 'DOT',
+    'POL', 'LTC', 'TRX', 'SHIB', 'UNI', 'ATOM', 'NEAR', 'APT', 'ARB', 'OP',
+]
+MAX_KLINES = 1000
+
+
+def _noise(seed: int, index: np.ndarray) -> np.ndarray:
+    """
+    Ruído determinístico em [-1, 1] por (símbolo, índice da vela)
+    """
+    x = (index.astype(np.uint64) * np.uint64(2654435761) + np.uint64(seed)) % np.uint64(2 ** 32)
+    x = (x ^ (x >> np.uint64(13))) * np.uint64(1274126177) % np.uint64(2 ** 32)
+    return x.astype(np.float64) / 2 ** 31 - 1
+
+
+class SyntheticMarket:
+    def __init__(self, symbols: List[str]):
+        self.symbols = symbols
+        self._seeds = {symbol: zlib.crc32(symbol.encode()) for symbol in symbols}
+
+    def klines(self, symbol: str, timeframe: str, start_ms: Optional[int], end_ms: Optional[int],
+               limit: int, now_ms: int) -> list:
+        duration = timeframe_to_ms(timeframe)
+        current = now_ms // duration
+        if start_ms is not None:
+            first = -(-start_ms // duration)
+            last = min(current, first + limit - 1)
+        else:
+            last = current if end_ms is None else min(current, end_ms // duration)
+            first = last - limit + 1
+        if end_ms is not None:
+            last = min(last, end_ms // duration)
+        if last < first:
+            return []
+        # Preço como função do tempo (em horas), igual em qualquer timeframe
+        seed = self._seeds[symbol]
+        index = np.arange(first, last + 1, dtype=np.int64)
+        hours = index * duration / 3_600_000
+        base = 10 ** (1 + seed % 4)
+        phase = seed % 1000
+
+        def price(at_hours):
+            return base * (1 + 0.08 * np.sin(at_hours / 40 + phase) + 0.03 * np.sin(at_hours / 6.5 + phase / 3))
+
+        span = duration / 3_600_000
+        open_ = price(hours)
+        close = price(hours + span)
+        # A vela atual fecha no preço de agora
+        if last == current:
+            close[-1] = price(np.array([now_ms / 3_600_000]))[0]
+        wiggle = np.abs(_noise(seed, index)) * 0.01 * base
+        high = np.maximum(open_, close) + wiggle
+        low = np.minimum(open_, close) - wiggle
+        volume = (1 + np.abs(_noise(seed + 1, index))) * 1000 * span
+        return [
+            [int(t), f"{o:.8f}", f"{h:.8f}", f"{l:.8f}", f"{c:.8f}", f"{v:.8f}", int(t + duration - 1),
+             f"{v * c:.8f}", 100, f"{v / 2:.8f}", f"{v * c / 2:.8f}", "0"]
+            for t, o, h, l, c, v in zip(index * duration, open_, high, low, close, volume)
+        ]
+
+    def last_row(self, symbol: str, now_ms: int) -> Optional[list]:
+        rows = self.klines(symbol, '1m', None, None, 1, now_ms)
+        return rows[-1] if rows else None
+
+
+class ArchiveMarket:
+    """
+    Candles gravados no ohlcv_archive, deslocados para terminar na vela atual
+    """
+    def __init__(self, root: str):
+        self.archive = OhlcvArchive(root)
+        self._timeframes = {}
+        for symbol, timeframe in self.archive.list_series():
+            self._timeframes.setdefault(symbol, []).append(timeframe)
+        self.symbols = sorted(self._timeframes)
+
+    def last_row(self, symbol: str, now_ms: int) -> Optional[list]:
+        # O menor timeframe gravado dá o preço mais recente
+        timeframe = min(self._timeframes[symbol], key=timeframe_to_ms)
+        rows = self.klines(symbol, timeframe, None, None, 1, now_ms)
+        return rows[-1] if rows else None
+
+    def klines(self, symbol: str, timeframe: str, start_ms: Optional[int], end_ms: Optional[int],
+               limit: int, now_ms: int) -> list:
+        series = self.archive.series(symbol, timeframe)
+        if series.last_timestamp is None:
+            return []
+        duration = timeframe_to_ms(timeframe)
+        shift = (now_ms // duration) * duration - series.last_timestamp
+        data = series.read(None if start_ms is None else start_ms - shift,
+                           None if end_ms is None else end_ms - shift + 1)
+        rows = series.to_ohlcv(data)
+        rows = rows[:limit] if start_ms is not None else rows[-limit:]
+        return [
+            [int(row[0] + shift), f"{row[1]:.8f}", f"{row[2]:.8f}", f"{row[3]:.8f}", f"{row[4]:.8f}",
+             f"{row[5]:.8f}", int(row[0] + shift + duration - 1), f"{row[5] * row[4]:.8f}", 100,
+             f"{row[5] / 2:.8f}", f"{row[5] * row[4] / 2:.8f}", "0"]
+            for row in rows
+        ]
+
+
+def exchange_info(symbols: List[str]) -> dict:
+    entries = []
+    for symbol in symbols:
+        base, quote = symbol.split('/')
+        entries.append({
+            'symbol': base + quote,
+            'status': 'TRADING',
+            'baseAsset': base,
+            'baseAssetPrecision': 8,
+            'quoteAsset': quote,
+            'quotePrecision': 8,
+            'quoteAssetPrecision': 8,
+            'orderTypes': ['LIMIT', 'MARKET'],
+            'icebergAllowed': True,
+            'ocoAllowed': True,
+            'isSpotTradingAllowed': True,
+            'isMarginTradingAllowed': False,
+            'filters': [
+                {'filterType': 'PRICE_FILTER', 'minPrice': '0.00000001', 'maxPrice': '1000000.00000000',
+                 'tickSize': '0.00000001'},
+                {'filterType': 'LOT_SIZE', 'minQty': '0.00000100', 'maxQty': '9000000.00000000',
+                 'stepSize': '0.00000100'},
+                {'filterType': 'NOTIONAL', 'minNotional': '5.00000000', 'maxNotional': '9000000.00000000'},
+            ],
+            'permissions': [],
+            'permissionSets': [['SPOT']],
+            'defaultSelfTradePreventionMode': 'EXPIRE_MAKER',
+            'allowedSelfTradePreventionModes': ['EXPIRE_TAKER', 'EXPIRE_MAKER', 'EXPIRE_BOTH'],
+        })
+    return {
+        'timezone': 'UTC',
+        'serverTime': int(time.time() * 1000),
+        'rateLimits': [{'rateLimitType': 'REQUEST_WEIGHT', 'interval': 'MINUTE', 'intervalNum': 1, 'limit': 6000}],
+        'exchangeFilters': [],
+        'symbols': entries,
+    }
+
+
+class FakeBinance:
+    def __init__(self, market, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, seed: Optional[int] = None):
+        """
+        latency/jitter: atraso em ms por requisição (média e variação uniforme)
+        error_rate: fração de respostas HTTP 500; throttle_rate: fração de 429
+        """
+        self.market = market
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self._ids = {symbol.replace('/', ''): symbol for symbol in market.symbols}
+        self._info = json.dumps(exchange_info(market.symbols)).encode('utf-8')
+
+    def _draw(self) -> tuple:
+        with self._lock:
+            self.requests += 1
+            return (self._random.uniform(-self.jitter, self.jitter), self._random.random())
+
+    def _last_prices(self, now_ms: int) -> dict:
+        prices = {}
+        for symbol in self.market.symbols:
+            row = self.market.last_row(symbol, now_ms)
+            if row is not None:
+                prices[symbol] = row
+        return prices
+
+    def route(self, path: str, query: dict) -> tuple:
+        """
+        Retorna (status, corpo JSON, cabeçalhos extras)
+        """
+        jitter, draw = self._draw()
+        delay = max(0.0, self.latency + jitter) / 1000
+        if delay:
+            time.sleep(delay)
+        if draw < self.throttle_rate:
+            return 429, {'code': -1003, 'msg': 'Too many requests; current limit is 6000 request weight per 1 MINUTE.'}, \
+                {'Retry-After': '1'}
+        if draw < self.throttle_rate + self.error_rate:
+            return 500, {'code': -1000, 'msg': 'An unknown error occurred while processing the request.'}, {}
+
+        now_ms = int(time.time() * 1000)
+        endpoint = path.rsplit('/api/v3/', 1)[-1]
+        if endpoint == 'ping':
+            return 200, {}, {}
+        if endpoint == 'time':
+            return 200, {'serverTime': now_ms}, {}
+        if endpoint == 'exchangeInfo':
+            return 200, self._info, {}
+        if endpoint in ('klines', 'uiKlines'):
+            symbol = self._ids.get(query.get('symbol', ''))
+            if symbol is None:
+                return 400, {'code': -1121, 'msg': 'Invalid symbol.'}, {}
+            try:
+                limit = min(int(query.get('limit', 500)), MAX_KLINES)
+                start_ms = int(query['startTime']) if 'startTime' in query else None
+                end_ms = int(query['endTime']) if 'endTime' in query else None
+                timeframe_to_ms(query.get('interval', ''))
+            except (KeyError, ValueError):
+                return 400, {'code': -1100, 'msg': 'Illegal characters found in parameter.'}, {}
+            return 200, self.market.klines(symbol, query['interval'], start_ms, end_ms, limit, now_ms), {}
+        if endpoint in ('ticker/price', 'ticker/bookTicker', 'ticker/24hr'):
+            return 200, self._tickers(endpoint, self._last_prices(now_ms), now_ms), {}
+        return 404, {'code': -1, 'msg': f'Endpoint desconhecido: {endpoint}'}, {}
+
+    def _tickers(self, endpoint: str, prices: dict, now_ms: int) -> list:
+        tickers = []
+        count = len(prices)
+        for rank, (symbol, row) in enumerate(prices.items()):
+            market_id = symbol.replace('/', '')
+            close = float(row[4])
+            if endpoint == 'ticker/price':
+                tickers.append({'symbol': market_id, 'price': row[4]})
+            elif endpoint == 'ticker/bookTicker':
+                tickers.append({'symbol': market_id, 'bidPrice': f"{close * 0.9999:.8f}", 'bidQty': '1.00000000',
+                                'askPrice': f"{close * 1.0001:.8f}", 'askQty': '1.00000000'})
+            else:
+                # Volume decrescente na ordem dos símbolos, para o ranking da watchlist
+                quote_volume = 1e9 * math.exp(-rank / max(count / 5, 1))
+                tickers.append({
+                    'symbol': market_id, 'priceChange': '0', 'priceChangePercent': '0', 'weightedAvgPrice': row[4],
+                    'prevClosePrice': row[1], 'lastPrice': row[4], 'lastQty': '1', 'bidPrice': row[4],
+                    'bidQty': '1', 'askPrice': row[4], 'askQty': '1', 'openPrice': row[1], 'highPrice': row[2],
+                    'lowPrice': row[3], 'volume': f"{quote_volume / close:.8f}", 'quoteVolume': f"{quote_volume:.8f}",
+                    'openTime': now_ms - 86_400_000, 'closeTime': now_ms, 'firstId': 1, 'lastId': 2, 'count': 1,
+                })
+        return tickers
+
+
+def make_handler(fake: FakeBinance):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                status, payload, headers = fake.route(url.path, query)
+            except Exception as e:
+                logger.error(f"Erro ao responder {self.path}: {str(e)}")
+                status, payload, headers = 500, {'code': -1000, 'msg': str(e)}, {}
+            body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json;charset=UTF-8')
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return Handler
+
+
+def synthetic_market(count: int, quote: str = 'USDT') -> SyntheticMarket:
+    """
+    `count` pares sintéticos: os DEFAULT_BASES e, se faltarem, TK0, TK1...
+    """
+    bases = DEFAULT_BASES + [f"TK{index}" for index in range(max(0, count - len(DEFAULT_BASES)))]
+    return SyntheticMarket([f"{base}/{quote}" for base in bases[:count]])
+
+
+def serve(fake: FakeBinance, host: str = '127.0.0.1', port: int = 8900) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Binance falsa para testes offline')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--archive', help='raiz do ohlcv_archive com os candles gravados (padrão: sintéticos)')
+    parser.add_argument('--symbols', type=int, default=len(DEFAULT_BASES), help='quantidade de pares sintéticos')
+    parser.add_argument('--latency', type=float, default=0.0, help='atraso médio por requisição (ms)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='variação do atraso (ms)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fração de respostas HTTP 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fração de respostas 429')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.archive:
+        market = ArchiveMarket(args.archive)
+    else:
+        market = synthetic_market(args.symbols)
+    fake = FakeBinance(market, args.latency, args.jitter, args.error_rate, args.throttle_rate, args.seed)
+    server = serve(fake, args.host, args.port)
+    logger.info(f"{len(market.symbols)} pares servidos em http://{args.host}:{args.port}/api/v3")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"{fake.requests} requisições atendidas")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""
+Agendador de coletas OHLCV distribuídas entre os espelhos da Binance.
+
+Cada espelho tem seu próprio token bucket de peso de requisição; as coletas
+de uma varredura rodam em paralelo num pool de threads limitado e cada
+requisição vai primeiro ao espelho mais rápido e saudável (mirror_health.py),
+com failover individual para os seguintes.
+
+Só falhas do espelho (rede, timeout, 5xx, 429) contam para a sua saúde e
+levam ao próximo; erros da requisição em si (ex.: símbolo inválido) valem
+para todos os espelhos e encerram a coleta.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait as wait_futures
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import ccxt
+
+from metrics import (HEDGED_REQUESTS, MIRROR_CIRCUIT, MIRROR_ERROR_RATE, MIRROR_ERRORS, MIRROR_LATENCY,
+                     MIRROR_REQUEST_SECONDS, STAGE_SECONDS)
+from mirror_health import MirrorHealth
+
+logger = logging.getLogger(__name__)
+
+# Peso de uma chamada GET /api/v3/klines na Binance
+KLINES_WEIGHT = 2
+# Peso de GET /api/v3/ticker/price sem filtro de símbolo (todos os pares)
+TICKER_PRICE_WEIGHT = 4
+# Peso de GET /api/v3/ticker/24hr sem filtro de símbolo (todos os pares)
+TICKERS_WEIGHT = 80
+
+
+def is_mirror_failure(error: Exception) -> bool:
+    """
+    Erros de rede, timeout, indisponibilidade (5xx) e limite de requisições
+    (429/418): o ccxt os deriva todos de NetworkError
+    """
+    return isinstance(error, ccxt.NetworkError)
+
+
+def mirror_label(exchange) -> str:
+    """
+    Host do espelho, usado como rótulo das métricas
+    """
+    return urlparse(exchange.urls['api']['public']).netloc
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        """
+        rate: tokens repostos por segundo; capacity: rajada máxima
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Reserva `tokens` e bloqueia até que estejam disponíveis. Retorna a espera
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def delay(self, tokens: float = 1.0) -> float:
+        """
+        Espera que acquire(tokens) teria agora, sem reservar nada
+        """
+        with self._lock:
+            available = min(self.capacity, self._tokens + (time.monotonic() - self._updated) * self.rate)
+        return max(tokens - available, 0.0) / self.rate
+
+
+class FetchScheduler:
+    def __init__(self, exchanges: list, fetch_fn: Callable, max_workers: int = 12,
+                 weight_per_minute: float = 3000, weight: float = KLINES_WEIGHT,
+                 failure_threshold: int = 5, cooldown: float = 30.0, hedge: bool = False):
+        """
+        exchanges: clientes ccxt (um por espelho)
+        fetch_fn: função (exchange, symbol, timeframe, **kwargs) -> dados ou None
+            (sem dados); erros do ccxt devem ser propagados
+        weight_per_minute: orçamento total, dividido igualmente entre os espelhos
+        failure_threshold/cooldown: circuit breaker de cada espelho (ver MirrorHealth)
+        hedge: repete a requisição no próximo espelho se o primeiro passar do seu p95
+        """
+        if not exchanges:
+            raise ValueError("É necessário ao menos uma exchange")
+        self.exchanges = list(exchanges)
+        self.fetch_fn = fetch_fn
+        self.weight = weight
+        self.hedge = hedge and len(self.exchanges) > 1
+
+        per_mirror = weight_per_minute / 60.0 / len(self.exchanges)
+        self.buckets = [TokenBucket(per_mirror, max(per_mirror * 5, weight)) for _ in self.exchanges]
+
+        self.labels = [mirror_label(exchange) for exchange in self.exchanges]
+        self.health = MirrorHealth(self.labels, failure_threshold=failure_threshold, cooldown=cooldown)
+        MIRROR_LATENCY.set_function(self.health.latencies)
+        MIRROR_ERROR_RATE.set_function(self.health.error_rates)
+        MIRROR_CIRCUIT.set_function(self.health.circuit_states)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fetch')
+        # Com hedge, cada coleta pode ter duas requisições em andamento
+        self._requests = ThreadPoolExecutor(max_workers=max_workers * 2, thread_name_prefix='mirror') if self.hedge else None
+
+    def _mirror_order(self, weight: float) -> List[int]:
+        # Do espelho mais rápido ao mais lento, contando a espera no token bucket de cada um
+        return self.health.order(lambda index: self.buckets[index].delay(weight))
+
+    def _request(self, index: int, fn: Callable, *args, **kwargs):
+        """
+        Executa uma requisição em um espelho, registrando latência, erros e a
+        saúde do espelho. Resposta vazia ou erro da requisição (ex.: BadSymbol)
+        contam como sucesso do espelho
+        """
+        mirror = self.labels[index]
+        start = time.perf_counter()
+        ok = True
+        try:
+            return fn(self.exchanges[index], *args, **kwargs)
+        except Exception as e:
+            if is_mirror_failure(e):
+                ok = False
+                MIRROR_ERRORS.inc(mirror=mirror)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            MIRROR_REQUEST_SECONDS.observe(elapsed, mirror=mirror)
+            self.health.record(index, elapsed, ok)
+
+    def _run(self, fn: Callable, weight: float, *args, **kwargs):
+        """
+        Tenta os espelhos em ordem até obter dados. Com hedge, se o espelho
+        atual não responder dentro do seu p95, o próximo recebe a mesma
+        requisição e vale a primeira resposta válida. Um erro que não é do
+        espelho encerra as tentativas. Retorna (dados, erros)
+        """
+        errors = []
+        order = self._mirror_order(weight)
+        position = 0
+        while position < len(order):
+            index = order[position]
+            position += 1
+            self.buckets[index].acquire(weight)
+            if self._requests is None:
+                try:
+                    data = self._request(index, fn, *args, **kwargs)
+                    if data is not None:
+                        return data, errors
+                    errors.append(f"{self.labels[index]}: sem dados")
+                except Exception as e:
+                    errors.append(f"{self.labels[index]}: {str(e)}")
+                    if not is_mirror_failure(e):
+                        return None, errors
+                continue
+
+            futures = {self._requests.submit(self._request, index, fn, *args, **kwargs): index}
+            delay = self.health.hedge_delay(index)
+            if delay is not None and position < len(order):
+                done, _ = wait_futures(futures, timeout=delay)
+                if not done:
+                    hedge_index = order[position]
+                    position += 1
+                    self.buckets[hedge_index].acquire(weight)
+                    futures[self._requests.submit(self._request, hedge_index, fn, *args, **kwargs)] = hedge_index
+                    HEDGED_REQUESTS.inc()
+            # A requisição perdedora termina em segundo plano e só atualiza a saúde do espelho
+            for future in as_completed(futures):
+                try:
+                    data = future.result()
+                    if data is not None:
+                        return data, errors
+                    errors.append(f"{self.labels[futures[future]]}: sem dados")
+                except Exception as e:
+                    errors.append(f"{self.labels[futures[future]]}: {str(e)}")
+                    if not is_mirror_failure(e):
+                        return None, errors
+        return None, errors
+
+    def fetch(self, symbol: str, timeframe: str, **kwargs):
+        """
+        Coleta um par, do espelho mais rápido aos demais até obter dados
+        """
+        with STAGE_SECONDS.time(stage='fetch'):
+            data, errors = self._run(self.fetch_fn, self.weight, symbol, timeframe, **kwargs)
+        if data is None:
+            logger.error(f"Falha ao obter dados de todas as URLs para {symbol} ({timeframe}). Erros: {'; '.join(errors)}")
+        return data
+
+    def call(self, fn: Callable, weight: float, description: str = 'requisição'):
+        """
+        Executa fn(exchange) com o mesmo failover e orçamento de peso das
+        coletas de candles (ex.: tickers de todos os pares)
+        """
+        data, errors = self._run(fn, weight)
+        if data is None:
+            logger.error(f"Falha na {description} em todas as URLs. Erros: {'; '.join(errors)}")
+        return data
+
+    def fetch_many(self, pairs: Iterable[Tuple[str, str]], params: Optional[Dict[Tuple[str, str], dict]] = None,
+                   **kwargs) -> Dict[Tuple[str, str], Optional[object]]:
+        """
+        Coleta vários pares (symbol, timeframe) em paralelo. `params` permite
+        argumentos específicos por par (ex.: since), somados aos `kwargs` comuns
+        """
+        params = params or {}
+        futures = {
+            pair: self._executor.submit(self.fetch, pair[0], pair[1], **dict(kwargs, **params.get(pair, {})))
+            for pair in pairs
+        }
+        results = {}
+        for pair, future in futures.items():
+            try:
+                results[pair] = future.result()
+            except Exception as e:
+                logger.error(f"Erro ao coletar {pair[0]} ({pair[1]}): {str(e)}")
+                results[pair] = None
+        return results
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+        if self._requests is not None:
+            self._requests.shutdown(wait=False)
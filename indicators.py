@@ -0,0 +1,533 @@
+"""
+Motor vetorizado dos indicadores Heikin Ashi e Chandelier Exit.
+
+Recebe arrays NumPy simples e executa as recorrências (ha_open, stops e
+direção) em kernels compilados com Numba quando disponível, ou em Python
+puro sobre listas como fallback. Os resultados são idênticos, bit a bit,
+aos da implementação original baseada em pandas.
+
+IndicatorState oferece a mesma conta de forma incremental: o estado de um
+par avança uma vela fechada por vez e a vela em formação é avaliada sem
+alterar o estado confirmado.
+"""
+import copy
+import math
+import time
+from collections import deque
+from typing import NamedTuple, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    from numba import njit
+except ImportError:  # Numba é opcional
+    njit = None
+
+
+class ChandelierArrays(NamedTuple):
+    atr: np.ndarray
+    long_stop: np.ndarray
+    short_stop: np.ndarray
+    direction: np.ndarray
+    buy_signal: np.ndarray
+    sell_signal: np.ndarray
+
+
+def _ha_open_kernel(first_open, ha_close, out):
+    n = len(out)
+    if n == 0:
+        return
+    out[0] = first_open
+    for i in range(1, n):
+        out[i] = (out[i - 1] + ha_close[i - 1]) / 2
+
+
+def _rolling_mean_kernel(values, window, out):
+    # Reproduz o algoritmo de pandas.Series.rolling(window).mean() (soma de
+    # Kahan com compensações separadas para entrada e saída da janela)
+    n = len(values)
+    nobs = 0
+    neg_ct = 0
+    sum_x = 0.0
+    comp_add = 0.0
+    comp_remove = 0.0
+    same_ct = 0
+    prev_value = 0.0
+    for i in range(n):
+        start = max(0, i - window + 1)
+        if i == 0 or start >= i:
+            prev_value = values[start]
+            same_ct = 0
+            nobs = 0
+            neg_ct = 0
+            sum_x = 0.0
+            comp_add = 0.0
+            comp_remove = 0.0
+            first_add = start
+        else:
+            for j in range(max(0, i - window), start):
+                val = values[j]
+                if val == val:
+                    nobs -= 1
+                    y = -val - comp_remove
+                    t = sum_x + y
+                    comp_remove = t - sum_x - y
+                    sum_x = t
+                    if math.copysign(1.0, val) < 0:
+                        neg_ct -= 1
+            first_add = i
+        for j in range(first_add, i + 1):
+            val = values[j]
+            if val == val:
+                nobs += 1
+                y = val - comp_add
+                t = sum_x + y
+                comp_add = t - sum_x - y
+                sum_x = t
+                if math.copysign(1.0, val) < 0:
+                    neg_ct += 1
+                if val == prev_value:
+                    same_ct += 1
+                else:
+                    same_ct = 1
+                prev_value = val
+        if nobs >= window and nobs > 0:
+            result = sum_x / nobs
+            if same_ct >= nobs:
+                result = prev_value
+            elif neg_ct == 0 and result < 0:
+                result = 0.0
+            elif neg_ct == nobs and result > 0:
+                result = 0.0
+            out[i] = result
+        else:
+            out[i] = math.nan
+
+
+def _chandelier_kernel(highest, lowest, close, atr, period,
+                       long_stop, short_stop, direction, buy_signal, sell_signal):
+    n = len(close)
+    for i in range(period, n):
+        long_val = highest[i] - atr[i]
+        short_val = lowest[i] + atr[i]
+
+        if i > period:
+            long_prev = long_stop[i - 1]
+            if long_prev == long_prev and close[i - 1] > long_prev:
+                if long_prev > long_val:
+                    long_val = long_prev
+
+            short_prev = short_stop[i - 1]
+            if short_prev == short_prev and close[i - 1] < short_prev:
+                if short_prev < short_val:
+                    short_val = short_prev
+
+        long_stop[i] = long_val
+        short_stop[i] = short_val
+
+        if i > period:
+            prev_dir = direction[i - 1]
+            if close[i] > short_stop[i - 1]:
+                curr_dir = 1
+            elif close[i] < long_stop[i - 1]:
+                curr_dir = -1
+            else:
+                curr_dir = prev_dir
+            direction[i] = curr_dir
+
+            if curr_dir == 1 and prev_dir == -1:
+                buy_signal[i] = True
+            if curr_dir == -1 and prev_dir == 1:
+                sell_signal[i] = True
+
+
+if njit is not None:
+    _ha_open_jit = njit(cache=True)(_ha_open_kernel)
+    _rolling_mean_jit = njit(cache=True)(_rolling_mean_kernel)
+    _chandelier_jit = njit(cache=True)(_chandelier_kernel)
+
+USE_NUMBA = njit is not None
+
+
+def _as_float_array(values) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def heikin_ashi(open_, high, low, close) -> tuple:
+    """
+    Retorna (ha_open, ha_high, ha_low, ha_close) a partir dos arrays OHLC
+    """
+    open_ = _as_float_array(open_)
+    high = _as_float_array(high)
+    low = _as_float_array(low)
+    close = _as_float_array(close)
+
+    ha_close = (open_ + high + low + close) / 4
+    # Máxima/mínima usam os valores originais, assim como na versão pandas
+    ha_high = np.fmax(np.fmax(high, open_), close)
+    ha_low = np.fmin(np.fmin(low, open_), close)
+
+    n = len(ha_close)
+    first_open = (open_[0] + close[0]) / 2 if n else 0.0
+    if USE_NUMBA:
+        ha_open = np.empty(n)
+        _ha_open_jit(first_open, ha_close, ha_open)
+    else:
+        out = [0.0] * n
+        _ha_open_kernel(first_open, ha_close.tolist(), out)
+        ha_open = np.array(out, dtype=np.float64)
+
+    return ha_open, ha_high, ha_low, ha_close
+
+
+def true_range(high, low, close) -> np.ndarray:
+    high = _as_float_array(high)
+    low = _as_float_array(low)
+    close = _as_float_array(close)
+
+    prev_close = np.empty_like(close)
+    prev_close[:1] = np.nan
+    prev_close[1:] = close[:-1]
+
+    tr = high - low
+    tr = np.fmax(tr, np.abs(high - prev_close))
+    tr = np.fmax(tr, np.abs(low - prev_close))
+    return tr
+
+
+def rolling_mean(values, window: int) -> np.ndarray:
+    """
+    Média móvel idêntica à de pandas (inclusive nos últimos bits)
+    """
+    values = _as_float_array(values)
+    if USE_NUMBA:
+        out = np.empty(len(values))
+        _rolling_mean_jit(values, window, out)
+        return out
+    out = [0.0] * len(values)
+    _rolling_mean_kernel(values.tolist(), window, out)
+    return np.array(out, dtype=np.float64)
+
+
+def rolling_extremes(high, low, period: int) -> tuple:
+    """
+    Máxima de high e mínima de low nas `period` velas anteriores a cada índice
+    """
+    n = len(high)
+    highest = np.full(n, np.nan)
+    lowest = np.full(n, np.nan)
+    if 0 < period < n:
+        highest[period:] = np.fmax.reduce(sliding_window_view(high, period)[:n - period], axis=1)
+        lowest[period:] = np.fmin.reduce(sliding_window_view(low, period)[:n - period], axis=1)
+    return highest, lowest
+
+
+def chandelier_exit(high, low, close, atr_period: int = 1, atr_multiplier: float = 0.8,
+                    use_close: bool = True) -> ChandelierArrays:
+    """
+    Calcula o Chandelier Exit sobre arrays (normalmente candles Heikin Ashi)
+    """
+    high = _as_float_array(high)
+    low = _as_float_array(low)
+    close = _as_float_array(close)
+    n = len(close)
+
+    atr = rolling_mean(true_range(high, low, close), atr_period) * atr_multiplier
+    if use_close:
+        highest, lowest = rolling_extremes(close, close, atr_period)
+    else:
+        highest, lowest = rolling_extremes(high, low, atr_period)
+
+    if USE_NUMBA:
+        long_stop = np.full(n, np.nan)
+        short_stop = np.full(n, np.nan)
+        direction = np.ones(n, dtype=np.int64)
+        buy_signal = np.zeros(n, dtype=np.bool_)
+        sell_signal = np.zeros(n, dtype=np.bool_)
+        _chandelier_jit(highest, lowest, close, atr, atr_period,
+                        long_stop, short_stop, direction, buy_signal, sell_signal)
+    else:
+        long_list = [math.nan] * n
+        short_list = [math.nan] * n
+        dir_list = [1] * n
+        buy_list = [False] * n
+        sell_list = [False] * n
+        _chandelier_kernel(highest.tolist(), lowest.tolist(), close.tolist(), atr.tolist(),
+                           atr_period, long_list, short_list, dir_list, buy_list, sell_list)
+        long_stop = np.array(long_list, dtype=np.float64)
+        short_stop = np.array(short_list, dtype=np.float64)
+        direction = np.array(dir_list, dtype=np.int64)
+        buy_signal = np.array(buy_list, dtype=np.bool_)
+        sell_signal = np.array(sell_list, dtype=np.bool_)
+
+    return ChandelierArrays(atr, long_stop, short_stop, direction, buy_signal, sell_signal)
+
+
+def confirmed_signals(ha_open, ha_high, ha_low, ha_close, buy_signal, sell_signal) -> tuple:
+    """
+    Máscaras (long, short) das velas com sinal confirmado, com as mesmas
+    regras de CryptoBot.analyze_signals: virada do Chandelier Exit com
+    fechamento acima da máxima anterior e acima da abertura (LONG), ou
+    abaixo da mínima anterior e da abertura (SHORT). buy_signal/sell_signal
+    podem ter uma linha por conjunto de parâmetros (shape (k, n))
+    """
+    long_mask = np.zeros(np.shape(buy_signal), dtype=np.bool_)
+    short_mask = np.zeros(np.shape(buy_signal), dtype=np.bool_)
+    if len(ha_close) < 2:
+        return long_mask, short_mask
+
+    close = ha_close[1:]
+    long_mask[..., 1:] = buy_signal[..., 1:] & (close > ha_high[:-1]) & (close > ha_open[1:])
+    short_mask[..., 1:] = (sell_signal[..., 1:] & (close < ha_low[:-1]) & (close < ha_open[1:])
+                           & ~long_mask[..., 1:])
+    return long_mask, short_mask
+
+
+def chandelier_signals_batch(highest, lowest, close, mean_tr, period: int, multipliers) -> tuple:
+    """
+    Viradas do Chandelier Exit (buy_signal, sell_signal), shape (k, n), para
+    vários multiplicadores do ATR de uma vez. highest/lowest e a média do
+    true range (sem multiplicador) são calculados uma única vez pelo chamador.
+    Os resultados são idênticos aos de chandelier_exit para cada multiplicador
+    """
+    multipliers = np.asarray(multipliers, dtype=np.float64)
+    n = len(close)
+    buy = np.zeros((len(multipliers), n), dtype=np.bool_)
+    sell = np.zeros((len(multipliers), n), dtype=np.bool_)
+    # Mesmo produto elemento a elemento de rolling_mean(tr) * multiplicador
+    atr = mean_tr[None, :] * multipliers[:, None]
+
+    if USE_NUMBA:
+        for k in range(len(multipliers)):
+            long_stop = np.full(n, np.nan)
+            short_stop = np.full(n, np.nan)
+            direction = np.ones(n, dtype=np.int64)
+            _chandelier_jit(highest, lowest, close, atr[k], period,
+                            long_stop, short_stop, direction, buy[k], sell[k])
+        return buy, sell
+
+    # Sem Numba: a recorrência avança no tempo com todos os multiplicadores vetorizados
+    long_prev = short_prev = None
+    dir_prev = np.ones(len(multipliers), dtype=np.int64)
+    for i in range(period, n):
+        long_val = highest[i] - atr[:, i]
+        short_val = lowest[i] + atr[:, i]
+        if i > period:
+            keep_long = (long_prev == long_prev) & (close[i - 1] > long_prev) & (long_prev > long_val)
+            long_val = np.where(keep_long, long_prev, long_val)
+            keep_short = (short_prev == short_prev) & (close[i - 1] < short_prev) & (short_prev < short_val)
+            short_val = np.where(keep_short, short_prev, short_val)
+
+            curr_dir = np.where(close[i] > short_prev, 1, np.where(close[i] < long_prev, -1, dir_prev))
+            buy[:, i] = (curr_dir == 1) & (dir_prev == -1)
+            sell[:, i] = (curr_dir == -1) & (dir_prev == 1)
+            dir_prev = curr_dir
+        long_prev = long_val
+        short_prev = short_val
+    return buy, sell
+
+
+def _fmax(a: float, b: float) -> float:
+    # Mesma semântica de np.fmax: NaN só vence se ambos forem NaN
+    if b != b:
+        return a
+    if a != a:
+        return b
+    return a if a >= b else b
+
+
+def _fmin(a: float, b: float) -> float:
+    if b != b:
+        return a
+    if a != a:
+        return b
+    return a if a <= b else b
+
+
+class IndicatorState:
+    """
+    Estado incremental de Heikin Ashi + Chandelier Exit de um par.
+
+    update() incorpora uma vela fechada em O(atr_period); preview() avalia a
+    vela em formação sobre uma cópia, sem alterar o estado confirmado.
+    Partindo da mesma primeira vela, os valores são idênticos aos do cálculo
+    em lote (heikin_ashi + chandelier_exit).
+    """
+
+    def __init__(self, atr_period: int = 1, atr_multiplier: float = 0.8, use_close: bool = True):
+        self.atr_period = atr_period
+        self.atr_multiplier = atr_multiplier
+        self.use_close = use_close
+
+        self.count = 0
+        self.timestamp = None  # Última vela confirmada
+        self.last_signal: Optional[dict] = None
+
+        # Vela Heikin Ashi anterior (open, high, low, close)
+        self._ha = None
+        # Janelas das últimas `atr_period` velas
+        self._extremes = deque(maxlen=atr_period)
+        self._tr_window = deque(maxlen=atr_period)
+
+        # Média móvel do true range (mesmo algoritmo do pandas)
+        self._nobs = 0
+        self._neg_ct = 0
+        self._sum_x = 0.0
+        self._comp_add = 0.0
+        self._comp_remove = 0.0
+        self._same_ct = 0
+        self._prev_value = 0.0
+
+        self._long_stop = math.nan
+        self._short_stop = math.nan
+        self._direction = 1
+
+    def _add_tr(self, val: float):
+        if val == val:
+            self._nobs += 1
+            y = val - self._comp_add
+            t = self._sum_x + y
+            self._comp_add = t - self._sum_x - y
+            self._sum_x = t
+            if math.copysign(1.0, val) < 0:
+                self._neg_ct += 1
+            if val == self._prev_value:
+                self._same_ct += 1
+            else:
+                self._same_ct = 1
+            self._prev_value = val
+
+    def _remove_tr(self, val: float):
+        if val == val:
+            self._nobs -= 1
+            y = -val - self._comp_remove
+            t = self._sum_x + y
+            self._comp_remove = t - self._sum_x - y
+            self._sum_x = t
+            if math.copysign(1.0, val) < 0:
+                self._neg_ct -= 1
+
+    def _mean_tr(self) -> float:
+        if self._nobs >= self.atr_period and self._nobs > 0:
+            result = self._sum_x / self._nobs
+            if self._same_ct >= self._nobs:
+                return self._prev_value
+            if self._neg_ct == 0 and result < 0:
+                return 0.0
+            if self._neg_ct == self._nobs and result > 0:
+                return 0.0
+            return result
+        return math.nan
+
+    def _advance(self, timestamp, open_: float, high: float, low: float, close: float,
+                 timings: Optional[list] = None) -> Optional[dict]:
+        i = self.count
+        period = self.atr_period
+        if timings is not None:
+            start = time.perf_counter()
+
+        # 1. Heikin Ashi
+        ha_close = (open_ + high + low + close) / 4
+        ha_open = (open_ + close) / 2 if i == 0 else (self._ha[0] + self._ha[3]) / 2
+        ha_high = _fmax(_fmax(high, open_), close)
+        ha_low = _fmin(_fmin(low, open_), close)
+        if timings is not None:
+            ha_done = time.perf_counter()
+            timings[0] += ha_done - start
+
+        # 2. True range e ATR
+        prev_close = self._ha[3] if i > 0 else math.nan
+        tr = _fmax(_fmax(ha_high - ha_low, abs(ha_high - prev_close)), abs(ha_low - prev_close))
+        if i == 0 or period <= 1:
+            self._nobs = self._neg_ct = self._same_ct = 0
+            self._sum_x = self._comp_add = self._comp_remove = 0.0
+            self._prev_value = tr
+        elif len(self._tr_window) == period:
+            self._remove_tr(self._tr_window[0])
+        self._add_tr(tr)
+        self._tr_window.append(tr)
+        atr = self._mean_tr() * self.atr_multiplier
+
+        # 3. Chandelier Exit
+        direction = 1
+        buy_signal = sell_signal = False
+        long_stop = short_stop = math.nan
+        if i >= period:
+            highest = lowest = math.nan
+            for window_high, window_low in self._extremes:
+                highest = _fmax(highest, window_high)
+                lowest = _fmin(lowest, window_low)
+            long_stop = highest - atr
+            short_stop = lowest + atr
+
+            if i > period:
+                prev_close_ha = self._ha[3]
+                if self._long_stop == self._long_stop and prev_close_ha > self._long_stop:
+                    if self._long_stop > long_stop:
+                        long_stop = self._long_stop
+                if self._short_stop == self._short_stop and prev_close_ha < self._short_stop:
+                    if self._short_stop < short_stop:
+                        short_stop = self._short_stop
+
+                prev_dir = self._direction
+                if ha_close > self._short_stop:
+                    direction = 1
+                elif ha_close < self._long_stop:
+                    direction = -1
+                else:
+                    direction = prev_dir
+                buy_signal = direction == 1 and prev_dir == -1
+                sell_signal = direction == -1 and prev_dir == 1
+        if timings is not None:
+            timings[1] += time.perf_counter() - ha_done
+
+        # 4. Confirmação (mesmas regras de CryptoBot.analyze_signals)
+        signal = None
+        if i > 0:
+            if buy_signal and ha_close > self._ha[1] and ha_close > ha_open:
+                signal = {'type': 'LONG', 'price': ha_close, 'timestamp': timestamp}
+            elif sell_signal and ha_close < self._ha[2] and ha_close < ha_open:
+                signal = {'type': 'SHORT', 'price': ha_close, 'timestamp': timestamp}
+
+        self._ha = (ha_open, ha_high, ha_low, ha_close)
+        self._extremes.append((ha_close, ha_close) if self.use_close else (ha_high, ha_low))
+        self._long_stop = long_stop
+        self._short_stop = short_stop
+        self._direction = direction
+        self.count = i + 1
+        self.timestamp = timestamp
+        return signal
+
+    def update(self, timestamp, open_: float, high: float, low: float, close: float,
+               timings: Optional[list] = None) -> Optional[dict]:
+        """
+        Confirma uma vela fechada e retorna o sinal confirmado nela (se houver).
+        `timings` ([heikin_ashi, chandelier_exit], em segundos) acumula a duração de cada etapa
+        """
+        signal = self._advance(timestamp, open_, high, low, close, timings)
+        if signal:
+            self.last_signal = signal
+        return signal
+
+    def preview(self, timestamp, open_: float, high: float, low: float, close: float,
+                timings: Optional[list] = None) -> Optional[dict]:
+        """
+        Avalia a vela em formação sem alterar o estado confirmado
+        """
+        clone = copy.copy(self)
+        clone._extremes = self._extremes.copy()
+        clone._tr_window = self._tr_window.copy()
+        return clone._advance(timestamp, open_, high, low, close, timings)
+
+    @property
+    def direction(self) -> int:
+        return self._direction
+
+    @property
+    def long_stop(self) -> float:
+        return self._long_stop
+
+    @property
+    def short_stop(self) -> float:
+        return self._short_stop
@@ -0,0 +1,105 @@
+"""
+Servidor WebSocket local que reproduz mensagens de kline gravadas.
+
+Substitui o stream combinado da Binance em testes offline. A gravação é o
+arquivo JSON lines produzido pelo KlineStream com KLINE_STREAM_RECORD_PATH
+({"ts": <ms de recebimento>, "message": <mensagem do stream>}). Cada conexão
+responde aos SUBSCRIBE/UNSUBSCRIBE e recebe apenas os streams assinados,
+respeitando o intervalo original entre as mensagens (dividido por --speed).
+
+Uso:
+    python kline_replay.py klines.jsonl --port 8765 --speed 10
+    KLINE_STREAM_ENABLED=1 KLINE_STREAM_URL=ws://localhost:8765/stream python crypto_web.py
+"""
+import argparse
+import json
+import logging
+import time
+from urllib.parse import parse_qs, urlparse
+
+from websockets.sync.server import serve
+
+logger = logging.getLogger(__name__)
+
+
+def load_recording(path: str) -> list:
+    """
+    Lista de (ts, mensagem serializada, stream) na ordem gravada
+    """
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            message = entry['message']
+            if 'stream' not in message:
+                continue
+            records.append((entry['ts'], json.dumps(message, separators=(',', ':')), message['stream']))
+    return records
+
+
+def make_handler(records: list, speed: float):
+    def handle_control(websocket, raw, streams):
+        request = json.loads(raw)
+        method = request.get('method')
+        params = request.get('params') or []
+        if method == 'SUBSCRIBE':
+            streams.update(params)
+        elif method == 'UNSUBSCRIBE':
+            streams.difference_update(params)
+        websocket.send(json.dumps({'result': None, 'id': request.get('id')}))
+
+    def handler(websocket):
+        query = parse_qs(urlparse(websocket.request.path).query)
+        streams = set(query['streams'][0].split('/')) if 'streams' in query else set()
+        logger.info(f"Cliente conectado: {websocket.remote_address}")
+
+        # Aguarda a primeira assinatura antes de começar a reprodução
+        while not streams:
+            handle_control(websocket, websocket.recv(), streams)
+
+        started = time.monotonic()
+        first_ts = records[0][0] if records else 0
+        sent = 0
+        for ts, payload, stream in records:
+            # Atende mensagens de controle sem bloquear a reprodução
+            try:
+                while True:
+                    handle_control(websocket, websocket.recv(timeout=0), streams)
+            except TimeoutError:
+                pass
+
+            delay = (ts - first_ts) / 1000 / speed - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+            if stream in streams:
+                websocket.send(payload)
+                sent += 1
+
+        logger.info(f"Reprodução concluída: {sent} mensagens enviadas para {websocket.remote_address}")
+        websocket.close()
+
+    return handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reproduz uma gravação de streams de kline da Binance')
+    parser.add_argument('recording', help='arquivo JSON lines gravado pelo KlineStream')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--speed', type=float, default=1.0, help='fator de aceleração da reprodução')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    records = load_recording(args.recording)
+    logger.info(f"{len(records)} mensagens carregadas de {args.recording}")
+
+    with serve(make_handler(records, args.speed), args.host, args.port) as server:
+        logger.info(f"Servindo em ws://{args.host}:{args.port}/stream")
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
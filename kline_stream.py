@@ -0,0 +1,228 @@
+"""
+Ingestão contínua de candles pelos streams de kline da Binance (WebSocket).
+
+Uma única conexão combinada assina `<symbol>@kline_<timeframe>` para todos os
+pares monitorados e grava cada atualização no CandleStore. Enquanto o stream
+está saudável, as varreduras leem os candles direto do store, sem REST; pares
+com lacunas (reconexão, vela perdida) são marcados como pendentes e voltam a
+ser sincronizados pela coleta REST normal.
+"""
+import json
+import logging
+import threading
+import time
+from typing import Iterable, Optional, Tuple
+
+try:
+    from websockets.sync.client import connect
+    from websockets.exceptions import ConnectionClosed
+except ImportError:  # websockets é opcional: sem ele o bot usa apenas REST
+    connect = None
+    ConnectionClosed = OSError
+
+from candle_store import CandleStore
+
+logger = logging.getLogger(__name__)
+
+BINANCE_STREAM_URL = 'wss://stream.binance.com:9443/stream'
+MAX_STREAMS_PER_CONNECTION = 1024
+# A Binance aceita até 5 mensagens de controle por segundo por conexão
+SUBSCRIBE_BATCH = 200
+SUBSCRIBE_INTERVAL = 0.25
+
+
+def stream_name(symbol: str, timeframe: str) -> str:
+    """
+    Nome do stream de kline: 'BTC/USDT', '1h' -> 'btcusdt@kline_1h'
+    """
+    return f"{symbol.replace('/', '').lower()}@kline_{timeframe}"
+
+
+def parse_kline(message: dict) -> Optional[Tuple[str, list, bool]]:
+    """
+    Extrai (stream, [ts, o, h, l, c, v], vela_fechada) de uma mensagem do
+    stream combinado; None para respostas de controle
+    """
+    data = message.get('data')
+    if not isinstance(data, dict) or data.get('e') != 'kline':
+        return None
+    k = data['k']
+    row = [int(k['t']), float(k['o']), float(k['h']), float(k['l']), float(k['c']), float(k['v'])]
+    return message.get('stream'), row, bool(k['x'])
+
+
+class KlineStream:
+    def __init__(self, store: CandleStore, pairs: Iterable[Tuple[str, str]], url: str = BINANCE_STREAM_URL,
+                 stale_after: float = 30.0, record_path: Optional[str] = None):
+        """
+        store: CandleStore compartilhado com a coleta REST
+        stale_after: segundos sem mensagens para considerar o stream parado
+        record_path: se informado, grava as mensagens recebidas (JSON lines)
+        para reprodução offline com kline_replay.py
+        """
+        self.store = store
+        self.url = url
+        self.stale_after = stale_after
+        self.record_path = record_path
+        self._pairs = self._stream_map(pairs)
+        self._changes = []
+        self._lock = threading.Lock()
+        # Todos os pares começam pendentes até a primeira carga via REST
+        self._stale = set(self._pairs.values())
+        self._closed = set()
+        self._connected = False
+        self._last_message = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _stream_map(pairs: Iterable[Tuple[str, str]]) -> dict:
+        streams = {stream_name(symbol, timeframe): (symbol, timeframe) for symbol, timeframe in pairs}
+        if len(streams) > MAX_STREAMS_PER_CONNECTION:
+            logger.warning(f"{len(streams)} streams excedem o limite de {MAX_STREAMS_PER_CONNECTION} "
+                           f"por conexão; os excedentes seguem via REST")
+            streams = dict(list(streams.items())[:MAX_STREAMS_PER_CONNECTION])
+        return streams
+
+    def update_pairs(self, pairs: Iterable[Tuple[str, str]]):
+        """
+        Troca os pares assinados; a conexão ativa recebe apenas os
+        SUBSCRIBE/UNSUBSCRIBE da diferença
+        """
+        streams = self._stream_map(pairs)
+        with self._lock:
+            added = [name for name in streams if name not in self._pairs]
+            removed = [name for name in self._pairs if name not in streams]
+            self._pairs = streams
+            self._stale.update(streams[name] for name in added)
+            self._stale.intersection_update(streams.values())
+            if removed:
+                self._changes.append(('UNSUBSCRIBE', removed))
+            if added:
+                self._changes.append(('SUBSCRIBE', added))
+
+    @property
+    def healthy(self) -> bool:
+        return self._connected and time.monotonic() - self._last_message < self.stale_after
+
+    def start(self) -> bool:
+        if connect is None:
+            logger.warning("Pacote websockets não instalado; streams de kline desativados")
+            return False
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='kline-stream', daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def is_live(self, pair: Tuple[str, str], limit: int) -> bool:
+        """
+        Indica se o store já tem `limit` velas contíguas do par mantidas pelo stream
+        """
+        if stream_name(*pair) not in self._pairs:
+            return False
+        with self._lock:
+            if pair in self._stale:
+                return False
+        buffer = self.store.get(*pair)
+        return buffer is not None and len(buffer) >= limit
+
+    def mark_synced(self, pair: Tuple[str, str]):
+        """
+        Chamado após a coleta REST do par preencher eventuais lacunas
+        """
+        with self._lock:
+            self._stale.discard(pair)
+
+    def pop_closed(self) -> set:
+        """
+        Pares cuja vela fechou desde a última chamada
+        """
+        with self._lock:
+            closed, self._closed = self._closed, set()
+        return closed
+
+    def _run(self):
+        delay = 1
+        while not self._stop.is_set():
+            try:
+                self._session()
+                delay = 1
+            except (OSError, ConnectionClosed, TimeoutError) as e:
+                logger.warning(f"Stream de kline desconectado: {str(e)}")
+            except Exception as e:
+                logger.error(f"Erro no stream de kline: {str(e)}")
+            finally:
+                self._disconnected()
+            if not self._stop.is_set():
+                logger.info(f"Reconectando ao stream de kline em {delay}s...")
+                self._stop.wait(delay)
+                delay = min(delay * 2, 60)
+
+    def _disconnected(self):
+        with self._lock:
+            self._connected = False
+            # Atualizações perdidas durante a queda são recuperadas via REST
+            self._stale.update(self._pairs.values())
+
+    def _session(self):
+        record = open(self.record_path, 'a', encoding='utf-8') if self.record_path else None
+        try:
+            with connect(self.url, open_timeout=10, close_timeout=5) as ws:
+                with self._lock:
+                    streams = list(self._pairs)
+                    self._changes = []
+                self._send_control(ws, 'SUBSCRIBE', streams)
+                logger.info(f"Stream de kline conectado em {self.url} ({len(streams)} streams)")
+                self._connected = True
+                self._last_message = time.monotonic()
+
+                while not self._stop.is_set():
+                    message = json.loads(ws.recv(timeout=self.stale_after))
+                    self._last_message = time.monotonic()
+                    if record is not None:
+                        record.write(json.dumps({'ts': int(time.time() * 1000), 'message': message}) + '\n')
+                    self._handle(message)
+                    if self._changes:
+                        with self._lock:
+                            changes, self._changes = self._changes, []
+                        for method, names in changes:
+                            self._send_control(ws, method, names)
+                            logger.info(f"Stream de kline: {method} de {len(names)} streams")
+        finally:
+            if record is not None:
+                record.close()
+
+    @staticmethod
+    def _send_control(ws, method: str, streams: list):
+        for index in range(0, len(streams), SUBSCRIBE_BATCH):
+            ws.send(json.dumps({
+                'method': method,
+                'params': streams[index:index + SUBSCRIBE_BATCH],
+                'id': index // SUBSCRIBE_BATCH + 1,
+            }))
+            time.sleep(SUBSCRIBE_INTERVAL)
+
+    def _handle(self, message: dict):
+        if 'error' in message:
+            logger.error(f"Erro retornado pelo stream de kline: {message['error']}")
+            return
+        parsed = parse_kline(message)
+        if parsed is None:
+            return
+        stream, row, closed = parsed
+        pair = self._pairs.get(stream)
+        if pair is None:
+            return
+
+        if not self.store.merge_contiguous(pair[0], pair[1], row):
+            # Sem histórico ou com lacuna: espera a coleta REST do par
+            with self._lock:
+                self._stale.add(pair)
+            return
+        if closed:
+            with self._lock:
+                self._closed.add(pair)
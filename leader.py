@@ -0,0 +1,75 @@
+"""
+Eleição de um único processo produtor via lock de arquivo.
+
+Todos os workers do gunicorn tentam obter o lock exclusivo; apenas quem o
+detém roda o loop de coleta/análise. O lock é liberado automaticamente pelo
+sistema operacional quando o processo termina, e outro worker assume.
+"""
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem flock, o processo único é sempre o produtor
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._fd is not None
+
+    def _lock_file(self) -> bool:
+        with self._lock:
+            if self._fd is not None:
+                return True
+            if fcntl is None:
+                self._fd = -1
+                return True
+
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+
+            os.ftruncate(fd, 0)
+            os.write(fd, str(os.getpid()).encode())
+            self._fd = fd
+            logger.info(f"Processo {os.getpid()} assumiu como produtor ({self.path})")
+            return True
+
+    def try_acquire(self) -> bool:
+        """
+        Tenta obter o lock sem bloquear
+        """
+        return self._lock_file()
+
+    def acquire(self, poll_interval: float = 5.0) -> bool:
+        """
+        Aguarda até que este processo se torne o produtor. Usa tentativas não
+        bloqueantes para não segurar o lock interno durante a espera: as outras
+        threads do worker gthread (ex.: release() no encerramento) seguem livres
+        """
+        while not self._lock_file():
+            time.sleep(poll_interval)
+        return True
+
+    def release(self):
+        with self._lock:
+            if self._fd is None:
+                return
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+                os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,201 @@
+"""
+Teste de carga do servidor web (login, / e /get_prices).
+
+Cada sessão simulada faz login e passa a consultar o /get_prices como o
+dashboard (com If-None-Match), abrindo a página principal de tempos em
+tempos. Ao final são exibidos p50/p99 de latência, vazão e erros por rota.
+
+Com --launch, o servidor é iniciado com o startCommand do render.yaml
+(gunicorn, workers gthread) apontando para uma Binance falsa local
+(fake_binance.py), sem nenhum acesso à Binance real.
+
+Uso:
+    python load_test.py --url http://localhost:5000 --sessions 50 --duration 30
+    python load_test.py --launch --sessions 200 --duration 60 --fake-latency 80 --fake-error-rate 0.01
+"""
+import argparse
+import logging
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+
+import fake_binance
+
+logger = logging.getLogger(__name__)
+
+RENDER_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'render.yaml')
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def add(self, route: str, latency: float, ok: bool):
+        with self._lock:
+            self.latencies[route].append(latency)
+            if not ok:
+                self.errors[route] += 1
+
+    def report(self, elapsed: float) -> str:
+        lines = [f"{'rota':<16} {'reqs':>7} {'req/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9} {'máx (ms)':>9} {'erros':>6}"]
+        total = 0
+        for route in sorted(self.latencies):
+            values = np.array(self.latencies[route]) * 1000
+            total += len(values)
+            lines.append(f"{route:<16} {len(values):>7} {len(values) / elapsed:>8.1f} {np.percentile(values, 50):>9.1f} "
+                         f"{np.percentile(values, 99):>9.1f} {values.max():>9.1f} {self.errors[route]:>6}")
+        lines.append(f"Total: {total} requisições em {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+        return '\n'.join(lines)
+
+
+def run_session(base_url: str, recorder: Recorder, stop: threading.Event, poll_interval: float,
+                page_every: int, username: str, password: str):
+    """
+    Uma sessão do dashboard: login, página principal e polling do /get_prices
+    """
+    session = requests.Session()
+
+    def timed(route: str, method: str, path: str, ok_status=(200,), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, timeout=30, **kwargs)
+            ok = response.status_code in ok_status
+        except requests.RequestException:
+            response, ok = None, False
+        recorder.add(route, time.perf_counter() - start, ok)
+        return response
+
+    timed('GET /login', 'GET', '/login')
+    response = timed('POST /login', 'POST', '/login', ok_status=(302,), allow_redirects=False,
+                     data={'username': username, 'password': password})
+    if response is None or response.status_code != 302:
+        return
+
+    etag = None
+    iteration = 0
+    while not stop.is_set():
+        if iteration % page_every == 0:
+            timed('GET /', 'GET', '/')
+        headers = {'If-None-Match': etag} if etag else {}
+        response = timed('GET /get_prices', 'GET', '/get_prices', ok_status=(200, 304), headers=headers)
+        if response is not None and response.headers.get('ETag'):
+            etag = response.headers['ETag']
+        iteration += 1
+        stop.wait(poll_interval)
+
+
+def render_start_command(path: str = RENDER_CONFIG) -> str:
+    """
+    startCommand do render.yaml (leitura simples, sem depender de um parser YAML)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            key, _, value = line.strip().partition(':')
+            if key == 'startCommand':
+                return value.strip()
+    raise ValueError(f"startCommand não encontrado em {path}")
+
+
+def wait_ready(url: str, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url + '/login', timeout=2).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def launch(port: int, fake_url: str, state_dir: str) -> subprocess.Popen:
+    """
+    Sobe o servidor com as configurações do render.yaml, apontado para a Binance falsa
+    """
+    command = shlex.split(render_start_command()) + ['--bind', f'127.0.0.1:{port}']
+    # Nada do teste chega ao email nem ao registro de alertas de produção
+    env = dict(os.environ, BINANCE_API_URLS=fake_url, SHARED_STATE_DIR=state_dir,
+               SIGNAL_STORE_PATH=os.path.join(state_dir, 'signals.sqlite3'), EMAIL_ENABLED='0',
+               OHLCV_ARCHIVE_DIR='', KLINE_STREAM_ENABLED='0', PYTHONUNBUFFERED='1')
+    logger.info(f"Iniciando: {' '.join(command)}")
+    try:
+        return subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    except FileNotFoundError:
+        logger.error(f"{command[0]} não encontrado (pip install -r requirements.txt)")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga do servidor web')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='servidor já em execução')
+    parser.add_argument('--sessions', type=int, default=50, help='sessões simultâneas')
+    parser.add_argument('--duration', type=float, default=30, help='segundos de carga')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='intervalo entre /get_prices por sessão')
+    parser.add_argument('--page-every', type=int, default=30, help='abre / a cada N consultas')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--launch', action='store_true', help='inicia o servidor do render.yaml e uma Binance falsa')
+    parser.add_argument('--port', type=int, default=8000, help='porta do servidor iniciado com --launch')
+    parser.add_argument('--fake-port', type=int, default=8900)
+    parser.add_argument('--fake-symbols', type=int, default=30)
+    parser.add_argument('--fake-latency', type=float, default=50.0, help='ms')
+    parser.add_argument('--fake-error-rate', type=float, default=0.0)
+    parser.add_argument('--fake-throttle-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server: Optional[subprocess.Popen] = None
+    fake_server = fake = None
+    base_url = args.url.rstrip('/')
+    try:
+        if args.launch:
+            market = fake_binance.synthetic_market(args.fake_symbols)
+            fake = fake_binance.FakeBinance(market, args.fake_latency, args.fake_latency / 2,
+                                            args.fake_error_rate, args.fake_throttle_rate)
+            fake_server = fake_binance.serve(fake, '127.0.0.1', args.fake_port)
+            threading.Thread(target=fake_server.serve_forever, name='fake-binance', daemon=True).start()
+            server = launch(args.port, f"http://127.0.0.1:{args.fake_port}/api/v3", tempfile.mkdtemp(prefix='load_test_'))
+            base_url = f"http://127.0.0.1:{args.port}"
+
+        if not wait_ready(base_url, 60):
+            logger.error(f"Servidor {base_url} não respondeu")
+            sys.exit(1)
+
+        recorder = Recorder()
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=run_session, daemon=True, args=(
+                base_url, recorder, stop, args.poll_interval, args.page_every, args.username, args.password))
+            for _ in range(args.sessions)
+        ]
+        logger.info(f"{args.sessions} sessões contra {base_url} por {args.duration:.0f}s")
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=30)
+        print(recorder.report(time.monotonic() - start))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if fake_server is not None:
+            fake_server.shutdown()
+            logger.info(f"Binance falsa atendeu {fake.requests} requisições")
+
+
+if __name__ == '__main__':
+    main()
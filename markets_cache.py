@@ -0,0 +1,58 @@
+"""
+Cache local dos metadados de mercado da Binance.
+
+load_markets() é um dos endpoints mais pesados da Binance e seria repetido
+por cada cliente ccxt em cada worker. O resultado é gravado em disco com
+TTL e injetado nos clientes com set_markets(), sem acesso à rede.
+"""
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def compact_markets(markets: dict, quote: Optional[str] = None) -> dict:
+    """
+    Mantém apenas os mercados spot (da moeda de cotação `quote`, se informada)
+    e descarta o payload bruto ('info'), que não é usado para buscar candles
+    ou tickers. Menos mercados também deixa o set_markets() de cada cliente
+    mais rápido
+    """
+    return {
+        symbol: {key: value for key, value in market.items() if key != 'info'}
+        for symbol, market in markets.items()
+        if market.get('spot') and (quote is None or market.get('quote') == quote)
+    }
+
+
+def load_markets_cache(path: str, ttl: float) -> Optional[dict]:
+    """
+    Retorna os mercados do cache, ou None se ausente, inválido ou expirado
+    """
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            logger.info("Cache de mercados expirado")
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            markets = json.load(f)
+        logger.info(f"{len(markets)} mercados carregados do cache {path}")
+        return markets or None
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Erro ao ler cache de mercados: {str(e)}")
+        return None
+
+
+def save_markets_cache(path: str, markets: dict):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(markets, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        logger.info(f"{len(markets)} mercados gravados no cache {path}")
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Erro ao gravar cache de mercados: {str(e)}")
@@ -0,0 +1,207 @@
+"""
+Métricas de desempenho no formato texto do Prometheus.
+
+Implementação mínima (contadores, gauges e histogramas com rótulos) sem
+dependências externas: cada observação custa um perf_counter e um lock. O
+processo produtor grava periodicamente o texto renderizado em um arquivo
+compartilhado, de onde os demais workers servem o /metrics.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Limites (segundos) dos buckets: de requisições rápidas a varreduras longas
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(name, '') for name in self.labels)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+    def _samples(self) -> list:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        super().__init__(name, description, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> list:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        super().__init__(name, description, labels)
+        self._values: Dict[Tuple, float] = {}
+        self._function: Optional[Callable[[], Dict[Tuple, float]]] = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Callable[[], Dict[Tuple, float]]):
+        """
+        Valores calculados na renderização: função que retorna {(rótulos...): valor}
+        """
+        self._function = function
+
+    def _samples(self) -> list:
+        with self._lock:
+            values = dict(self._values)
+        if self._function is not None:
+            try:
+                values.update(self._function())
+            except Exception as e:
+                logger.warning(f"Erro ao calcular a métrica {self.name}: {str(e)}")
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = (), buckets: Tuple = DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Por combinação de rótulos: [contagem por bucket..., soma, total]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> list:
+        with self._lock:
+            values = [(key, list(state)) for key, state in self._values.items()]
+        samples = []
+        for key, state in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state):
+                cumulative += count
+                labels = _format_labels(self.labels, key, f'le="{_format_value(float(bound))}"')
+                samples.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            samples.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            samples.append(f"{self.name}_count{labels} {state[-1]}")
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram(
+    'crypto_stage_duration_seconds',
+    'Duração de cada estágio do pipeline (fetch, parse, heikin_ashi, chandelier_exit, signal_scan, email)',
+    ['stage']
+)
+MIRROR_REQUEST_SECONDS = Histogram(
+    'crypto_mirror_request_duration_seconds', 'Latência das requisições por espelho da Binance', ['mirror']
+)
+MIRROR_ERRORS = Counter('crypto_mirror_errors_total', 'Falhas por espelho (rede, timeout, 5xx, 429)', ['mirror'])
+MIRROR_LATENCY = Gauge('crypto_mirror_latency_ewma_seconds', 'Latência média móvel (EWMA) por espelho', ['mirror'])
+MIRROR_ERROR_RATE = Gauge('crypto_mirror_error_rate', 'Taxa de erro média móvel (EWMA) por espelho', ['mirror'])
+MIRROR_CIRCUIT = Gauge(
+    'crypto_mirror_circuit_state', 'Circuit breaker por espelho (0 = fechado, 1 = aberto, 2 = em teste)', ['mirror']
+)
+HEDGED_REQUESTS = Counter('crypto_hedged_requests_total', 'Requisições repetidas em um segundo espelho após o p95')
+SWEEP_SECONDS = Histogram('crypto_sweep_duration_seconds', 'Duração das varreduras (coleta + análise)')
+EMAILS = Counter('crypto_emails_total', 'Emails de alerta por resultado', ['result'])
+DATA_AGE = Gauge(
+    'crypto_data_age_seconds', 'Segundos desde a última atualização dos candles do par', ['symbol', 'timeframe']
+)
+
+
+def write_metrics(path: str):
+    """
+    Grava o texto renderizado para os workers que não coletam dados
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(REGISTRY.render())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Erro ao gravar métricas: {str(e)}")
+
+
+def read_metrics(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
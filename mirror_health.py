@@ -0,0 +1,161 @@
+"""
+Saúde dos espelhos da Binance: latência e taxa de erro (médias móveis
+exponenciais) e um circuit breaker por espelho.
+
+Os espelhos fechados são ordenados do mais rápido para o mais lento. Um
+espelho com falhas consecutivas demais é aberto e sai da rota; depois do
+cooldown, uma única requisição de teste (half-open) decide se ele volta ou
+fica aberto por um cooldown maior.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Amostras mínimas para estimar o p95 usado no hedge
+MIN_HEDGE_SAMPLES = 20
+
+
+class _Mirror:
+    def __init__(self, label: str, window: int):
+        self.label = label
+        self.latency: Optional[float] = None  # EWMA em segundos (None até a primeira resposta)
+        self.error_rate = 0.0  # EWMA de 0 (sucesso) a 1 (erro)
+        self.failures = 0  # falhas consecutivas
+        self.state = CLOSED
+        self.cooldown = 0.0
+        self.retry_at = 0.0  # monotonic: quando o espelho aberto pode ser testado
+        self.probing = False
+        self.sampled_at = 0.0  # monotonic: última vez que foi o primeiro da rota
+        self.recent = deque(maxlen=window)  # latências das respostas bem sucedidas
+
+
+class MirrorHealth:
+    def __init__(self, labels: List[str], alpha: float = 0.2, failure_threshold: int = 5,
+                 cooldown: float = 30.0, max_cooldown: float = 600.0, window: int = 200,
+                 refresh: float = 60.0):
+        """
+        labels: nome de cada espelho (mesma ordem das exchanges)
+        alpha: peso da observação mais recente nas médias móveis
+        failure_threshold: falhas consecutivas que abrem o circuito
+        cooldown: segundos até o primeiro teste de um espelho aberto (dobra a cada teste falho)
+        refresh: segundos sem ser o primeiro da rota após os quais um espelho
+            fechado recebe uma requisição para reavaliar a latência
+        """
+        self.mirrors = [_Mirror(label, window) for label in labels]
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.refresh = refresh
+        self._lock = threading.Lock()
+
+    def score(self, index: int) -> float:
+        """
+        Tempo esperado por resposta válida; espelhos ainda sem medição vêm primeiro
+        """
+        mirror = self.mirrors[index]
+        if mirror.latency is None:
+            return 0.0
+        return mirror.latency / max(1.0 - mirror.error_rate, 0.05)
+
+    def order(self, penalty: Optional[Callable[[int], float]] = None) -> List[int]:
+        """
+        Espelhos a tentar, em ordem. Um espelho aberto cujo cooldown venceu é
+        reservado para uma requisição de teste e vai à frente; os abertos ficam
+        de fora, a não ser que todos estejam abertos (uma resposta de qualquer
+        um deles fecha o seu circuito, como um teste bem sucedido). Um espelho fechado sem
+        uso há mais de `refresh` segundos também vai à frente, para que uma
+        medição antiga ruim não o exclua para sempre. `penalty` soma segundos
+        ao score (ex.: espera no token bucket)
+        """
+        now = time.monotonic()
+        with self._lock:
+            probe = None
+            closed = []
+            for index, mirror in enumerate(self.mirrors):
+                if mirror.state == CLOSED:
+                    closed.append(index)
+                elif probe is None and not mirror.probing and now >= mirror.retry_at:
+                    mirror.state = HALF_OPEN
+                    mirror.probing = True
+                    probe = index
+            if probe is None and not closed:
+                # Todos abertos: tenta primeiro os que voltam antes
+                return sorted(range(len(self.mirrors)), key=lambda index: self.mirrors[index].retry_at)
+
+            closed.sort(key=lambda index: self.score(index) + (penalty(index) if penalty else 0.0))
+            if probe is None and closed:
+                stale = min(closed, key=lambda index: self.mirrors[index].sampled_at)
+                if now - self.mirrors[stale].sampled_at > self.refresh:
+                    closed.remove(stale)
+                    closed.insert(0, stale)
+                self.mirrors[closed[0]].sampled_at = now
+        return ([probe] if probe is not None else []) + closed
+
+    def record(self, index: int, seconds: float, ok: bool):
+        mirror = self.mirrors[index]
+        with self._lock:
+            if ok:
+                mirror.latency = seconds if mirror.latency is None else mirror.latency + self.alpha * (seconds - mirror.latency)
+                mirror.recent.append(seconds)
+                mirror.failures = 0
+            else:
+                # Falhas lentas (timeouts) também pesam na latência
+                if mirror.latency is not None and seconds > mirror.latency:
+                    mirror.latency += self.alpha * (seconds - mirror.latency)
+                mirror.failures += 1
+            mirror.error_rate += self.alpha * ((0.0 if ok else 1.0) - mirror.error_rate)
+
+            if ok and mirror.state != CLOSED:
+                # Teste (half-open) ou espelho aberto usado porque todos estavam abertos
+                mirror.state = CLOSED
+                mirror.probing = False
+                mirror.cooldown = 0.0
+                logger.info(f"Espelho {mirror.label} voltou a responder; circuito fechado")
+            elif mirror.state == HALF_OPEN:
+                mirror.probing = False
+                self._open(mirror, min(mirror.cooldown * 2, self.max_cooldown))
+            elif mirror.state == CLOSED and mirror.failures >= self.failure_threshold:
+                self._open(mirror, self.base_cooldown)
+
+    def _open(self, mirror: _Mirror, cooldown: float):
+        mirror.state = OPEN
+        mirror.cooldown = cooldown
+        mirror.retry_at = time.monotonic() + cooldown
+        logger.warning(f"Espelho {mirror.label} aberto após {mirror.failures} falhas consecutivas; "
+                       f"novo teste em {cooldown:.0f}s")
+
+    def hedge_delay(self, index: int) -> Optional[float]:
+        """
+        p95 das latências recentes do espelho: após esse tempo sem resposta,
+        vale disparar a mesma requisição em outro espelho
+        """
+        mirror = self.mirrors[index]
+        with self._lock:
+            if len(mirror.recent) < MIN_HEDGE_SAMPLES:
+                return None
+            samples = np.fromiter(mirror.recent, dtype=float)
+        return float(np.percentile(samples, 95))
+
+    def latencies(self) -> dict:
+        return {(mirror.label,): mirror.latency for mirror in self.mirrors if mirror.latency is not None}
+
+    def error_rates(self) -> dict:
+        return {(mirror.label,): mirror.error_rate for mirror in self.mirrors}
+
+    def circuit_states(self) -> dict:
+        """
+        0 = fechado, 1 = aberto, 2 = em teste (half-open)
+        """
+        codes = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+        return {(mirror.label,): codes[mirror.state] for mirror in self.mirrors}
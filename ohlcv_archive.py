@@ -0,0 +1,306 @@
+"""
+Arquivo local de candles OHLCV por (symbol, timeframe).
+
+Cada série é um diretório com um arquivo binário por coluna (timestamp em
+int64 e OHLCV em float64), apenas com velas fechadas e sempre em ordem
+crescente. Novas velas são anexadas ao fim; a leitura usa np.memmap, então
+recortes por intervalo de tempo (busca binária nos timestamps) são views
+sobre o arquivo, sem cópia.
+
+Uso (preenchimento de histórico e lacunas via fetch_ohlcv com since=):
+    python ohlcv_archive.py backfill --symbols BTC/USDT,ETH/USDT --timeframes 1h,1d --since 2021-01-01
+    python ohlcv_archive.py info
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+from candle_store import OHLCV_COLUMNS, timeframe_to_ms
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = ('timestamp',) + OHLCV_COLUMNS
+_DTYPES = {name: np.dtype('<i8') if name == 'timestamp' else np.dtype('<f8') for name in _COLUMNS}
+
+
+class OhlcvArrays(NamedTuple):
+    timestamps: np.ndarray  # int64, epoch em ms
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+
+def closed_rows(ohlcv: list, timeframe: str, now_ms: int) -> list:
+    """
+    Apenas as velas já fechadas de uma resposta do fetch_ohlcv
+    """
+    duration = timeframe_to_ms(timeframe)
+    return [row for row in ohlcv if row[0] + duration <= now_ms]
+
+
+class ArchiveSeries:
+    def __init__(self, directory: str, symbol: str, timeframe: str):
+        self.directory = directory
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self._maps: Dict[str, np.ndarray] = {}
+        self._map_length = -1
+
+    def _path(self, column: str) -> str:
+        return os.path.join(self.directory, f"{column}.bin")
+
+    def _stored_length(self) -> int:
+        # Colunas podem divergir após uma gravação interrompida: vale a menor
+        lengths = []
+        for column in _COLUMNS:
+            try:
+                lengths.append(os.path.getsize(self._path(column)) // _DTYPES[column].itemsize)
+            except FileNotFoundError:
+                return 0
+        return min(lengths)
+
+    def __len__(self):
+        return self._stored_length()
+
+    def _columns(self) -> Dict[str, np.ndarray]:
+        """
+        Mapeia as colunas em memória (somente leitura), remapeando se o arquivo cresceu
+        """
+        length = self._stored_length()
+        if length != self._map_length:
+            if length == 0:
+                self._maps = {column: np.empty(0, dtype=_DTYPES[column]) for column in _COLUMNS}
+            else:
+                self._maps = {
+                    column: np.memmap(self._path(column), dtype=_DTYPES[column], mode='r', shape=(length,))
+                    for column in _COLUMNS
+                }
+            self._map_length = length
+        return self._maps
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._columns()['timestamp']
+
+    @property
+    def first_timestamp(self) -> Optional[int]:
+        timestamps = self.timestamps
+        return int(timestamps[0]) if len(timestamps) else None
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        timestamps = self.timestamps
+        return int(timestamps[-1]) if len(timestamps) else None
+
+    def read(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> OhlcvArrays:
+        """
+        Velas com start_ms <= timestamp < end_ms, como views do arquivo mapeado
+        """
+        columns = self._columns()
+        timestamps = columns['timestamp']
+        lo = 0 if start_ms is None else int(np.searchsorted(timestamps, start_ms, side='left'))
+        hi = len(timestamps) if end_ms is None else int(np.searchsorted(timestamps, end_ms, side='left'))
+        return OhlcvArrays(*(columns[column][lo:hi] for column in _COLUMNS))
+
+    def tail(self, count: int) -> OhlcvArrays:
+        columns = self._columns()
+        start = max(0, len(columns['timestamp']) - count)
+        return OhlcvArrays(*(columns[column][start:] for column in _COLUMNS))
+
+    def to_ohlcv(self, data: OhlcvArrays) -> list:
+        """
+        Converte um recorte para o formato do ccxt ([ts, o, h, l, c, v])
+        """
+        return [[int(row[0])] + row[1:] for row in np.column_stack(
+            [data.timestamps.astype(np.float64)] + [np.asarray(values) for values in data[1:]]
+        ).tolist()]
+
+    def gaps(self) -> List[Tuple[int, int]]:
+        """
+        Intervalos (última vela antes, primeira vela depois) sem candles
+        """
+        timestamps = self.timestamps
+        if len(timestamps) < 2:
+            return []
+        missing = np.flatnonzero(np.diff(timestamps) > timeframe_to_ms(self.timeframe))
+        return [(int(timestamps[index]), int(timestamps[index + 1])) for index in missing]
+
+    def _write_meta(self):
+        meta_path = os.path.join(self.directory, 'meta.json')
+        if not os.path.exists(meta_path):
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({'symbol': self.symbol, 'timeframe': self.timeframe, 'columns': list(_COLUMNS)}, f)
+
+    def append(self, ohlcv: list) -> int:
+        """
+        Anexa as velas mais novas que a última armazenada; retorna quantas foram gravadas
+        """
+        if len(ohlcv) == 0:
+            return 0
+        rows = np.asarray(ohlcv, dtype=np.float64)
+        rows = rows[np.argsort(rows[:, 0], kind='stable')]
+        timestamps = rows[:, 0].astype(np.int64)
+        last = self.last_timestamp
+        newer = np.r_[timestamps[1:] != timestamps[:-1], True]
+        if last is not None:
+            newer &= timestamps > last
+        if not newer.any():
+            return 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_meta()
+        length = self._stored_length()
+        # Timestamps por último: uma gravação interrompida não expõe velas incompletas
+        for index, column in reversed(list(enumerate(_COLUMNS))):
+            values = timestamps[newer] if column == 'timestamp' else rows[newer, index]
+            with open(self._path(column), 'r+b' if os.path.exists(self._path(column)) else 'wb') as f:
+                f.truncate(length * _DTYPES[column].itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(values.astype(_DTYPES[column]).tobytes())
+        return int(newer.sum())
+
+    def merge(self, ohlcv: list) -> int:
+        """
+        Incorpora velas em qualquer posição (histórico anterior ou lacunas),
+        regravando a série. Velas já armazenadas são substituídas
+        """
+        if len(ohlcv) == 0:
+            return 0
+        existing = self.read()
+        rows = np.asarray(ohlcv, dtype=np.float64)
+        stored = np.column_stack([existing.timestamps.astype(np.float64)] + [np.asarray(v) for v in existing[1:]])
+        combined = np.concatenate([stored.reshape(-1, len(_COLUMNS)), rows[:, :len(_COLUMNS)]])
+        combined = combined[np.argsort(combined[:, 0], kind='stable')]
+        # Em timestamps repetidos, a versão mais recente (nova) prevalece
+        keep = np.r_[combined[1:, 0] != combined[:-1, 0], True]
+        combined = combined[keep]
+        added = len(combined) - len(existing.timestamps)
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_meta()
+        self._maps = {}
+        self._map_length = -1
+        for index, column in enumerate(_COLUMNS):
+            values = combined[:, index].astype(_DTYPES[column])
+            tmp_path = f"{self._path(column)}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(values.tobytes())
+            os.replace(tmp_path, self._path(column))
+        return added
+
+
+class OhlcvArchive:
+    def __init__(self, root: str):
+        self.root = root
+        self._series: Dict[Tuple[str, str], ArchiveSeries] = {}
+
+    def series(self, symbol: str, timeframe: str) -> ArchiveSeries:
+        key = (symbol, timeframe)
+        series = self._series.get(key)
+        if series is None:
+            directory = os.path.join(self.root, symbol.replace('/', '_'), timeframe)
+            series = ArchiveSeries(directory, symbol, timeframe)
+            self._series[key] = series
+        return series
+
+    def list_series(self) -> List[Tuple[str, str]]:
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for symbol_dir in sorted(os.listdir(self.root)):
+            for timeframe in sorted(os.listdir(os.path.join(self.root, symbol_dir))):
+                meta_path = os.path.join(self.root, symbol_dir, timeframe, 'meta.json')
+                if os.path.exists(meta_path):
+                    with open(meta_path, 'r', encoding='utf-8') as f:
+                        meta = json.load(f)
+                    found.append((meta['symbol'], meta['timeframe']))
+        return found
+
+    def backfill(self, exchange, symbol: str, timeframe: str, since_ms: int, page_limit: int = 1000) -> int:
+        """
+        Pagina fetch_ohlcv(since=) para completar a série: histórico anterior
+        à primeira vela, lacunas internas e velas novas até agora
+        """
+        series = self.series(symbol, timeframe)
+        duration = timeframe_to_ms(timeframe)
+        ranges = []
+        first = series.first_timestamp
+        if first is None:
+            ranges.append((since_ms, None))
+        else:
+            if since_ms < first:
+                ranges.append((since_ms, first))
+            ranges.extend((before + duration, after) for before, after in series.gaps())
+            ranges.append((series.last_timestamp + duration, None))
+
+        total = 0
+        for start, end in ranges:
+            cursor = start
+            while True:
+                now_ms = exchange.milliseconds()
+                ohlcv = exchange.fetch_ohlcv(symbol, timeframe, since=cursor, limit=page_limit)
+                rows = closed_rows(ohlcv or [], timeframe, now_ms)
+                if end is not None:
+                    rows = [row for row in rows if row[0] < end]
+                if rows:
+                    if end is None and (series.last_timestamp is None or rows[0][0] > series.last_timestamp):
+                        total += series.append(rows)
+                    else:
+                        total += series.merge(rows)
+                # Fim da página: sem dados, última página ou intervalo preenchido
+                if not ohlcv or len(ohlcv) < page_limit or (end is not None and ohlcv[-1][0] >= end):
+                    break
+                cursor = ohlcv[-1][0] + duration
+        logger.info(f"Backfill {symbol} ({timeframe}): {total} velas gravadas, {len(series)} no total")
+        return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Arquivo local de candles OHLCV')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    backfill = subparsers.add_parser('backfill', help='completa o histórico via REST (fetch_ohlcv com since=)')
+    backfill.add_argument('--symbols', required=True, help="lista separada por vírgulas, ex.: 'BTC/USDT,ETH/USDT'")
+    backfill.add_argument('--timeframes', default='1h,2h,1d')
+    backfill.add_argument('--since', default='2021-01-01', help='data inicial (UTC)')
+    subparsers.add_parser('info', help='lista as séries armazenadas')
+    parser.add_argument('--root', default=config.OHLCV_ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not args.root:
+        parser.error('defina OHLCV_ARCHIVE_DIR ou --root')
+    archive = OhlcvArchive(args.root)
+
+    if args.command == 'info':
+        for symbol, timeframe in archive.list_series():
+            series = archive.series(symbol, timeframe)
+            first, last = series.first_timestamp, series.last_timestamp
+            print(f"{symbol:<12} {timeframe:<4} {len(series):>8} velas  "
+                  f"{pd.to_datetime(first, unit='ms')} -> {pd.to_datetime(last, unit='ms')}  "
+                  f"{len(series.gaps())} lacunas")
+        return
+
+    import ccxt
+    exchange = ccxt.binance({'enableRateLimit': True, 'options': {'defaultType': 'spot'}})
+    since_ms = int(pd.Timestamp(args.since, tz='UTC').value // 1_000_000)
+    start = time.perf_counter()
+    for symbol in args.symbols.split(','):
+        for timeframe in args.timeframes.split(','):
+            try:
+                archive.backfill(exchange, symbol.strip(), timeframe.strip(), since_ms)
+            except Exception as e:
+                logger.error(f"Erro no backfill de {symbol} ({timeframe}): {str(e)}")
+    logger.info(f"Backfill concluído em {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
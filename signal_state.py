@@ -0,0 +1,165 @@
+"""
+Estado dos sinais exibidos no dashboard, em registros compactos por
+(timeframe, símbolo).
+
+Cada registro guarda apenas floats e instantes em epoch (ms), além da sua
+entrada já pronta para o snapshot (dicionário e fragmento JSON), refeita
+somente quando o registro muda. Publicar um snapshot é juntar fragmentos;
+nenhum Timestamp do pandas ou strftime por requisição.
+"""
+import json
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def to_epoch_ms(timestamp) -> Optional[int]:
+    """
+    pd.Timestamp, datetime64 ou datetime (sem fuso = UTC) em epoch ms
+    """
+    if timestamp is None:
+        return None
+    return int(pd.Timestamp(timestamp).value // 1_000_000)
+
+
+class SignalRecord:
+    __slots__ = ('signal_type', 'signal_price', 'signal_ms', 'price', 'updated_ms', '_entry', '_fragment')
+
+    def __init__(self):
+        self.signal_type: Optional[str] = None
+        self.signal_price: Optional[float] = None
+        self.signal_ms: Optional[int] = None  # vela do sinal (UTC)
+        self.price: Optional[float] = None
+        self.updated_ms: Optional[int] = None  # última atualização do preço
+        self._entry: Optional[dict] = None
+        self._fragment: Optional[bytes] = None
+
+    def set_signal(self, signal: Optional[dict]) -> bool:
+        """
+        Copia o sinal do bot ({'type', 'price', 'timestamp'}); True se mudou
+        """
+        if signal:
+            values = (signal.get('type'), float(signal['price']) if signal.get('price') else None,
+                      to_epoch_ms(signal.get('timestamp')))
+        else:
+            values = (None, None, None)
+        if values == (self.signal_type, self.signal_price, self.signal_ms):
+            return False
+        self.signal_type, self.signal_price, self.signal_ms = values
+        self._entry = self._fragment = None
+        return True
+
+    def set_price(self, price: float, now_ms: int):
+        self.price = float(price)
+        self.updated_ms = now_ms
+        self._entry = self._fragment = None
+
+    def entry(self) -> dict:
+        """
+        Entrada do snapshot (mesmo formato servido pelo /get_prices)
+        """
+        if self._entry is None:
+            signal = None
+            if self.signal_type is not None or self.signal_ms is not None:
+                timestamp = self.signal_ms
+                signal = {
+                    'type': self.signal_type,
+                    'price': self.signal_price,
+                    'timestamp': datetime.fromtimestamp(timestamp / 1000, timezone.utc).strftime(TIME_FORMAT) if timestamp else None,
+                    'timestamp_ms': timestamp
+                }
+            self._entry = {
+                'current_price': self.price,
+                'signal': signal,
+                'current_time': datetime.fromtimestamp(self.updated_ms / 1000, timezone.utc).strftime(TIME_FORMAT) if self.updated_ms else None
+            }
+        return self._entry
+
+    def fragment(self) -> bytes:
+        if self._fragment is None:
+            self._fragment = json.dumps(self.entry(), separators=(',', ':')).encode('utf-8')
+        return self._fragment
+
+
+class SignalTable:
+    def __init__(self):
+        # timeframe -> símbolo -> registro (a ordem de inserção é a ordem do snapshot)
+        self._records: Dict[str, Dict[str, SignalRecord]] = {}
+        # Chaves JSON já codificadas ('"BTC/USDT":')
+        self._keys: Dict[str, bytes] = {}
+
+    def sync(self, timeframes: Iterable[str], symbols: Iterable[str]):
+        """
+        Acompanha os timeframes e símbolos do bot: cria registros vazios e remove os descartados
+        """
+        timeframes, symbols = list(timeframes), list(symbols)
+        wanted = set(symbols)
+        for timeframe in [timeframe for timeframe in self._records if timeframe not in timeframes]:
+            del self._records[timeframe]
+        for timeframe in timeframes:
+            records = self._records.setdefault(timeframe, {})
+            for symbol in [symbol for symbol in records if symbol not in wanted]:
+                del records[symbol]
+            for symbol in symbols:
+                if symbol not in records:
+                    records[symbol] = SignalRecord()
+
+    def symbols(self, timeframe: str) -> set:
+        return set(self._records.get(timeframe, ()))
+
+    def get(self, timeframe: str, symbol: str) -> Optional[SignalRecord]:
+        return self._records.get(timeframe, {}).get(symbol)
+
+    def update(self, timeframe: str, symbol: str, signal: Optional[dict], price: float, now_ms: int):
+        """
+        Grava o resultado da análise de um par
+        """
+        record = self._records.setdefault(timeframe, {}).setdefault(symbol, SignalRecord())
+        record.set_signal(signal)
+        record.set_price(price, now_ms)
+
+    def set_prices(self, prices: dict, now_ms: int) -> bool:
+        """
+        Atualiza o preço ({símbolo: preço}) dos pares já analisados em todos
+        os timeframes. True se algum preço mudou
+        """
+        changed = False
+        for records in self._records.values():
+            for symbol, record in records.items():
+                price = prices.get(symbol)
+                if price is None or record.price in (None, price):
+                    continue
+                record.set_price(price, now_ms)
+                changed = True
+        return changed
+
+    def _key(self, name: str) -> bytes:
+        key = self._keys.get(name)
+        if key is None:
+            key = self._keys[name] = json.dumps(name).encode('utf-8') + b':'
+        return key
+
+    def render(self, extra: dict) -> Tuple[dict, bytes]:
+        """
+        Dados do snapshot e o mesmo conteúdo já em JSON, montado a partir dos
+        fragmentos de cada registro. Pares ainda sem preço ficam de fora
+        """
+        data = {}
+        parts: List[bytes] = []
+        for timeframe, records in self._records.items():
+            entries = {}
+            fragments = []
+            for symbol, record in records.items():
+                if record.price is None:
+                    continue
+                entries[symbol] = record.entry()
+                fragments.append(self._key(symbol) + record.fragment())
+            data[timeframe] = entries
+            parts.append(self._key(timeframe) + b'{' + b','.join(fragments) + b'}')
+        for name, value in extra.items():
+            data[name] = value
+            parts.append(self._key(name) + json.dumps(value).encode('utf-8'))
+        return data, b'{' + b','.join(parts) + b'}'
@@ -0,0 +1,105 @@
+"""
+Registro persistente dos alertas já enviados, para deduplicação.
+
+Cada alerta é identificado por (symbol, timeframe, tipo, timestamp da vela)
+em uma tabela SQLite compartilhada entre os workers e preservada entre
+reinícios. Entradas expiram após `ttl` segundos e a tabela é limitada a
+`max_entries` linhas, descartando as mais antigas.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sent_signals (
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    type TEXT NOT NULL,
+    candle_ts INTEGER NOT NULL,
+    sent_at REAL NOT NULL,
+    PRIMARY KEY (symbol, timeframe, type, candle_ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sent_signals_sent_at ON sent_signals (sent_at);
+"""
+
+
+class SignalDedupStore:
+    def __init__(self, path: str, ttl: float = 7 * 86400, max_entries: int = 10000, prune_every: int = 100):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._inserts = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Autocommit; o timeout cobre a concorrência entre os workers
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self.prune()
+
+    def claim(self, symbol: str, timeframe: str, signal_type: str, candle_ts: int) -> bool:
+        """
+        Registra o alerta e retorna True se ele ainda não tinha sido enviado
+        (ou se o registro anterior expirou). A operação é atômica entre processos
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO sent_signals (symbol, timeframe, type, candle_ts, sent_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT DO UPDATE SET sent_at = excluded.sent_at WHERE sent_at < ?',
+                (symbol, timeframe, signal_type, candle_ts, now, now - self.ttl)
+            )
+            claimed = cursor.rowcount == 1
+            if claimed:
+                self._inserts += 1
+                if self._inserts % self.prune_every == 0:
+                    self._prune(now)
+        return claimed
+
+    def release(self, symbol: str, timeframe: str, signal_type: str, candle_ts: int):
+        """
+        Remove o registro de um alerta que não pôde ser enviado
+        """
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM sent_signals WHERE symbol = ? AND timeframe = ? AND type = ? AND candle_ts = ?',
+                (symbol, timeframe, signal_type, candle_ts)
+            )
+
+    def __contains__(self, key) -> bool:
+        symbol, timeframe, signal_type, candle_ts = key
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT sent_at FROM sent_signals WHERE symbol = ? AND timeframe = ? AND type = ? AND candle_ts = ?',
+                (symbol, timeframe, signal_type, candle_ts)
+            ).fetchone()
+        return row is not None and row[0] >= time.time() - self.ttl
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM sent_signals').fetchone()[0]
+
+    def prune(self):
+        with self._lock:
+            self._prune(time.time())
+
+    def _prune(self, now: float):
+        # Chamado com self._lock adquirido
+        expired = self._conn.execute('DELETE FROM sent_signals WHERE sent_at < ?', (now - self.ttl,)).rowcount
+        overflow = self._conn.execute(
+            'DELETE FROM sent_signals WHERE sent_at < ('
+            'SELECT sent_at FROM sent_signals ORDER BY sent_at DESC LIMIT 1 OFFSET ?)',
+            (self.max_entries - 1,)
+        ).rowcount
+        if expired or overflow:
+            logger.info(f"Registro de alertas: {expired} expirados e {overflow} excedentes removidos")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
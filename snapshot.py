@@ -0,0 +1,367 @@
+"""
+Snapshot versionado e pré-serializado dos sinais servidos pelo /get_prices.
+
+Apenas a thread do bot publica novos snapshots; as requisições só leem o
+último corpo JSON já serializado, sem tocar na exchange. Com `path`, o
+snapshot também é gravado atomicamente num arquivo compartilhado (de
+preferência em /dev/shm), de onde os demais workers o recarregam quando muda.
+
+Para o canal de push (/stream), cada nova versão gera uma única vez o
+evento completo e o delta em relação à versão anterior, reaproveitados por
+todas as conexões abertas.
+
+Cada entrada guarda a versão em que mudou pela última vez, o que permite
+responder ao /get_prices?since=<versão> só com o que mudou desde então.
+Essas versões são calculadas pelo produtor e gravadas no arquivo
+compartilhado junto com o corpo (uma linha de cabeçalho JSON antes dele),
+pois os demais workers podem pular versões entre uma leitura e outra. As
+variações da resposta (filtros, MessagePack, gzip/brotli) são montadas uma
+vez por versão e reaproveitadas pelas requisições seguintes.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele, apenas gzip
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack é opcional: sem ele, apenas JSON
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+BROTLI_AVAILABLE = brotli is not None
+MSGPACK_AVAILABLE = msgpack is not None
+
+# Abaixo disso a compressão não compensa
+MIN_COMPRESS_SIZE = 1024
+# Variações da resposta guardadas por versão (filtros vêm dos clientes)
+MAX_CACHED_VIEWS = 64
+# Remoções lembradas para os deltas; as mais antigas passam a exigir o snapshot completo
+MAX_REMOVED_ENTRIES = 1000
+
+# Campos que mudam a cada varredura e não entram nos deltas do stream
+_VOLATILE_FIELDS = ('current_time',)
+
+
+class Snapshot(NamedTuple):
+    version: int
+    etag: str
+    body: bytes
+    data: dict
+
+
+class View(NamedTuple):
+    etag: str
+    body: bytes
+    mimetype: str
+    encoding: Optional[str]  # Content-Encoding (None = sem compressão)
+
+
+class StreamEvents(NamedTuple):
+    version: int
+    base: Optional[int]  # Versão a partir da qual o delta se aplica
+    full: bytes
+    delta: Optional[bytes]
+
+
+def _etag(body: bytes) -> str:
+    # ETag derivado do conteúdo para ser estável entre workers
+    return hashlib.sha1(body).hexdigest()[:20]
+
+
+def _entries(data: dict) -> dict:
+    """
+    Entradas (timeframe, symbol) do snapshot sem os campos voláteis
+    """
+    entries = {}
+    for timeframe, symbols in data.items():
+        if not isinstance(symbols, dict):
+            continue
+        for symbol, entry in symbols.items():
+            entries[(timeframe, symbol)] = {
+                key: value for key, value in entry.items() if key not in _VOLATILE_FIELDS
+            }
+    return entries
+
+
+def _nest(entries: dict) -> dict:
+    nested = {}
+    for (timeframe, symbol), entry in entries.items():
+        nested.setdefault(timeframe, {})[symbol] = entry
+    return nested
+
+
+def _encode(data: dict, fmt: str) -> bytes:
+    if fmt == 'msgpack':
+        return msgpack.packb(data, use_bin_type=True)
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def _compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    if encoding is None or len(body) < MIN_COMPRESS_SIZE:
+        return body, None
+    if encoding == 'br':
+        return brotli.compress(body, quality=5), 'br'
+    return gzip.compress(body, compresslevel=6, mtime=0), 'gzip'
+
+
+def _sse(event: str, version: int, payload: dict) -> bytes:
+    data = json.dumps(payload, separators=(',', ':'))
+    return f"id: {version}\nevent: {event}\ndata: {data}\n\n".encode('utf-8')
+
+
+class SnapshotCache:
+    def __init__(self, path: Optional[str] = None, poll_interval: float = 1.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._file_key = None
+        self._current = self._build(0, {'version': 0, 'bot_status': False})
+        self._stream = self._build_stream(self._current, None)
+        # Versão da última mudança de cada entrada (timeframe, symbol) e das removidas
+        self._changed_at: Dict[Tuple[str, str], int] = {}
+        self._removed_at: Dict[Tuple[str, str], int] = {}
+        # Deltas só a partir desta versão; antes dela o processo não acompanhou as mudanças
+        self._history_start = 0
+        self._views: Dict[tuple, View] = {}
+        self._views_version = 0
+
+    @staticmethod
+    def _build(version: int, data: dict) -> Snapshot:
+        body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        return Snapshot(version, _etag(body), body, data)
+
+    @staticmethod
+    def _build_stream(snapshot: Snapshot, previous: Optional[Snapshot]) -> StreamEvents:
+        header = {
+            'version': snapshot.version,
+            'bot_status': snapshot.data.get('bot_status'),
+            'updated_at': snapshot.data.get('updated_at'),
+        }
+        entries = _entries(snapshot.data)
+        full = _sse('snapshot', snapshot.version, dict(header, data=_nest(entries)))
+        if previous is None:
+            return StreamEvents(snapshot.version, None, full, None)
+
+        old_entries = _entries(previous.data)
+        changed = {key: entry for key, entry in entries.items() if old_entries.get(key) != entry}
+        removed = [list(key) for key in old_entries if key not in entries]
+        delta = _sse('delta', snapshot.version,
+                     dict(header, base=previous.version, changed=_nest(changed), removed=removed))
+        return StreamEvents(snapshot.version, previous.version, full, delta)
+
+    def _install(self, snapshot: Snapshot, changes: Optional[dict] = None):
+        # Chamado com self._lock adquirido. `changes`: versões lidas do arquivo compartilhado
+        previous = self._current
+        self._current = snapshot
+        self._stream = self._build_stream(snapshot, previous)
+        if changes is not None:
+            self._load_changes(snapshot, changes)
+        else:
+            self._track_changes(snapshot, previous)
+        self._changed.notify_all()
+
+    def _load_changes(self, snapshot: Snapshot, changes: dict):
+        """
+        Versões por entrada gravadas pelo produtor. Sem elas (arquivo antigo),
+        os deltas só valem a partir deste snapshot
+        """
+        if 'changed_at' not in changes:
+            self._history_start = snapshot.version
+            self._changed_at = {key: snapshot.version for key in _entries(snapshot.data)}
+            self._removed_at = {}
+            return
+        self._history_start = changes['history_start']
+        self._changed_at = {(timeframe, symbol): version for timeframe, symbol, version in changes['changed_at']}
+        self._removed_at = {(timeframe, symbol): version for timeframe, symbol, version in changes['removed_at']}
+
+    def _changes_header(self) -> bytes:
+        header = {
+            'history_start': self._history_start,
+            'changed_at': [[timeframe, symbol, version] for (timeframe, symbol), version in self._changed_at.items()],
+            'removed_at': [[timeframe, symbol, version] for (timeframe, symbol), version in self._removed_at.items()],
+        }
+        return json.dumps(header, separators=(',', ':')).encode('utf-8')
+
+    def _track_changes(self, snapshot: Snapshot, previous: Snapshot):
+        if previous.version == 0:
+            # Primeiro snapshot visto: as versões anteriores a ele são desconhecidas
+            self._history_start = snapshot.version
+        old_entries = _entries(previous.data)
+        entries = _entries(snapshot.data)
+        for key, entry in entries.items():
+            if old_entries.get(key) != entry or key not in self._changed_at:
+                self._changed_at[key] = snapshot.version
+                self._removed_at.pop(key, None)
+        for key in old_entries.keys() - entries.keys():
+            self._changed_at.pop(key, None)
+            self._removed_at[key] = snapshot.version
+        while len(self._removed_at) > MAX_REMOVED_ENTRIES:
+            # Esquece a remoção mais antiga: clientes anteriores a ela recebem o snapshot completo
+            key = min(self._removed_at, key=self._removed_at.get)
+            self._history_start = max(self._history_start, self._removed_at.pop(key))
+
+    def _select(self, since: Optional[int], symbols: FrozenSet[str], timeframes: FrozenSet[str]) -> dict:
+        """
+        Conteúdo de uma resposta do /get_prices: o snapshot completo ou, com
+        `since`, apenas as entradas alteradas/removidas depois daquela versão
+        (mesmo formato do delta do /stream). Chamado com self._lock adquirido
+        """
+        snapshot = self._current
+        data = snapshot.data
+
+        def wanted(timeframe: str, symbol: str) -> bool:
+            return (not timeframes or timeframe in timeframes) and (not symbols or symbol in symbols)
+
+        header = {
+            'version': snapshot.version,
+            'bot_status': data.get('bot_status'),
+            'updated_at': data.get('updated_at'),
+        }
+        if since is None or since < self._history_start or since > snapshot.version:
+            selected = {
+                timeframe: {symbol: entry for symbol, entry in entries.items() if wanted(timeframe, symbol)}
+                for timeframe, entries in data.items()
+                if isinstance(entries, dict) and (not timeframes or timeframe in timeframes)
+            }
+            return dict(selected, **header)
+
+        changed = {}
+        for (timeframe, symbol), version in self._changed_at.items():
+            if version > since and wanted(timeframe, symbol):
+                changed.setdefault(timeframe, {})[symbol] = data[timeframe][symbol]
+        removed = [[timeframe, symbol] for (timeframe, symbol), version in self._removed_at.items()
+                   if version > since and wanted(timeframe, symbol)]
+        return dict(header, base=since, changed=changed, removed=removed)
+
+    def view(self, since: Optional[int] = None, symbols: FrozenSet[str] = frozenset(),
+             timeframes: FrozenSet[str] = frozenset(), fmt: str = 'json', encoding: Optional[str] = None) -> View:
+        """
+        Resposta do /get_prices para a combinação de parâmetros, montada uma
+        vez por versão. fmt: 'json' ou 'msgpack'; encoding: None, 'gzip' ou 'br'
+        """
+        if self.path:
+            self._refresh()
+        key = (since, symbols, timeframes, fmt, encoding)
+        with self._lock:
+            snapshot = self._current
+            if self._views_version != snapshot.version:
+                self._views = {}
+                self._views_version = snapshot.version
+            view = self._views.get(key)
+            if view is not None:
+                return view
+
+            if since is None and not symbols and not timeframes and fmt == 'json':
+                body = snapshot.body
+            else:
+                body = _encode(self._select(since, symbols, timeframes), fmt)
+            body, content_encoding = _compress(body, encoding)
+            # Derivado do corpo: o JSON completo sem compressão mantém o ETag do snapshot
+            mimetype = 'application/msgpack' if fmt == 'msgpack' else 'application/json'
+            view = View(_etag(body), body, mimetype, content_encoding)
+            if len(self._views) < MAX_CACHED_VIEWS:
+                self._views[key] = view
+            return view
+
+    def _refresh(self):
+        """
+        Recarrega o snapshot do arquivo compartilhado se ele mudou desde a última leitura
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key == self._file_key:
+            return
+        with self._lock:
+            try:
+                with open(self.path, 'rb') as f:
+                    content = f.read()
+                # Cabeçalho com as versões por entrada, depois o corpo (JSON compacto, sem quebras de linha)
+                header, _, body = content.partition(b'\n')
+                if not body:
+                    header, body = b'{}', content
+                changes = json.loads(header)
+                data = json.loads(body)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Erro ao ler snapshot compartilhado: {str(e)}")
+                return
+            self._file_key = key
+            if data.get('version', 0) > self._current.version:
+                self._install(Snapshot(data.get('version', 0), _etag(body), body, data), changes)
+
+    def _write_shared(self, snapshot: Snapshot):
+        # Grava num arquivo temporário e troca atomicamente: leitores nunca veem um arquivo parcial
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self._changes_header() + b'\n' + snapshot.body)
+        os.replace(tmp_path, self.path)
+        stat = os.stat(self.path)
+        self._file_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def publish(self, data: dict, body: Optional[bytes] = None) -> Snapshot:
+        """
+        Serializa e publica um novo snapshot (uma única vez por atualização).
+        `body` é o JSON de `data` já montado (objeto não vazio, sem a versão)
+        """
+        if self.path:
+            # Continua a numeração de um produtor anterior
+            self._refresh()
+        with self._lock:
+            version = self._current.version + 1
+            if body is None:
+                snapshot = self._build(version, dict(data, version=version))
+            else:
+                body = body[:-1] + b',"version":%d}' % version
+                snapshot = Snapshot(version, _etag(body), body, dict(data, version=version))
+            self._install(snapshot)
+            if self.path:
+                try:
+                    self._write_shared(snapshot)
+                except OSError as e:
+                    logger.error(f"Erro ao gravar snapshot compartilhado: {str(e)}")
+            return snapshot
+
+    def get(self) -> Snapshot:
+        if self.path:
+            self._refresh()
+        return self._current
+
+    @property
+    def version(self) -> int:
+        return self.get().version
+
+    def wait_for_event(self, client_version: Optional[int], timeout: float) -> Optional[Tuple[int, bytes]]:
+        """
+        Aguarda até haver uma versão diferente de `client_version` e retorna
+        (versão, evento SSE): o delta se o cliente estiver exatamente uma versão
+        atrás, ou o snapshot completo. Retorna None se nada mudar no `timeout`
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.path:
+                self._refresh()
+            with self._lock:
+                stream = self._stream
+                if stream.version != client_version:
+                    if stream.delta is not None and stream.base == client_version:
+                        return stream.version, stream.delta
+                    return stream.version, stream.full
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                # Sem arquivo compartilhado, publish() acorda a espera; com ele, verifica periodicamente
+                self._changed.wait(min(remaining, self.poll_interval) if self.path else remaining)
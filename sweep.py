@@ -0,0 +1,191 @@
+"""
+Busca de parâmetros do Chandelier Exit (atr_period, atr_multiplier, use_close).
+
+Para cada série, o Heikin Ashi e o true range são calculados uma única vez,
+a média do true range e as máximas/mínimas uma vez por período, e todos os
+multiplicadores de um mesmo (período, use_close) passam juntos por
+indicators.chandelier_signals_batch; posições e capital são avaliados em
+matrizes com uma linha por combinação. As séries são distribuídas entre
+todos os núcleos e o resultado é uma tabela ordenada por série.
+
+Uso:
+    python sweep.py dados/*.csv --periods 1-10 --multipliers 0.5:5.0:0.1 --use-close both --output sweep.csv
+    python sweep.py dados/*.csv --random 200 --rank-by hit_rate_pct
+"""
+import argparse
+import itertools
+import logging
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import indicators
+from backtest import evaluate_positions, load_ohlcv, positions_from_signals, series_label, trade_returns
+from ohlcv_archive import OhlcvArrays
+
+logger = logging.getLogger(__name__)
+
+# Combinações avaliadas por vez em cada matriz (limita a memória em séries longas)
+BATCH_SIZE = 64
+
+RANK_COLUMNS = ('pnl_pct', 'hit_rate_pct', 'max_drawdown_pct')
+
+
+def parse_periods(spec: str) -> List[int]:
+    """
+    '1-10' ou '1,2,5'
+    """
+    if '-' in spec:
+        start, end = spec.split('-')
+        return list(range(int(start), int(end) + 1))
+    return [int(value) for value in spec.split(',')]
+
+
+def parse_multipliers(spec: str) -> List[float]:
+    """
+    'início:fim:passo' (fim incluso) ou '0.8,1.0,1.5'
+    """
+    if ':' in spec:
+        start, end, step = (float(value) for value in spec.split(':'))
+        count = int(round((end - start) / step)) + 1
+        return [round(start + step * index, 10) for index in range(count)]
+    return [float(value) for value in spec.split(',')]
+
+
+def build_grid(periods: List[int], multipliers: List[float], use_close_values: List[bool],
+               sample: Optional[int] = None, seed: int = 0) -> List[Tuple[int, float, bool]]:
+    """
+    Todas as combinações, ou uma amostra aleatória de `sample` delas
+    """
+    grid = list(itertools.product(periods, multipliers, use_close_values))
+    if sample is not None and sample < len(grid):
+        grid = random.Random(seed).sample(grid, sample)
+    return grid
+
+
+def sweep_series(data: OhlcvArrays, grid: List[Tuple[int, float, bool]], fee: float = 0.001,
+                 long_only: bool = False, label: str = '') -> List[dict]:
+    """
+    Avalia todas as combinações do grid sobre uma série OHLCV
+    """
+    ha_open, ha_high, ha_low, ha_close = indicators.heikin_ashi(data.open, data.high, data.low, data.close)
+    tr = indicators.true_range(ha_high, ha_low, ha_close)
+
+    groups = {}
+    for period, multiplier, use_close in grid:
+        groups.setdefault((period, use_close), []).append(multiplier)
+
+    mean_tr = {}
+    rows = []
+    for (period, use_close), multipliers in groups.items():
+        if period not in mean_tr:
+            mean_tr[period] = indicators.rolling_mean(tr, period)
+        if use_close:
+            highest, lowest = indicators.rolling_extremes(ha_close, ha_close, period)
+        else:
+            highest, lowest = indicators.rolling_extremes(ha_high, ha_low, period)
+
+        for start in range(0, len(multipliers), BATCH_SIZE):
+            batch = multipliers[start:start + BATCH_SIZE]
+            buy, sell = indicators.chandelier_signals_batch(highest, lowest, ha_close, mean_tr[period], period, batch)
+            long_mask, short_mask = indicators.confirmed_signals(ha_open, ha_high, ha_low, ha_close, buy, sell)
+            positions = positions_from_signals(long_mask, short_mask, long_only)
+            equity, max_drawdown = evaluate_positions(data.close, positions, fee)
+
+            for index, multiplier in enumerate(batch):
+                returns, is_open = trade_returns(data.close, positions[index], fee)
+                closed = returns[~is_open]
+                rows.append({
+                    'label': label,
+                    'atr_period': period,
+                    'atr_multiplier': multiplier,
+                    'use_close': use_close,
+                    'trades': len(closed),
+                    'pnl_pct': float(equity[index, -1] - 1) * 100 if equity.shape[-1] else 0.0,
+                    'max_drawdown_pct': float(max_drawdown[index]) * 100,
+                    'hit_rate_pct': float((closed > 0).mean()) * 100 if len(closed) else 0.0,
+                })
+    return rows
+
+
+def _sweep_file(path: str, grid: List[Tuple[int, float, bool]], fee: float, long_only: bool) -> List[dict]:
+    return sweep_series(load_ohlcv(path), grid, fee, long_only, series_label(path))
+
+
+def rank_results(rows: List[dict], rank_by: str = 'pnl_pct') -> pd.DataFrame:
+    """
+    Ordena as combinações de cada série (drawdown: menor é melhor) e numera o ranking
+    """
+    results = pd.DataFrame(rows)
+    if results.empty:
+        return results
+    ascending = rank_by == 'max_drawdown_pct'
+    results = results.sort_values(['label', rank_by], ascending=[True, ascending], kind='stable')
+    results['rank'] = results.groupby('label').cumcount() + 1
+    return results.reset_index(drop=True)
+
+
+def run_sweep(paths: List[str], grid: List[Tuple[int, float, bool]], fee: float = 0.001,
+              long_only: bool = False, workers: int = 0, rank_by: str = 'pnl_pct') -> pd.DataFrame:
+    rows = []
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {path: pool.submit(_sweep_file, path, grid, fee, long_only) for path in paths}
+            for path, future in futures.items():
+                try:
+                    rows.extend(future.result())
+                except Exception as e:
+                    logger.error(f"Erro na busca de {path}: {str(e)}")
+    else:
+        for path in paths:
+            try:
+                rows.extend(_sweep_file(path, grid, fee, long_only))
+            except Exception as e:
+                logger.error(f"Erro na busca de {path}: {str(e)}")
+    return rank_results(rows, rank_by)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Busca de parâmetros do Chandelier Exit')
+    parser.add_argument('paths', nargs='+', help='arquivos OHLCV (CSV ou Parquet) ou séries do ohlcv_archive')
+    parser.add_argument('--periods', default='1-10', help="períodos do ATR: '1-10' ou '1,2,5'")
+    parser.add_argument('--multipliers', default='0.5:5.0:0.1', help="multiplicadores: 'início:fim:passo' ou lista")
+    parser.add_argument('--use-close', choices=('yes', 'no', 'both'), default='both')
+    parser.add_argument('--random', type=int, help='avalia apenas uma amostra aleatória de N combinações')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fee', type=float, default=0.001, help='custo por lado (0.001 = 0.1%%)')
+    parser.add_argument('--long-only', action='store_true')
+    parser.add_argument('--rank-by', choices=RANK_COLUMNS, default='pnl_pct')
+    parser.add_argument('--top', type=int, default=5, help='combinações exibidas por série')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='processos em paralelo')
+    parser.add_argument('--output', default='sweep_results.csv')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    use_close_values = {'yes': [True], 'no': [False], 'both': [False, True]}[args.use_close]
+    grid = build_grid(parse_periods(args.periods), parse_multipliers(args.multipliers),
+                      use_close_values, args.random, args.seed)
+    logger.info(f"{len(grid)} combinações x {len(args.paths)} séries em {args.workers} processos")
+
+    start = time.perf_counter()
+    results = run_sweep(args.paths, grid, args.fee, args.long_only, args.workers, args.rank_by)
+    elapsed = time.perf_counter() - start
+    if results.empty:
+        print("Nenhum resultado")
+        return
+
+    results.to_csv(args.output, index=False)
+    pd.set_option('display.width', 200)
+    top = results[results['rank'] <= args.top]
+    print(top.to_string(index=False, float_format=lambda value: f"{value:.2f}"))
+    print(f"\n{len(results)} avaliações em {elapsed:.2f}s | Tabela completa em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
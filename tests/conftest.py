@@ -0,0 +1,61 @@
+import os
+import sys
+
+import ccxt
+import numpy as np
+import pandas as pd
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from candle_store import OHLCV_COLUMNS  # noqa: E402
+from crypto_bot import CryptoBot  # noqa: E402
+from ohlcv_archive import OhlcvArrays  # noqa: E402
+
+HOUR_MS = 3_600_000
+
+
+def synthetic_ohlcv(size: int, seed: int = 0) -> OhlcvArrays:
+    """
+    Passeio aleatório determinístico de velas de 1h
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, size)))
+    open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.002, size))
+    high = np.maximum(open_, close) * (1 + rng.random(size) * 0.005)
+    low = np.minimum(open_, close) * (1 - rng.random(size) * 0.005)
+    volume = rng.random(size) * 1000
+    timestamps = 1_600_000_000_000 // HOUR_MS * HOUR_MS + np.arange(size, dtype=np.int64) * HOUR_MS
+    return OhlcvArrays(timestamps, open_, high, low, close, volume)
+
+
+def to_frame(data: OhlcvArrays) -> pd.DataFrame:
+    """
+    DataFrame no mesmo formato entregue pelo get_historical_data_many
+    """
+    frame = {'timestamp': pd.to_datetime(data.timestamps, unit='ms')}
+    for name in OHLCV_COLUMNS:
+        frame[name] = getattr(data, name)
+    return pd.DataFrame(frame)
+
+
+@pytest.fixture
+def offline_bot():
+    """
+    Fábrica de CryptoBot sem acesso à Binance, sem arquivo e com
+    deduplicação em memória
+    """
+    def build(symbols, timeframes, email_dispatcher=None, capacity: int = 100) -> CryptoBot:
+        return CryptoBot(
+            exchanges=[ccxt.binance({'enableRateLimit': True})],
+            symbols=symbols,
+            timeframes=timeframes,
+            email_dispatcher=email_dispatcher,
+            signal_store_path=':memory:',
+            archive_dir='',
+            candle_capacity=capacity,
+            analysis_workers=0,
+            connect=False
+        )
+    return build
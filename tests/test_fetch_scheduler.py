@@ -0,0 +1,78 @@
+"""
+Saúde dos espelhos no FetchScheduler: só falhas do espelho abrem o circuito
+"""
+import time
+
+import ccxt
+import pytest
+
+from fetch_scheduler import FetchScheduler
+from mirror_health import CLOSED, OPEN
+
+
+class FakeExchange:
+    def __init__(self, host: str):
+        self.urls = {'api': {'public': f'https://{host}/api/v3'}}
+        self.calls = 0
+
+
+def scheduler(fetch_fn, mirrors: int = 2) -> FetchScheduler:
+    exchanges = [FakeExchange(f'mirror{index}.test') for index in range(mirrors)]
+    return FetchScheduler(exchanges, fetch_fn, max_workers=2, weight_per_minute=60000,
+                          failure_threshold=2, cooldown=60.0, hedge=False)
+
+
+def states(fetcher: FetchScheduler) -> list:
+    return [mirror.state for mirror in fetcher.health.mirrors]
+
+
+@pytest.mark.parametrize('result', [ccxt.BadSymbol('binance does not have market symbol XYZ/USDT'), None])
+def test_symbol_errors_do_not_open_circuit(result):
+    def fetch(exchange, symbol, timeframe):
+        exchange.calls += 1
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    fetcher = scheduler(fetch)
+    for _ in range(5):
+        assert fetcher.fetch('XYZ/USDT', '1h') is None
+    assert states(fetcher) == [CLOSED, CLOSED]
+    if result is not None:
+        # Símbolo inválido em um espelho é inválido em todos: sem failover
+        assert sum(exchange.calls for exchange in fetcher.exchanges) == 5
+
+
+def test_network_errors_open_circuit_and_fail_over():
+    def fetch(exchange, symbol, timeframe):
+        if exchange is fetcher.exchanges[0]:
+            raise ccxt.RequestTimeout('timeout')
+        return [[0, 1.0, 1.0, 1.0, 1.0, 1.0]]
+
+    fetcher = scheduler(fetch)
+    # O espelho 0 vem primeiro na rota (nenhum dos dois precisa de reavaliação)
+    fetcher.health.mirrors[1].latency = 1.0
+    for mirror in fetcher.health.mirrors:
+        mirror.sampled_at = time.monotonic()
+    for _ in range(2):
+        assert fetcher.fetch('BTC/USDT', '1h') is not None
+    assert states(fetcher) == [OPEN, CLOSED]
+
+
+def test_success_while_all_mirrors_open_closes_circuit():
+    failing = {'down': True}
+
+    def fetch(exchange, symbol, timeframe):
+        if failing['down']:
+            raise ccxt.NetworkError('connection refused')
+        return [[0, 1.0, 1.0, 1.0, 1.0, 1.0]]
+
+    fetcher = scheduler(fetch)
+    for _ in range(2):
+        assert fetcher.fetch('BTC/USDT', '1h') is None
+    assert states(fetcher) == [OPEN, OPEN]
+
+    # Ainda no cooldown: a rota usa os espelhos abertos e a resposta fecha o circuito
+    failing['down'] = False
+    assert fetcher.fetch('BTC/USDT', '1h') is not None
+    assert CLOSED in states(fetcher)
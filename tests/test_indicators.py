@@ -0,0 +1,178 @@
+"""
+Paridade do motor de indicadores (kernels Numba, fallback em Python puro e
+IndicatorState) com a implementação original em pandas
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+from crypto_bot import ChandelierExit, HeikinAshi
+
+
+def ohlcv_frame(size: int, seed: int) -> pd.DataFrame:
+    """
+    Passeio aleatório determinístico de velas de 1h
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, size)))
+    open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.002, size))
+    high = np.maximum(open_, close) * (1 + rng.random(size) * 0.005)
+    low = np.minimum(open_, close) * (1 - rng.random(size) * 0.005)
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2020-09-13', periods=size, freq='h'),
+        'open': open_, 'high': high, 'low': low, 'close': close, 'volume': rng.random(size) * 1000
+    })
+
+
+def baseline_heikin_ashi(df: pd.DataFrame) -> pd.DataFrame:
+    # HeikinAshi.calculate antes do motor vetorizado
+    ha_df = df.copy()
+    ha_df['ha_close'] = (df['open'] + df['high'] + df['low'] + df['close']) / 4
+    ha_df.loc[ha_df.index[0], 'ha_open'] = (df['open'].iloc[0] + df['close'].iloc[0]) / 2
+    for i in range(1, len(df)):
+        ha_df.loc[ha_df.index[i], 'ha_open'] = (ha_df['ha_open'].iloc[i-1] + ha_df['ha_close'].iloc[i-1]) / 2
+    ha_df['ha_high'] = df[['high', 'open', 'close']].max(axis=1)
+    ha_df['ha_low'] = df[['low', 'open', 'close']].min(axis=1)
+
+    result = df.copy()
+    result['open'] = ha_df['ha_open']
+    result['high'] = ha_df['ha_high']
+    result['low'] = ha_df['ha_low']
+    result['close'] = ha_df['ha_close']
+    return result
+
+
+def baseline_chandelier_exit(df: pd.DataFrame, atr_period: int, atr_multiplier: float, use_close: bool) -> pd.DataFrame:
+    # ChandelierExit.calculate antes do motor vetorizado
+    result = df.copy()
+    tr1 = result['high'] - result['low']
+    tr2 = abs(result['high'] - result['close'].shift())
+    tr3 = abs(result['low'] - result['close'].shift())
+    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+    result['atr'] = tr.rolling(window=atr_period).mean() * atr_multiplier
+
+    result['long_stop'] = np.nan
+    result['short_stop'] = np.nan
+    result['direction'] = 1
+    result['buy_signal'] = False
+    result['sell_signal'] = False
+
+    for i in range(atr_period, len(result)):
+        if use_close:
+            highest = result['close'].iloc[i-atr_period:i].max()
+            lowest = result['close'].iloc[i-atr_period:i].min()
+        else:
+            highest = result['high'].iloc[i-atr_period:i].max()
+            lowest = result['low'].iloc[i-atr_period:i].min()
+
+        long_stop = highest - result['atr'].iloc[i]
+        short_stop = lowest + result['atr'].iloc[i]
+
+        if i > atr_period:
+            long_stop_prev = result['long_stop'].iloc[i-1]
+            if pd.notna(long_stop_prev) and result['close'].iloc[i-1] > long_stop_prev:
+                long_stop = max(long_stop, long_stop_prev)
+            short_stop_prev = result['short_stop'].iloc[i-1]
+            if pd.notna(short_stop_prev) and result['close'].iloc[i-1] < short_stop_prev:
+                short_stop = min(short_stop, short_stop_prev)
+
+        result.loc[result.index[i], 'long_stop'] = long_stop
+        result.loc[result.index[i], 'short_stop'] = short_stop
+
+        if i > atr_period:
+            prev_dir = result['direction'].iloc[i-1]
+            if result['close'].iloc[i] > result['short_stop'].iloc[i-1]:
+                result.loc[result.index[i], 'direction'] = 1
+            elif result['close'].iloc[i] < result['long_stop'].iloc[i-1]:
+                result.loc[result.index[i], 'direction'] = -1
+            else:
+                result.loc[result.index[i], 'direction'] = prev_dir
+
+            curr_dir = result['direction'].iloc[i]
+            if curr_dir == 1 and prev_dir == -1:
+                result.loc[result.index[i], 'buy_signal'] = True
+            if curr_dir == -1 and prev_dir == 1:
+                result.loc[result.index[i], 'sell_signal'] = True
+    return result
+
+
+def baseline_signals(ce_df: pd.DataFrame, timestamps: pd.Series) -> list:
+    # Regras de confirmação de CryptoBot.analyze_signals, aplicadas a todas as velas
+    signals = []
+    for i in range(1, len(ce_df)):
+        current, prev_candle = ce_df.iloc[i], ce_df.iloc[i-1]
+        if current['buy_signal'] and current['close'] > prev_candle['high'] and current['close'] > current['open']:
+            signals.append({'type': 'LONG', 'price': current['close'], 'timestamp': timestamps.iloc[i]})
+        elif current['sell_signal'] and current['close'] < prev_candle['low'] and current['close'] < current['open']:
+            signals.append({'type': 'SHORT', 'price': current['close'], 'timestamp': timestamps.iloc[i]})
+    return signals
+
+
+PARAMS = [(1, 0.8, True), (3, 1.5, True), (14, 2.0, False)]
+
+
+@pytest.fixture(params=[True, False], ids=['numba', 'python'])
+def use_numba(request, monkeypatch):
+    if request.param and not indicators.USE_NUMBA:
+        pytest.skip('Numba não instalado')
+    monkeypatch.setattr(indicators, 'USE_NUMBA', request.param)
+    return request.param
+
+
+@pytest.fixture(scope='module', params=[0, 5])
+def frame(request) -> pd.DataFrame:
+    return ohlcv_frame(300, seed=request.param)
+
+
+def assert_same_columns(actual: pd.DataFrame, expected: pd.DataFrame, columns):
+    for column in columns:
+        np.testing.assert_array_equal(actual[column].to_numpy(), expected[column].to_numpy(), err_msg=column)
+
+
+def test_heikin_ashi_matches_baseline(frame, use_numba):
+    assert_same_columns(HeikinAshi.calculate(frame), baseline_heikin_ashi(frame), ['open', 'high', 'low', 'close'])
+
+
+@pytest.mark.parametrize('atr_period,atr_multiplier,use_close', PARAMS)
+def test_chandelier_exit_matches_baseline(frame, use_numba, atr_period, atr_multiplier, use_close):
+    ha_df = baseline_heikin_ashi(frame)
+    actual = ChandelierExit(atr_period, atr_multiplier, use_close).calculate(ha_df)
+    expected = baseline_chandelier_exit(ha_df, atr_period, atr_multiplier, use_close)
+    assert_same_columns(actual, expected, ['atr', 'long_stop', 'short_stop', 'direction', 'buy_signal', 'sell_signal'])
+
+
+@pytest.mark.parametrize('atr_period,atr_multiplier,use_close', PARAMS)
+def test_indicator_state_matches_baseline(frame, atr_period, atr_multiplier, use_close):
+    expected = baseline_chandelier_exit(baseline_heikin_ashi(frame), atr_period, atr_multiplier, use_close)
+    state = indicators.IndicatorState(atr_period, atr_multiplier, use_close)
+    long_stops, short_stops, directions, signals = [], [], [], []
+    for row in frame.itertuples(index=False):
+        # A vela em formação avaliada antes de fechar dá o mesmo sinal da confirmação
+        preview = state.preview(row.timestamp, row.open, row.high, row.low, row.close)
+        signal = state.update(row.timestamp, row.open, row.high, row.low, row.close)
+        assert preview == signal
+        if signal:
+            signals.append(signal)
+        long_stops.append(state.long_stop)
+        short_stops.append(state.short_stop)
+        directions.append(state.direction)
+
+    np.testing.assert_array_equal(long_stops, expected['long_stop'].to_numpy())
+    np.testing.assert_array_equal(short_stops, expected['short_stop'].to_numpy())
+    np.testing.assert_array_equal(directions, expected['direction'].to_numpy())
+    assert signals == baseline_signals(expected, frame['timestamp'])
+    assert state.count == len(frame)
+
+
+def test_signals_batch_matches_chandelier_exit(frame, use_numba):
+    ha_open, ha_high, ha_low, ha_close = indicators.heikin_ashi(
+        frame['open'].to_numpy(), frame['high'].to_numpy(), frame['low'].to_numpy(), frame['close'].to_numpy())
+    period, multipliers = 3, [0.5, 1.0, 2.5]
+    highest, lowest = indicators.rolling_extremes(ha_close, ha_close, period)
+    mean_tr = indicators.rolling_mean(indicators.true_range(ha_high, ha_low, ha_close), period)
+    buy, sell = indicators.chandelier_signals_batch(highest, lowest, ha_close, mean_tr, period, multipliers)
+    for k, multiplier in enumerate(multipliers):
+        ce = indicators.chandelier_exit(ha_high, ha_low, ha_close, period, multiplier, True)
+        np.testing.assert_array_equal(buy[k], ce.buy_signal)
+        np.testing.assert_array_equal(sell[k], ce.sell_signal)
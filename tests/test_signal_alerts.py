@@ -0,0 +1,57 @@
+"""
+Alertas emitidos quando a análise roda logo após o fechamento das velas.
+"""
+import numpy as np
+import pytest
+
+import indicators
+from conftest import synthetic_ohlcv, to_frame
+from ohlcv_archive import OhlcvArrays
+
+WINDOW = 100
+
+
+class RecordingDispatcher:
+    def __init__(self):
+        self.alerts = []
+
+    def submit(self, alert):
+        self.alerts.append(alert)
+
+    def flush(self):
+        pass
+
+
+def expected_alerts(data, start):
+    """
+    Velas (ms) com sinal confirmado de tipo diferente do sinal anterior,
+    calculados sobre os valores finais de cada vela
+    """
+    state = indicators.IndicatorState(2, 1.0, False)
+    previous = None
+    expected = set()
+    for i in range(len(data.timestamps) - 1):
+        signal = state.update(int(data.timestamps[i]), data.open[i], data.high[i], data.low[i], data.close[i])
+        if signal:
+            if i >= start and (previous is None or previous['type'] != signal['type']):
+                expected.add(signal['timestamp'])
+            previous = signal
+    return expected
+
+
+@pytest.mark.parametrize('seed', [1, 3, 7])
+def test_signals_confirmed_on_closed_candle_are_alerted(seed, offline_bot):
+    data = synthetic_ohlcv(400, seed=seed)
+    bot = offline_bot(['TEST/USDT'], ['1h'], email_dispatcher=RecordingDispatcher())
+
+    # Cada passada acontece logo após um fechamento: a vela nova só tem a abertura
+    for t in range(WINDOW, len(data.timestamps)):
+        arrays = [np.array(values[t - WINDOW:t + 1]) for values in data]
+        arrays[2][-1] = arrays[3][-1] = arrays[4][-1] = arrays[1][-1]
+        frame = to_frame(OhlcvArrays(*arrays))
+        bot.generate_signals_many({('TEST/USDT', '1h'): frame})
+
+    expected = expected_alerts(data, WINDOW - 1)
+    alerted = {alert.candle_timestamp for alert in bot.email_dispatcher.alerts}
+    assert expected
+    assert expected <= alerted
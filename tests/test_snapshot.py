@@ -0,0 +1,48 @@
+"""
+Deltas do /get_prices?since= vistos por um worker que só lê o arquivo compartilhado
+"""
+import json
+
+from snapshot import SnapshotCache
+
+
+def prices(btc: float, symbols=('BTC/USDT', 'ETH/USDT')) -> dict:
+    entries = {symbol: {'current_price': btc if symbol == 'BTC/USDT' else 1.0, 'signal': None, 'current_time': None}
+               for symbol in symbols}
+    return {'1h': entries, 'bot_status': 'running', 'updated_at': 0}
+
+
+def read_view(cache: SnapshotCache, since: int) -> dict:
+    return json.loads(cache.view(since=since).body)
+
+
+def test_since_after_skipped_versions(tmp_path):
+    path = str(tmp_path / 'snapshot.json')
+    producer, reader = SnapshotCache(path), SnapshotCache(path)
+    producer.publish(prices(1.0))
+    assert reader.get().version == 1
+
+    # O leitor pula a versão 2: BTC muda e volta ao valor visto por ele
+    producer.publish(prices(2.0))
+    producer.publish(prices(1.0))
+    for since in (1, 2):
+        delta = read_view(reader, since)
+        assert delta['version'] == 3
+        assert list(delta['changed']['1h']) == ['BTC/USDT']
+
+
+def test_since_reports_removals_from_producer(tmp_path):
+    path = str(tmp_path / 'snapshot.json')
+    producer, reader = SnapshotCache(path), SnapshotCache(path)
+    producer.publish(prices(1.0))
+    producer.publish(prices(1.0, symbols=('BTC/USDT',)))
+    delta = read_view(reader, 1)
+    assert delta['removed'] == [['1h', 'ETH/USDT']]
+
+
+def test_since_without_change_header_returns_full_snapshot(tmp_path):
+    path = tmp_path / 'snapshot.json'
+    path.write_bytes(json.dumps(dict(prices(1.0), version=5)).encode('utf-8'))
+    reader = SnapshotCache(str(path))
+    full = read_view(reader, 4)
+    assert 'changed' not in full and set(full['1h']) == {'BTC/USDT', 'ETH/USDT'}
@@ -0,0 +1,23 @@
+"""
+Ranking do universo dinâmico de símbolos
+"""
+from watchlist import is_leveraged_token, rank_symbols
+
+
+def market(base: str, quote: str = 'USDT', active: bool = True) -> dict:
+    return {'base': base, 'quote': quote, 'spot': True, 'active': active}
+
+
+def test_leveraged_tokens_need_known_underlying():
+    for base in ('BTCUP', 'ETHDOWN', 'BNBBULL', 'XRPBEAR', '1INCHUP'):
+        assert is_leveraged_token(base)
+    for base in ('JUP', 'SUP', 'PUP', 'SYRUP', 'UP', 'BTC'):
+        assert not is_leveraged_token(base)
+
+
+def test_rank_symbols_keeps_tokens_ending_in_up():
+    bases = ['BTC', 'JUP', 'SYRUP', 'BTCUP', 'ETHDOWN', 'USDC', 'OLD']
+    markets = {f'{base}/USDT': market(base, active=base != 'OLD') for base in bases}
+    tickers = {symbol: {'quoteVolume': 1000.0 * (index + 1)} for index, symbol in enumerate(markets)}
+    ranked = rank_symbols(tickers, markets, 'USDT', 10, exclude_bases=['USDC'])
+    assert ranked == ['SYRUP/USDT', 'JUP/USDT', 'BTC/USDT']
@@ -0,0 +1,71 @@
+"""
+Universo dinâmico de símbolos: os N pares mais negociados nas últimas 24h.
+
+Um único fetch_tickers() traz o volume de todos os pares; ficam apenas os
+mercados spot ativos da moeda de cotação, sem stablecoins nem tokens
+alavancados, ordenados pelo volume na moeda de cotação. Mercados
+deslistados ou suspensos somem do ranking sozinhos (inativos nos metadados
+ou sem volume).
+"""
+import logging
+from typing import Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# Tokens alavancados da Binance (BTCUP, ETHDOWN, BNBBULL...), sem interesse para
+# os sinais. Só o sufixo não basta: JUP, SUP, PUP e SYRUP são tokens comuns
+_LEVERAGED_UNDERLYINGS = frozenset({
+    'BTC', 'ETH', 'BNB', 'XRP', 'ADA', 'DOT', 'LINK', 'TRX', 'EOS', 'XTZ',
+    'LTC', 'BCH', 'YFI', 'SUSHI', 'UNI', 'AAVE', 'FIL', 'SXP', 'XLM', '1INCH'
+})
+_LEVERAGED_SUFFIXES = ('UP', 'DOWN', 'BULL', 'BEAR')
+
+
+def is_leveraged_token(base: str) -> bool:
+    """
+    True para um token alavancado: ativo subjacente conhecido + UP/DOWN/BULL/BEAR
+    """
+    return any(base.endswith(suffix) and base[:-len(suffix)] in _LEVERAGED_UNDERLYINGS
+               for suffix in _LEVERAGED_SUFFIXES)
+
+
+def rank_symbols(tickers: dict, markets: dict, quote: str, top_n: int,
+                 exclude_bases: Iterable[str] = (), min_quote_volume: float = 0.0) -> List[str]:
+    """
+    Os `top_n` símbolos negociáveis com maior volume em `quote` nas últimas 24h
+    """
+    exclude_bases = set(exclude_bases)
+    ranked = []
+    for symbol, ticker in tickers.items():
+        market = markets.get(symbol)
+        if not market or not market.get('spot') or market.get('quote') != quote:
+            continue
+        # 'active' vem do status da Binance (TRADING); None quando desconhecido
+        if market.get('active') is False:
+            continue
+        base = market.get('base', '')
+        if base in exclude_bases or is_leveraged_token(base):
+            continue
+        volume = ticker.get('quoteVolume')
+        if volume is None and ticker.get('baseVolume') is not None and ticker.get('last') is not None:
+            volume = ticker['baseVolume'] * ticker['last']
+        if not volume or volume <= min_quote_volume:
+            continue
+        ranked.append((volume, symbol))
+    ranked.sort(reverse=True)
+    return [symbol for _, symbol in ranked[:top_n]]
+
+
+def tradable_symbols(symbols: Iterable[str], markets: dict) -> List[str]:
+    """
+    Filtra uma lista fixa de símbolos, descartando os que não existem ou
+    estão inativos nos metadados de mercado
+    """
+    kept = []
+    for symbol in symbols:
+        market = markets.get(symbol)
+        if market is None or market.get('active') is False:
+            logger.warning(f"{symbol} removido: mercado inexistente ou inativo")
+            continue
+        kept.append(symbol)
+    return kept